@@ -56,290 +56,192 @@ app.get('/', async (req, res) => {
     }
 });
 
-// Championship Dashboard
-app.get('/championship', async (req, res) => {
-    const chat_id = req.query.chat_id;
-    const thread_id = req.query.thread_id || 0;
-
-    if (!chat_id) {
-        return res.redirect('/');
-    }
-
-    try {
-        // 1. Get Matches
-        const matches = await query(`
-            SELECT id, match_date, skill_level, score
-            FROM matches
-            WHERE chat_id = ? AND thread_id = ?
-            ORDER BY match_date DESC
-        `, [chat_id, thread_id]);
-
-        // 2. Get Match Events for all matches (for expandable details)
-        const eventsQuery = `
-            SELECT 
-                me.match_history_id,
-                me.event_type,
-                me.minute as event_time,
-                me.assist_player_id,
-                me.is_penalty,
-                mh.match_id,
-                mh.team,
-                p.name as player_name,
-                assist_p.name as assist_player_name
-            FROM match_events me
-            JOIN match_history mh ON me.match_history_id = mh.id
-            JOIN players p ON mh.player_id = p.id
-            LEFT JOIN players assist_p ON me.assist_player_id = assist_p.id
-            JOIN matches m ON mh.match_id = m.id
-            WHERE m.chat_id = ? AND m.thread_id = ?
-            ORDER BY mh.match_id, me.minute ASC, me.id ASC
-        `;
-        const matchEvents = await query(eventsQuery, [chat_id, thread_id]);
+// Everything the championship view needs (page and screenshot share it).
+// season_id 0 = all matches, otherwise one season (matches.season_id, set by the bot)
+async function loadChampionship(chat_id, thread_id, season_id = 0) {
+    const seasonFilter = season_id ? ' AND m.season_id = ?' : '';
+    const scope = season_id ? [chat_id, thread_id, season_id] : [chat_id, thread_id];
+
+    // 1. Get Matches
+    const matches = await query(`
+        SELECT m.id, m.match_date, m.skill_level, m.score, m.red_goals, m.white_goals, m.result, m.season_match_no, m.events_rolled_up
+        FROM matches m
+        WHERE m.chat_id = ? AND m.thread_id = ?${seasonFilter}
+        ORDER BY m.match_date DESC
+    `, scope);
+
+    // 2. Get Match Events for all matches (for expandable details)
+    const eventsQuery = `
+        SELECT 
+            me.match_history_id,
+            me.event_type,
+            me.minute as event_time,
+            me.assist_player_id,
+            me.is_penalty,
+            mh.match_id,
+            mh.team,
+            p.name as player_name,
+            assist_p.name as assist_player_name
+        FROM match_events me
+        JOIN match_history mh ON me.match_history_id = mh.id
+        JOIN players p ON mh.player_id = p.id
+        LEFT JOIN players assist_p ON me.assist_player_id = assist_p.id
+        JOIN matches m ON mh.match_id = m.id
+        WHERE m.chat_id = ? AND m.thread_id = ?${seasonFilter}
+        ORDER BY mh.match_id, me.minute ASC, me.id ASC
+    `;
+    const matchEvents = await query(eventsQuery, scope);
+
+    // Group events by match_id
+    const eventsByMatch = {};
+    matchEvents.forEach(event => {
+        if (!eventsByMatch[event.match_id]) {
+            eventsByMatch[event.match_id] = [];
+        }
+        eventsByMatch[event.match_id].push(event);
+    });
 
-        // Group events by match_id
-        const eventsByMatch = {};
-        matchEvents.forEach(event => {
-            if (!eventsByMatch[event.match_id]) {
-                eventsByMatch[event.match_id] = [];
-            }
-            eventsByMatch[event.match_id].push(event);
+    // 3. Get Player Stats Aggregated
+    // standings is kept up to date by the bot on every result write
+    const statsQuery = `
+        SELECT 
+            s.player_id as id,
+            COALESCE(ps.display_name, p.name) as name,
+            s.games,
+            s.goals,
+            s.assists,
+            s.autogoals,
+            s.rating_sum / NULLIF(s.rating_count, 0) as avg_rating,
+            s.yellow_cards,
+            s.red_cards,
+            s.points as tournament_points,
+            s.goals_diff
+        FROM standings s
+        JOIN players p ON p.id = s.player_id
+        LEFT JOIN player_stats ps ON p.id = ps.player_id AND ps.chat_id = s.chat_id AND ps.thread_id = s.thread_id
+        WHERE s.chat_id = ? AND s.thread_id = ? AND s.season_id = ? AND s.games > 0
+        ORDER BY tournament_points DESC, goals DESC, assists DESC, games ASC
+    `;
+    const players = await query(statsQuery, [chat_id, thread_id, season_id]);
+
+    // 4. Get Captains' Rating
+    const captainsQuery = `
+        SELECT 
+            c.player_id as id,
+            COALESCE(ps.display_name, p.name) as name,
+            c.games,
+            c.points,
+            c.wins,
+            c.draws,
+            c.losses,
+            c.goals_scored,
+            c.goals_conceded,
+            c.goals_scored - c.goals_conceded as goals_diff
+        FROM captain_standings c
+        JOIN players p ON p.id = c.player_id
+        LEFT JOIN player_stats ps ON p.id = ps.player_id AND ps.chat_id = c.chat_id AND ps.thread_id = c.thread_id
+        WHERE c.chat_id = ? AND c.thread_id = ? AND c.season_id = ? AND c.games > 0
+        ORDER BY points DESC, wins DESC, goals_scored DESC
+    `;
+    const captains = await query(captainsQuery, [chat_id, thread_id, season_id]);
+
+    // Process Form History
+    // Last 5 matches ('matches' is sorted by date DESC), oldest -> newest
+    const recentMatches = matches.slice(0, 5).reverse();
+    const historyByPlayer = {};
+    const assistMap = {};
+
+    if (recentMatches.length) {
+        const ids = recentMatches.map(m => m.id);
+        const placeholders = ids.map(() => '?').join(', ');
+        const historyRows = await query(`
+            SELECT player_id, match_id, team, goals, yellow_cards, red_cards, COALESCE(points, 0) as points, COALESCE(is_captain, 0) as is_captain, COALESCE(assists, 0) as assists
+            FROM match_history
+            WHERE match_id IN (${placeholders})
+        `, ids);
+        historyRows.forEach(r => {
+            if (!historyByPlayer[r.player_id]) historyByPlayer[r.player_id] = {};
+            historyByPlayer[r.player_id][r.match_id] = {
+                team: r.team,
+                goals: r.goals,
+                yellows: r.yellow_cards,
+                reds: r.red_cards,
+                rating: r.points,
+                is_captain: r.is_captain,
+                assists: r.assists
+            };
         });
 
-        // 3. Get Player Stats Aggregated
-        // We need: Name (Display Name preferred, else Telegram Name), Matches Played, Goals, Win/Draw/Loss maybe? 
-        // User asked for "statistics for each player".
-        // match_history: points, goals, autogoals, best_defender, team
-
-        const statsQuery = `
-            SELECT 
-                p.id,
-                COALESCE(ps.display_name, p.name) as name,
-                COUNT(mh.match_id) as games,
-                SUM(mh.goals) as goals,
-                COALESCE(MAX(ast.assist_count), 0) as assists,
-                SUM(mh.autogoals) as autogoals,
-                SUM(mh.best_defender) as best_defender_count,
-                AVG(CASE WHEN mh.is_captain = 1 THEN NULL ELSE mh.points END) as avg_rating,
-                SUM(mh.yellow_cards) as yellow_cards,
-                SUM(mh.red_cards) as red_cards,
-                SUM(
-                    CASE 
-                        WHEN m.score LIKE '%:%' THEN
-                            CASE
-                                WHEN mh.team = 'White' AND CAST(SUBSTRING_INDEX(m.score, ':', 1) AS UNSIGNED) < CAST(SUBSTRING_INDEX(m.score, ':', -1) AS UNSIGNED) THEN 3
-                                WHEN mh.team = 'White' AND CAST(SUBSTRING_INDEX(m.score, ':', 1) AS UNSIGNED) = CAST(SUBSTRING_INDEX(m.score, ':', -1) AS UNSIGNED) THEN 1
-                                WHEN mh.team = 'Red' AND CAST(SUBSTRING_INDEX(m.score, ':', 1) AS UNSIGNED) > CAST(SUBSTRING_INDEX(m.score, ':', -1) AS UNSIGNED) THEN 3
-                                WHEN mh.team = 'Red' AND CAST(SUBSTRING_INDEX(m.score, ':', 1) AS UNSIGNED) = CAST(SUBSTRING_INDEX(m.score, ':', -1) AS UNSIGNED) THEN 1
-                                ELSE 0
-                            END
-                        ELSE 0
-                    END
-                ) as tournament_points,
-                SUM(
-                    CASE 
-                        WHEN m.score LIKE '%:%' THEN
-                            CASE
-                                WHEN mh.team = 'White' THEN CAST(SUBSTRING_INDEX(m.score, ':', -1) AS SIGNED) - CAST(SUBSTRING_INDEX(m.score, ':', 1) AS SIGNED)
-                                WHEN mh.team = 'Red' THEN CAST(SUBSTRING_INDEX(m.score, ':', 1) AS SIGNED) - CAST(SUBSTRING_INDEX(m.score, ':', -1) AS SIGNED)
-                                ELSE 0
-                            END
-                        ELSE 0
-                    END
-                ) as goals_diff,
-                GROUP_CONCAT(
-                    CONCAT(
-                        mh.match_id, ':', 
-                        mh.team, ':', 
-                        mh.goals, ':', 
-                        mh.yellow_cards, ':', 
-                        mh.red_cards, ':', 
-                        COALESCE(mh.points, 0), ':',
-                        COALESCE(mh.is_captain, 0)
-                    )
-                ) as history_summary
-            FROM players p
-            LEFT JOIN player_stats ps ON p.id = ps.player_id AND ps.chat_id = ? AND ps.thread_id = ?
-            JOIN match_history mh ON p.id = mh.player_id
-            JOIN matches m ON mh.match_id = m.id
-            LEFT JOIN (
-                SELECT me.assist_player_id, COUNT(*) as assist_count
-                FROM match_events me
-                JOIN match_history mh2 ON me.match_history_id = mh2.id
-                JOIN matches m2 ON mh2.match_id = m2.id
-                WHERE me.event_type = 'goal' AND me.assist_player_id IS NOT NULL
-                AND m2.chat_id = ? AND m2.thread_id = ?
-                GROUP BY me.assist_player_id
-            ) ast ON p.id = ast.assist_player_id
-            WHERE m.chat_id = ? AND m.thread_id = ?
-            GROUP BY p.id, p.name, ps.display_name
-            ORDER BY tournament_points DESC, goals DESC, assists DESC, games ASC
-        `;
-
-        const assistsQuery = `
+        const assistRows = await query(`
             SELECT me.assist_player_id, mh.match_id, COUNT(*) as count
             FROM match_events me
             JOIN match_history mh ON me.match_history_id = mh.id
-            JOIN matches m ON mh.match_id = m.id
             WHERE me.event_type = 'goal' AND me.assist_player_id IS NOT NULL
-            AND m.chat_id = ? AND m.thread_id = ?
+            AND mh.match_id IN (${placeholders})
             GROUP BY me.assist_player_id, mh.match_id
-        `;
-
-        const [assistRows] = await pool.execute(assistsQuery, [chat_id, thread_id]);
-        const assistMap = {};
+        `, ids);
         assistRows.forEach(r => {
             if (!assistMap[r.assist_player_id]) assistMap[r.assist_player_id] = {};
             assistMap[r.assist_player_id][r.match_id] = r.count;
         });
+    }
 
-        const players = await query(statsQuery, [chat_id, thread_id, chat_id, thread_id, chat_id, thread_id]);
+    const processedPlayers = players.map(playerData => {
+        // Hide detailed best defender stats by default
+        // These will be fetched via API on user request
+        const player = { ...playerData, form: [], best_defender_count: 0 };
+        const historyMap = historyByPlayer[player.id] || {};
+
+        recentMatches.forEach(match => {
+            const stats = historyMap[match.id];
+            const formItem = { result: 'S', match_score: match.score || '-:-', match_date: match.match_date };
+
+            if (stats) {
+                // Determine Result (matches.result: 1 red won, 0 draw, -1 white won)
+                if (match.result !== null && match.result !== undefined) {
+                    const sign = stats.team === 'Red' ? match.result : stats.team === 'White' ? -match.result : 0;
+                    formItem.result = sign > 0 ? 'W' : sign < 0 ? 'L' : 'D';
+                }
 
-        // 4. Get Captains' Rating
-        const captainsQuery = `
-            SELECT 
-                p.id,
-                COALESCE(ps.display_name, p.name) as name,
-                COUNT(mh.match_id) as games,
-                SUM(
-                    CASE 
-                        WHEN m.score LIKE '%:%' THEN
-                            CASE
-                                WHEN mh.team = 'White' AND CAST(SUBSTRING_INDEX(m.score, ':', 1) AS UNSIGNED) < CAST(SUBSTRING_INDEX(m.score, ':', -1) AS UNSIGNED) THEN 3
-                                WHEN mh.team = 'White' AND CAST(SUBSTRING_INDEX(m.score, ':', 1) AS UNSIGNED) = CAST(SUBSTRING_INDEX(m.score, ':', -1) AS UNSIGNED) THEN 1
-                                WHEN mh.team = 'Red' AND CAST(SUBSTRING_INDEX(m.score, ':', 1) AS UNSIGNED) > CAST(SUBSTRING_INDEX(m.score, ':', -1) AS UNSIGNED) THEN 3
-                                WHEN mh.team = 'Red' AND CAST(SUBSTRING_INDEX(m.score, ':', 1) AS UNSIGNED) = CAST(SUBSTRING_INDEX(m.score, ':', -1) AS UNSIGNED) THEN 1
-                                ELSE 0
-                            END
-                        ELSE 0
-                    END
-                ) as points,
-                SUM(
-                    CASE 
-                        WHEN m.score LIKE '%:%' AND 
-                            ((mh.team = 'White' AND CAST(SUBSTRING_INDEX(m.score, ':', 1) AS UNSIGNED) < CAST(SUBSTRING_INDEX(m.score, ':', -1) AS UNSIGNED)) OR
-                             (mh.team = 'Red' AND CAST(SUBSTRING_INDEX(m.score, ':', 1) AS UNSIGNED) > CAST(SUBSTRING_INDEX(m.score, ':', -1) AS UNSIGNED)))
-                        THEN 1 ELSE 0 
-                    END
-                ) as wins,
-                SUM(
-                    CASE 
-                        WHEN m.score LIKE '%:%' AND CAST(SUBSTRING_INDEX(m.score, ':', 1) AS UNSIGNED) = CAST(SUBSTRING_INDEX(m.score, ':', -1) AS UNSIGNED)
-                        THEN 1 ELSE 0 
-                    END
-                ) as draws,
-                SUM(
-                    CASE 
-                        WHEN m.score LIKE '%:%' AND 
-                            ((mh.team = 'White' AND CAST(SUBSTRING_INDEX(m.score, ':', 1) AS UNSIGNED) > CAST(SUBSTRING_INDEX(m.score, ':', -1) AS UNSIGNED)) OR
-                             (mh.team = 'Red' AND CAST(SUBSTRING_INDEX(m.score, ':', 1) AS UNSIGNED) < CAST(SUBSTRING_INDEX(m.score, ':', -1) AS UNSIGNED)))
-                        THEN 1 ELSE 0 
-                    END
-                ) as losses,
-                SUM(
-                    CASE 
-                        WHEN mh.team = 'White' THEN CAST(SUBSTRING_INDEX(m.score, ':', -1) AS UNSIGNED)
-                        WHEN mh.team = 'Red' THEN CAST(SUBSTRING_INDEX(m.score, ':', 1) AS UNSIGNED)
-                        ELSE 0
-                    END
-                ) as goals_scored,
-                SUM(
-                    CASE 
-                        WHEN mh.team = 'White' THEN CAST(SUBSTRING_INDEX(m.score, ':', 1) AS UNSIGNED)
-                        WHEN mh.team = 'Red' THEN CAST(SUBSTRING_INDEX(m.score, ':', -1) AS UNSIGNED)
-                        ELSE 0
-                    END
-                ) as goals_conceded,
-                (
-                    SUM(CASE WHEN mh.team = 'White' THEN CAST(SUBSTRING_INDEX(m.score, ':', -1) AS SIGNED) WHEN mh.team = 'Red' THEN CAST(SUBSTRING_INDEX(m.score, ':', 1) AS SIGNED) ELSE 0 END) -
-                    SUM(CASE WHEN mh.team = 'White' THEN CAST(SUBSTRING_INDEX(m.score, ':', 1) AS SIGNED) WHEN mh.team = 'Red' THEN CAST(SUBSTRING_INDEX(m.score, ':', -1) AS SIGNED) ELSE 0 END)
-                ) as goals_diff
-            FROM players p
-            LEFT JOIN player_stats ps ON p.id = ps.player_id AND ps.chat_id = ? AND ps.thread_id = ?
-            JOIN match_history mh ON p.id = mh.player_id
-            JOIN matches m ON mh.match_id = m.id
-            WHERE m.chat_id = ? AND m.thread_id = ? AND mh.is_captain = 1
-            GROUP BY p.id, p.name, ps.display_name
-            ORDER BY points DESC, wins DESC, goals_scored DESC
-        `;
-        const captains = await query(captainsQuery, [chat_id, thread_id, chat_id, thread_id]);
-
-        // Process Form History
-        // Take last 5 matches from the total matches list (sorted by date DESC)
-        // We need to verify if 'matches' is sorted DESC. Assuming existing query sorts by date DESC?
-        // Let's check 'matches' query or assume it is handled.
-
-        const recentMatches = matches.slice(0, 5).reverse(); // Oldest of the 5 -> Newest of the 5
-
-        const processedPlayers = players.map(playerData => {
-            // Hide detailed best defender stats by default
-            // These will be fetched via API on user request
-            const player = { ...playerData, form: [], best_defender_count: 0 };
-            const historyMap = {};
-            // Correctly parse detailed string: mid:team:goals:yellows:reds:rating:captain
-            if (player.history_summary) {
-                player.history_summary.toString().split(',').forEach(entry => {
-                    const parts = entry.split(':');
-                    if (parts.length >= 7) {
-                        const [mid, team, goals, yellows, reds, rating, is_captain] = parts;
-                        historyMap[mid] = {
-                            team,
-                            goals: parseInt(goals),
-                            yellows: parseInt(yellows),
-                            reds: parseInt(reds),
-                            rating: parseFloat(rating),
-                            is_captain: parseInt(is_captain)
-                        };
-                    } else {
-                        // Fallback for old cache or weird data
-                        const [mid, team] = parts;
-                        historyMap[mid] = { team, goals: 0, yellows: 0, reds: 0, rating: 0, is_captain: 0 };
-                    }
-                });
+                // Attach Stats
+                formItem.stats = {
+                    goals: stats.goals,
+                    // Old matches may have their events rolled up into match_history by the bot
+                    assists: ((assistMap[player.id] && assistMap[player.id][match.id]) || 0) + (match.events_rolled_up ? stats.assists : 0),
+                    yellows: stats.yellows,
+                    reds: stats.reds,
+                    rating: stats.rating,
+                    is_captain: stats.is_captain
+                };
             }
 
-            recentMatches.forEach(match => {
-                const stats = historyMap[match.id];
-                const formItem = { result: 'S', match_score: match.score || '-:-', match_date: match.match_date };
-
-                if (stats) {
-                    // Determine Result
-                    if (match.score && match.score.includes(':')) {
-                        const [scoreA, scoreB] = match.score.split(':').map(Number);
-                        let result = 'D';
-                        if (stats.team === 'White') {
-                            if (scoreB > scoreA) result = 'W';
-                            else if (scoreB < scoreA) result = 'L';
-                        } else if (stats.team === 'Red') {
-                            if (scoreA > scoreB) result = 'W';
-                            else if (scoreA < scoreB) result = 'L';
-                        }
-                        formItem.result = result;
-                    }
-
-                    // Attach Stats
-                    formItem.stats = {
-                        goals: stats.goals,
-                        assists: (assistMap[player.id] && assistMap[player.id][match.id]) || 0,
-                        yellows: stats.yellows,
-                        reds: stats.reds,
-                        rating: stats.rating,
-                        is_captain: stats.is_captain
-                    };
-                }
-
-                player.form.push(formItem);
-            });
-            return player;
+            player.form.push(formItem);
         });
+        return player;
+    });
 
-        res.render('championship', {
-            chat_id,
-            thread_id,
-            matches,
-            players: processedPlayers,
-            captains,
-            eventsByMatch
-        });
+    return {
+        chat_id,
+        thread_id,
+        matches,
+        players: processedPlayers,
+        captains,
+        eventsByMatch
+    };
+}
+
+// Championship Dashboard
+app.get('/championship', async (req, res) => {
+    const chat_id = req.query.chat_id;
+    const thread_id = req.query.thread_id || 0;
+    const season_id = parseInt(req.query.season_id || '0', 10) || 0;
+
+    if (!chat_id) {
+        return res.redirect('/');
+    }
+
+    try {
+        res.render('championship', await loadChampionship(chat_id, thread_id, season_id));
     } catch (err) {
         console.error(err);
         res.status(500).send("Database Error: " + err.message);
@@ -359,48 +261,162 @@ const puppeteer = require('puppeteer');
 
 app.use(express.json());
 
+// Screenshot rendering: one warm browser per process with a small pool of pages
+const BROWSER_PAGES = parseInt(process.env.BROWSER_PAGES || '2', 10);
+const RENDER_QUEUE_LIMIT = parseInt(process.env.RENDER_QUEUE_LIMIT || '20', 10);
+const RENDER_TIMEOUT_MS = parseInt(process.env.RENDER_TIMEOUT_MS || '20000', 10);
+
+class QueueFullError extends Error {}
+
+class BrowserPool {
+    constructor(size, queueLimit) {
+        this.size = size;
+        this.queueLimit = queueLimit;
+        this.browserPromise = null;
+        this.pages = new Set();   // pages of the current browser
+        this.idle = [];
+        this.opening = 0;
+        this.waiters = [];        // bounded queue of { resolve, reject }
+    }
+
+    getBrowser() {
+        if (!this.browserPromise) {
+            this.browserPromise = puppeteer.launch({
+                args: ['--no-sandbox', '--disable-setuid-sandbox']
+            }).then(browser => {
+                browser.on('disconnected', () => {
+                    // Crash or kill: forget its pages, the next request relaunches
+                    console.error("Browser disconnected, relaunching on next render");
+                    this.browserPromise = null;
+                    this.pages.clear();
+                    this.idle = [];
+                });
+                return browser;
+            }).catch(err => {
+                this.browserPromise = null;
+                throw err;
+            });
+        }
+        return this.browserPromise;
+    }
+
+    async newPage() {
+        this.opening++;
+        try {
+            const browser = await this.getBrowser();
+            const page = await browser.newPage();
+            page.setDefaultTimeout(RENDER_TIMEOUT_MS);
+            // Same viewport as the old per-request browser
+            await page.setViewport({ width: 1200, height: 800, deviceScaleFactor: 2 });
+            page.once('error', () => this.pages.delete(page));
+            this.pages.add(page);
+            return page;
+        } finally {
+            this.opening--;
+        }
+    }
+
+    async acquire() {
+        while (this.idle.length) {
+            const page = this.idle.pop();
+            if (this.pages.has(page) && !page.isClosed()) return page;
+            this.pages.delete(page);
+        }
+        if (this.pages.size + this.opening < this.size) {
+            return this.newPage();
+        }
+        if (this.waiters.length >= this.queueLimit) {
+            throw new QueueFullError("Render queue is full");
+        }
+        return new Promise((resolve, reject) => this.waiters.push({ resolve, reject }));
+    }
+
+    release(page, healthy) {
+        if (!healthy || page.isClosed() || !this.pages.has(page)) {
+            this.pages.delete(page);
+            if (!page.isClosed()) page.close().catch(() => {});
+            page = null;
+        }
+        const waiter = this.waiters.shift();
+        if (!waiter) {
+            if (page) this.idle.push(page);
+            return;
+        }
+        if (page) {
+            waiter.resolve(page);
+        } else {
+            this.newPage().then(waiter.resolve, waiter.reject);
+        }
+    }
+
+    async withPage(fn) {
+        const page = await this.acquire();
+        try {
+            const result = await fn(page);
+            this.release(page, true);
+            return result;
+        } catch (err) {
+            this.release(page, false);
+            throw err;
+        }
+    }
+
+    async close() {
+        const browserPromise = this.browserPromise;
+        this.browserPromise = null;
+        if (browserPromise) {
+            const browser = await browserPromise.catch(() => null);
+            if (browser) await browser.close();
+        }
+    }
+}
+
+const browserPool = new BrowserPool(BROWSER_PAGES, RENDER_QUEUE_LIMIT);
+
+function renderView(view, data) {
+    return new Promise((resolve, reject) => {
+        app.render(view, data, (err, html) => err ? reject(err) : resolve(html));
+    });
+}
+
 // API - Get Screenshot
 app.post('/api/championship/image', async (req, res) => {
-    const { chat_id, thread_id } = req.body;
+    const { chat_id, thread_id, season_id } = req.body;
 
     if (!chat_id) {
         return res.status(400).json({ error: "Missing chat_id" });
     }
 
-    let browser;
     try {
-        browser = await puppeteer.launch({
-            args: ['--no-sandbox', '--disable-setuid-sandbox']
-        });
-        const page = await browser.newPage();
-
-        // Set viewport to a wide enough desktop resolution
-        await page.setViewport({ width: 1200, height: 800, deviceScaleFactor: 2 });
-
-        const targetUrl = `http://localhost:${port}/championship?chat_id=${chat_id}&thread_id=${thread_id || 0}`;
-        await page.goto(targetUrl, { waitUntil: 'networkidle0' });
-
-        // Select the "Player Statistics" card specifically
-        const element = await page.$('#stats-card');
-        if (!element) {
-            throw new Error("Statistics card (#stats-card) not found on page.");
-        }
+        // Data is loaded only once a page slot is held, so RENDER_QUEUE_LIMIT bounds the DB work
+        // too and a request rejected with 503 has not run any queries
+        const screenshotBuffer = await browserPool.withPage(async page => {
+            // Page built in-process; the base tag only serves static css/js and fonts
+            const html = (await renderView('championship', await loadChampionship(chat_id, thread_id || 0, parseInt(season_id, 10) || 0)))
+                .replace('<head>', `<head><base href="http://localhost:${port}/">`);
+            await page.setContent(html, { waitUntil: 'networkidle0' });
+
+            // Select the "Player Statistics" card specifically
+            const element = await page.$('#stats-card');
+            if (!element) {
+                throw new Error("Statistics card (#stats-card) not found on page.");
+            }
 
-        const screenshotBuffer = await element.screenshot({
-            type: 'jpeg',
-            quality: 90,
-            encoding: 'base64'
+            return element.screenshot({
+                type: 'jpeg',
+                quality: 90,
+                encoding: 'base64'
+            });
         });
 
         res.json({ image: screenshotBuffer });
 
     } catch (err) {
+        if (err instanceof QueueFullError) {
+            return res.status(503).json({ error: err.message });
+        }
         console.error("Screenshot Error:", err);
         res.status(500).json({ error: "Failed to generate image: " + err.message });
-    } finally {
-        if (browser) {
-            await browser.close();
-        }
     }
 });
 
@@ -442,4 +458,13 @@ app.get('/api/championship/defenders', async (req, res) => {
 
 app.listen(port, () => {
     console.log(`Server running at http://localhost:${port}`);
+    // Pay the browser start-up once, before the first /table
+    browserPool.getBrowser().catch(err => console.error("Browser warm-up failed:", err.message));
 });
+
+for (const signal of ['SIGINT', 'SIGTERM']) {
+    process.on(signal, async () => {
+        await browserPool.close().catch(() => {});
+        process.exit(0);
+    });
+}
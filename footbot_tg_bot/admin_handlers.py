@@ -14,7 +14,12 @@ import keyboards as kb
 from states import LegionnaireCreate, PlayerStatEdit, MatchSettings, CaptainSelection, MatchResult, PlayerRating, MatchScoring, PairsBuilder, MatchEvents, InitialSetup
 import utils
 import translations as tr
+import draft_session as drafts
+import schedule
+from vote_tally import vote_tally
+from waitlist import waitlist
 from init_bot import bot
+from callback_router import callbacks
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -142,7 +147,7 @@ async def legionnaire_gk(message: Message, state: FSMContext):
 
 # --- PLAYER EDIT HANDLERS ---
 
-@router.callback_query(F.data.startswith("edit_player_stats_"))
+@callbacks.prefix("edit_player_stats_")
 async def start_player_edit(callback: CallbackQuery, state: FSMContext):
     pid = int(callback.data.split("_")[3])
     data = await state.get_data()
@@ -294,8 +299,8 @@ async def cmd_admin(message: Message, state: FSMContext):
         cid, tid = get_ids(message)
         lang_id = utils.get_chat_lang(cid, tid)
         sent = await message.answer(tr.t("no_admin_rights", lang_id))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, sent.message_id, delay_seconds=15))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, message.message_id, delay_seconds=15))
+        utils.schedule_delete(message.chat.id, sent.message_id, delay_seconds=15)
+        utils.schedule_delete(message.chat.id, message.message_id, delay_seconds=15)
         return
     
     cid, tid = get_ids(message)
@@ -318,8 +323,8 @@ async def cmd_admin(message: Message, state: FSMContext):
         builder = InlineKeyboardBuilder()
         builder.button(text=tr.t("go_to_settings", lang_id), url=url)
         sent = await message.reply(tr.t("admin_panel_sent", lang_id), reply_markup=builder.as_markup())
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, sent.message_id, delay_seconds=15))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, message.message_id, delay_seconds=15))
+        utils.schedule_delete(message.chat.id, sent.message_id, delay_seconds=15)
+        utils.schedule_delete(message.chat.id, message.message_id, delay_seconds=15)
     except Exception as e:
         logger.error(f"Failed to send admin panels to {user_id}: {e}")
         bot_user = await bot.get_me()
@@ -327,8 +332,8 @@ async def cmd_admin(message: Message, state: FSMContext):
         builder = InlineKeyboardBuilder()
         builder.button(text=tr.t("open_settings", lang_id), url=url)
         sent = await message.reply(tr.t("go_to_settings", lang_id), reply_markup=builder.as_markup())
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, message.message_id, delay_seconds=15))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, sent.message_id, delay_seconds=60))
+        utils.schedule_delete(message.chat.id, message.message_id, delay_seconds=15)
+        utils.schedule_delete(message.chat.id, sent.message_id, delay_seconds=60)
     
     try:
         await message.delete()
@@ -343,8 +348,8 @@ async def cmd_clear(message: Message, state: FSMContext):
         cid, tid = get_ids(message)
         lang_id = utils.get_chat_lang(cid, tid)
         sent = await message.answer(tr.t("no_admin_rights", lang_id))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, sent.message_id, delay_seconds=15))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, message.message_id, delay_seconds=15))
+        utils.schedule_delete(message.chat.id, sent.message_id, delay_seconds=15)
+        utils.schedule_delete(message.chat.id, message.message_id, delay_seconds=15)
         return
     
     # Same as process_clear but for command
@@ -360,7 +365,7 @@ async def cmd_clear(message: Message, state: FSMContext):
 
 # --- PLAYER MANAGEMENT ---
 
-@router.callback_query(F.data.startswith("admin_player_mgmt"))
+@callbacks.prefix("admin_player_mgmt")
 async def admin_player_mgmt(callback: CallbackQuery, state: FSMContext):
     logger.info(f"Player Mgmt: Received callback {callback.data} from user {callback.from_user.id}")
     
@@ -401,7 +406,7 @@ async def admin_player_mgmt(callback: CallbackQuery, state: FSMContext):
     logger.info(f"Player Mgmt: Menu displayed successfully")
     await callback.answer()
 
-@router.callback_query(F.data.startswith("admin_main_menu_back"))
+@callbacks.prefix("admin_main_menu_back")
 async def admin_main_menu_back(callback: CallbackQuery, state: FSMContext):
     parts = callback.data.split("_")
     if len(parts) >= 6:
@@ -427,7 +432,7 @@ async def admin_main_menu_back(callback: CallbackQuery, state: FSMContext):
     )
     await callback.answer()
 
-@router.callback_query(F.data.startswith("admin_mgmt_regular"))
+@callbacks.prefix("admin_mgmt_regular")
 async def admin_mgmt_regular(callback: CallbackQuery, state: FSMContext):
     # First, try to get cid/tid from state (for private chat admin panel)
     data = await state.get_data()
@@ -472,7 +477,7 @@ async def admin_mgmt_regular(callback: CallbackQuery, state: FSMContext):
         pass
     await callback.answer()
 
-@router.callback_query(F.data == "admin_add_legionnaire")
+@callbacks.exact("admin_add_legionnaire")
 async def process_quick_manage_entry(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     cid = data.get('chat_id')
@@ -509,7 +514,7 @@ async def process_quick_manage_entry(callback: CallbackQuery, state: FSMContext)
         )
         await callback.answer()
 
-@router.callback_query(F.data.startswith("admin_quick_manage_"))
+@callbacks.prefix("admin_quick_manage_")
 async def process_quick_manage_menu(callback: CallbackQuery, state: FSMContext):
     parts = callback.data.split("_")
     cid = int(parts[3])
@@ -522,7 +527,7 @@ async def process_quick_manage_menu(callback: CallbackQuery, state: FSMContext):
     )
     await callback.answer()
 
-@router.callback_query(F.data.startswith("admin_quick_add_leg_"))
+@callbacks.prefix("admin_quick_add_leg_")
 async def process_quick_add_leg(callback: CallbackQuery, state: FSMContext):
     parts = callback.data.split("_")
     cid = int(parts[4])
@@ -551,7 +556,7 @@ async def process_quick_add_leg(callback: CallbackQuery, state: FSMContext):
     )
     await callback.answer()
 
-@router.callback_query(F.data.startswith("admin_quick_add_real_"))
+@callbacks.prefix("admin_quick_add_real_")
 async def process_quick_add_real(callback: CallbackQuery, state: FSMContext):
     parts = callback.data.split("_")
     cid = int(parts[4])
@@ -585,7 +590,7 @@ async def process_quick_add_real(callback: CallbackQuery, state: FSMContext):
     )
     await callback.answer()
 
-@router.callback_query(F.data.startswith("admin_real_select_"))
+@callbacks.prefix("admin_real_select_")
 async def process_real_player_select(callback: CallbackQuery, state: FSMContext):
     parts = callback.data.split("_")
     pid = int(parts[3])
@@ -611,7 +616,7 @@ async def process_real_player_select(callback: CallbackQuery, state: FSMContext)
     await callback.message.edit_text(text, reply_markup=builder.as_markup(), parse_mode="Markdown")
     await callback.answer()
 
-@router.callback_query(F.data.startswith("real_reg_"))
+@callbacks.prefix("real_reg_")
 async def finish_real_player_registration(callback: CallbackQuery, state: FSMContext):
     parts = callback.data.split("_")
     pos = parts[2]  # att, def, or gk
@@ -669,7 +674,7 @@ async def finish_real_player_registration(callback: CallbackQuery, state: FSMCon
     )
 
 
-@router.callback_query(F.data.startswith("admin_quick_rem_list_"))
+@callbacks.prefix("admin_quick_rem_list_")
 async def process_quick_rem_list(callback: CallbackQuery, state: FSMContext):
     parts = callback.data.split("_")
     cid = int(parts[4])
@@ -686,7 +691,7 @@ async def process_quick_rem_list(callback: CallbackQuery, state: FSMContext):
     )
     await callback.answer()
 
-@router.callback_query(F.data.startswith("admin_force_rem_"))
+@callbacks.prefix("admin_force_rem_")
 async def process_force_remove(callback: CallbackQuery, state: FSMContext):
     logger.info(f"ForceRemove: {callback.data}")
     parts = callback.data.split("_")
@@ -698,7 +703,7 @@ async def process_force_remove(callback: CallbackQuery, state: FSMContext):
     
     logger.info("ForceRemove: Unregistered. Calling QueueCheck...")
     # Check queue first (so status updates to pending if promoted)
-    await utils.check_queue_promotion(cid, tid)
+    await waitlist.promote(cid, tid)
     logger.info("ForceRemove: QueueCheck done. Calling UpdatePoll...")
     
     # Update poll after queue check
@@ -707,7 +712,7 @@ async def process_force_remove(callback: CallbackQuery, state: FSMContext):
     # Refresh list
     await process_quick_rem_list(callback, state) # Go back to list
     
-@router.callback_query(F.data.startswith("admin_list_legionnaires"))
+@callbacks.prefix("admin_list_legionnaires")
 async def start_legionnaire_mgmt(callback: CallbackQuery, state: FSMContext):
     # First, try to get cid/tid from state (for private chat admin panel)
     data = await state.get_data()
@@ -741,7 +746,7 @@ async def start_legionnaire_mgmt(callback: CallbackQuery, state: FSMContext):
         parse_mode="Markdown")
     await callback.answer()
 
-@router.callback_query(F.data.startswith("sel_reg_"))
+@callbacks.prefix("sel_reg_")
 async def sel_reg_player(callback: CallbackQuery, state: FSMContext):
     pid = int(callback.data.split("_")[2])
     data = await state.get_data()
@@ -773,7 +778,8 @@ async def sel_reg_player(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text(text, reply_markup=builder.as_markup(), parse_mode="Markdown")
     await callback.answer()
 
-@router.callback_query(F.data.in_({"create_new_legionnaire", "create_new_legionnaire_admin"}))
+@callbacks.exact("create_new_legionnaire")
+@callbacks.exact("create_new_legionnaire_admin")
 async def create_new_legionnaire_cb(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     cid = data.get('chat_id')
@@ -790,7 +796,7 @@ async def create_new_legionnaire_cb(callback: CallbackQuery, state: FSMContext):
     await state.set_state(LegionnaireCreate.waiting_for_name)
     await callback.answer()
 
-@router.callback_query(F.data.startswith("sel_myth_"))
+@callbacks.prefix("sel_myth_")
 async def sel_myth_cb(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     cid = data.get('chat_id')
@@ -812,7 +818,7 @@ async def sel_myth_cb(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text(tr.t("adding_legionnaire", lang_id).format(name=p[2]), reply_markup=builder.as_markup(), parse_mode="Markdown")
     await callback.answer()
 
-@router.callback_query(F.data.startswith("adm_myth_edit_"))
+@callbacks.prefix("adm_myth_edit_")
 async def adm_myth_edit_cb(callback: CallbackQuery, state: FSMContext):
     pid = int(callback.data.split("_")[3])
     data = await state.get_data()
@@ -845,7 +851,7 @@ async def adm_myth_edit_cb(callback: CallbackQuery, state: FSMContext):
 
 
 
-@router.callback_query(F.data.startswith("admin_core_team_"))
+@callbacks.prefix("admin_core_team_")
 async def show_core_team_menu(callback: CallbackQuery, state: FSMContext):
     """Show Core Team submenu"""
     logger.info(f"Core Team Menu: Received callback {callback.data} from user {callback.from_user.id}")
@@ -875,7 +881,7 @@ async def show_core_team_menu(callback: CallbackQuery, state: FSMContext):
     logger.info(f"Core Team Menu: Menu displayed successfully")
     await callback.answer()
 
-@router.callback_query(F.data.startswith("toggle_core_mode_"))
+@callbacks.prefix("toggle_core_mode_")
 async def toggle_core_team_mode(callback: CallbackQuery, state: FSMContext):
     """Toggle Core Team mode on/off"""
     logger.info(f"Toggle Core Mode: Received callback {callback.data} from user {callback.from_user.id}")
@@ -917,7 +923,7 @@ async def toggle_core_team_mode(callback: CallbackQuery, state: FSMContext):
         pass  # Message content didn't change
     await callback.answer()
 
-@router.callback_query(F.data.startswith("select_core_players_"))
+@callbacks.prefix("select_core_players_")
 async def show_core_players_selection(callback: CallbackQuery, state: FSMContext):
     """Show bulk player selection interface"""
     logger.info(f"Core Players Selection: Received callback {callback.data} from user {callback.from_user.id}")
@@ -945,7 +951,7 @@ async def show_core_players_selection(callback: CallbackQuery, state: FSMContext
     logger.info(f"Core Players Selection: Menu displayed successfully")
     await callback.answer()
 
-@router.callback_query(F.data.startswith("toggle_player_core_"))
+@callbacks.prefix("toggle_player_core_")
 async def toggle_player_core_bulk(callback: CallbackQuery, state: FSMContext):
     """Toggle player Core status from bulk selection interface"""
     logger.info(f"Toggle Player Core: Received callback {callback.data} from user {callback.from_user.id}")
@@ -986,7 +992,7 @@ async def toggle_player_core_bulk(callback: CallbackQuery, state: FSMContext):
         pass  # Message content didn't change
     await callback.answer()
 
-@router.callback_query(F.data.startswith("myth_reg_"))
+@callbacks.prefix("myth_reg_")
 async def finish_legionnaire(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     cid = data.get('chat_id') or callback.message.chat.id
@@ -1100,7 +1106,7 @@ async def show_admin_settings_menu(message: Message, state: FSMContext):
     
     await message.answer(text, reply_markup=kb.get_admin_settings_kb(cid, tid, lang_id), parse_mode="Markdown")
 
-@router.callback_query(F.data.startswith("admin_match_settings"))
+@callbacks.prefix("admin_match_settings")
 async def process_admin_settings(callback: CallbackQuery, state: FSMContext):
     # First, try to get cid/tid from state (for private chat admin panel)
     data = await state.get_data()
@@ -1126,7 +1132,46 @@ async def process_admin_settings(callback: CallbackQuery, state: FSMContext):
     await show_admin_settings_menu(callback.message, state)
     await callback.answer()
 
-@router.callback_query(F.data.startswith("admin_bot_settings"))
+async def _cancel_game_target(callback: CallbackQuery, state: FSMContext, base_parts: int):
+    """cid/tid from {prefix}_{cid}_{tid} of the private admin panel, else from state or the chat"""
+    data = await state.get_data()
+    cid = data.get('chat_id')
+    tid = data.get('thread_id', 0)
+    if not cid:
+        cid, tid = get_ids(callback)
+    parts = callback.data.split("_")
+    if len(parts) >= base_parts + 2:
+        try:
+            cid = int(parts[base_parts])
+            tid = int(parts[base_parts + 1])
+        except ValueError: pass
+    return cid, tid
+
+@callbacks.prefix("admin_clear")
+async def admin_cancel_game(callback: CallbackQuery, state: FSMContext):
+    """Asks for confirmation before the game is reset"""
+    cid, tid = await _cancel_game_target(callback, state, 2)
+    lang_id = utils.get_chat_lang(cid, tid)
+    if not await utils.is_admin(callback, state):
+        return await callback.answer(tr.t("no_admin_rights", lang_id), show_alert=True)
+    await callback.message.edit_text(
+        tr.t("cancel_game_confirm", lang_id),
+        reply_markup=kb.get_cancel_game_confirm_kb(cid, tid, lang_id)
+    )
+    await callback.answer()
+
+@callbacks.prefix("cancel_game_yes")
+async def admin_cancel_game_confirmed(callback: CallbackQuery, state: FSMContext):
+    cid, tid = await _cancel_game_target(callback, state, 3)
+    lang_id = utils.get_chat_lang(cid, tid)
+    if not await utils.is_admin(callback, state):
+        return await callback.answer(tr.t("no_admin_rights", lang_id), show_alert=True)
+    # Same reset as /clear
+    utils.perform_full_clear(cid, tid)
+    await callback.message.edit_text(tr.t("match_cleared", lang_id))
+    await callback.answer()
+
+@callbacks.prefix("admin_bot_settings")
 async def process_admin_bot_settings(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     cid = data.get('chat_id') or callback.message.chat.id
@@ -1150,7 +1195,7 @@ async def process_admin_bot_settings(callback: CallbackQuery, state: FSMContext)
     await callback.message.edit_text(text, reply_markup=kb.get_admin_bot_settings_kb(cid, tid, lang_id), parse_mode="Markdown")
     await callback.answer()
 
-@router.callback_query(F.data.startswith("admin_payment"))
+@callbacks.prefix("admin_payment")
 async def process_admin_payment(callback: CallbackQuery, state: FSMContext):
     # First, try to get cid/tid from state (for private chat admin panel)
     data = await state.get_data()
@@ -1190,12 +1235,12 @@ async def process_admin_payment(callback: CallbackQuery, state: FSMContext):
         pass  # Message content didn't change
     await callback.answer()
 
-@router.callback_query(F.data.startswith("edit_cost_start_payment"))
+@callbacks.prefix("edit_cost_start_payment")
 async def edit_cost_payment(callback: CallbackQuery, state: FSMContext):
     await state.update_data(cost_from="payment")
     await edit_cost_start(callback, state)
 
-@router.callback_query(F.data.startswith("admin_edit_pay_details"))
+@callbacks.prefix("admin_edit_pay_details")
 async def edit_payment_details_start(callback: CallbackQuery, state: FSMContext):
     """Start FSM for entering payment details"""
     data = await state.get_data()
@@ -1244,7 +1289,7 @@ async def process_payment_details(message: Message, state: FSMContext):
     
     await message.answer(text, reply_markup=kb.get_admin_payment_kb(cid, tid, lang_id, settings), parse_mode="Markdown")
 
-@router.callback_query(F.data.startswith("toggle_remind_"))
+@callbacks.prefix("toggle_remind_")
 async def toggle_reminder(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     cid = data.get('chat_id') or callback.message.chat.id
@@ -1255,7 +1300,7 @@ async def toggle_reminder(callback: CallbackQuery, state: FSMContext):
     db.update_match_settings(cid, tid, key, new_val)
     await process_admin_payment(callback, state)
 
-@router.callback_query(F.data.startswith("toggle_track_"))
+@callbacks.prefix("toggle_track_")
 async def toggle_tracking_setting(callback: CallbackQuery, state: FSMContext):
     """Toggle match event tracking settings (goals, goal_times, cards, card_times, best_defender)"""
     parts = callback.data.split("_")
@@ -1301,7 +1346,7 @@ async def toggle_tracking_setting(callback: CallbackQuery, state: FSMContext):
 
 
 
-@router.callback_query(F.data.startswith("rating_settings_menu_"))
+@callbacks.prefix("rating_settings_menu_")
 async def open_rating_settings_menu(callback: CallbackQuery, state: FSMContext):
     """Open rating system settings submenu"""
     parts = callback.data.split("_")
@@ -1317,7 +1362,7 @@ async def open_rating_settings_menu(callback: CallbackQuery, state: FSMContext):
         pass
     await callback.answer()
 
-@router.callback_query(F.data.startswith("rating_settings_back_"))
+@callbacks.prefix("rating_settings_back_")
 async def rating_settings_back(callback: CallbackQuery, state: FSMContext):
     """Return from rating settings submenu to main bot settings"""
     parts = callback.data.split("_")
@@ -1334,7 +1379,7 @@ async def rating_settings_back(callback: CallbackQuery, state: FSMContext):
         pass
     await callback.answer()
 
-@router.callback_query(F.data.startswith("set_rating_mode_"))
+@callbacks.prefix("set_rating_mode_")
 async def set_rating_mode(callback: CallbackQuery, state: FSMContext):
     """Set rating mode (ranked/top3/scale5/disabled)"""
     parts = callback.data.split("_")
@@ -1355,7 +1400,7 @@ async def set_rating_mode(callback: CallbackQuery, state: FSMContext):
         pass
     await callback.answer(tr.t("settings_applied", lang_id))
 
-@router.callback_query(F.data.startswith("payment_settings_menu_"))
+@callbacks.prefix("payment_settings_menu_")
 async def open_payment_settings_menu(callback: CallbackQuery, state: FSMContext):
     """Open payment system settings submenu"""
     parts = callback.data.split("_")
@@ -1371,7 +1416,7 @@ async def open_payment_settings_menu(callback: CallbackQuery, state: FSMContext)
         pass
     await callback.answer()
 
-@router.callback_query(F.data.startswith("open_cost_settings"))
+@callbacks.prefix("open_cost_settings")
 async def open_cost_settings(callback: CallbackQuery, state: FSMContext):
     """Open cost settings submenu"""
     data = await state.get_data()
@@ -1388,7 +1433,7 @@ async def open_cost_settings(callback: CallbackQuery, state: FSMContext):
         pass
     await callback.answer()
 
-@router.callback_query(F.data.startswith("set_cost_mode_price_"))
+@callbacks.prefix("set_cost_mode_price_")
 async def set_cost_mode_price(callback: CallbackQuery, state: FSMContext):
     """Set cost mode from Price Settings submenu"""
     parts = callback.data.split("_")
@@ -1410,7 +1455,7 @@ async def set_cost_mode_price(callback: CallbackQuery, state: FSMContext):
         pass
     await callback.answer(tr.t("settings_applied", lang_id))
 
-@router.callback_query(F.data.startswith("admin_payment_menu_back"))
+@callbacks.prefix("admin_payment_menu_back")
 async def admin_payment_menu_back(callback: CallbackQuery, state: FSMContext):
     """Return from cost settings to payment settings"""
     data = await state.get_data()
@@ -1419,7 +1464,7 @@ async def admin_payment_menu_back(callback: CallbackQuery, state: FSMContext):
     
     await process_admin_payment(callback, state)  # Reuse existing handler to show payment menu
 
-@router.callback_query(F.data.startswith("payment_settings_back_"))
+@callbacks.prefix("payment_settings_back_")
 async def payment_settings_back(callback: CallbackQuery, state: FSMContext):
     """Return from payment settings submenu to main bot settings"""
     parts = callback.data.split("_")
@@ -1433,7 +1478,7 @@ async def payment_settings_back(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text(text, reply_markup=kb.get_admin_bot_settings_kb(cid, tid, lang_id, settings), parse_mode="Markdown")
     await callback.answer()
 
-@router.callback_query(F.data.startswith("set_cost_mode_"))
+@callbacks.prefix("set_cost_mode_")
 async def set_cost_mode(callback: CallbackQuery, state: FSMContext):
     """Set cost mode (fixed_player/fixed_game)"""
     parts = callback.data.split("_")
@@ -1451,7 +1496,7 @@ async def set_cost_mode(callback: CallbackQuery, state: FSMContext):
 
 
 
-@router.callback_query(F.data.startswith("toggle_payment_confirmation"))
+@callbacks.prefix("toggle_payment_confirmation")
 async def toggle_payment_confirmation(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     cid = data.get('chat_id') or callback.message.chat.id
@@ -1463,7 +1508,7 @@ async def toggle_payment_confirmation(callback: CallbackQuery, state: FSMContext
     await state.update_data(settings_updated=True)
     await process_admin_payment(callback, state)
 
-@router.callback_query(F.data == "pay_self")
+@callbacks.exact("pay_self")
 async def process_pay_self(callback: CallbackQuery, state: FSMContext):
     """Handler for single 'I Paid' button - player marks themselves as paid"""
     cid, tid = get_ids(callback.message)
@@ -1491,7 +1536,7 @@ async def process_pay_self(callback: CallbackQuery, state: FSMContext):
     # Refresh poll - use the message_id from the callback (the poll message itself)
     await utils.update_poll_message(chat_id=cid, thread_id=tid, message_id=callback.message.message_id)
 
-@router.callback_query(F.data == "pay_self_reminder")
+@callbacks.exact("pay_self_reminder")
 async def process_pay_self_reminder(callback: CallbackQuery, state: FSMContext):
     """Handler for 'I Paid' button in payment reminder message"""
     cid, tid = get_ids(callback.message)
@@ -1519,7 +1564,7 @@ async def process_pay_self_reminder(callback: CallbackQuery, state: FSMContext):
     # Refresh payment reminder message
     await refresh_payment_reminder(callback.message, cid, tid, lang_id)
 
-@router.callback_query(F.data.regexp(r"^confirm_payment_\d+$"))
+@callbacks.prefix("confirm_payment_", pattern=r"^confirm_payment_\d+$")
 async def process_confirm_payment(callback: CallbackQuery, state: FSMContext):
     """Handler for admin confirmation buttons in payment reminder"""
     cid, tid = get_ids(callback.message)
@@ -1557,7 +1602,7 @@ async def process_confirm_payment(callback: CallbackQuery, state: FSMContext):
     # Refresh payment reminder message
     await refresh_payment_reminder(callback.message, cid, tid, lang_id)
 
-@router.callback_query(F.data.startswith("pay_legionnaire_"))
+@callbacks.prefix("pay_legionnaire_")
 async def process_pay_legionnaire(callback: CallbackQuery, state: FSMContext):
     """Handler for legionnaire payment buttons (when no admin confirmation required)"""
     cid, tid = get_ids(callback.message)
@@ -1619,10 +1664,10 @@ async def refresh_payment_reminder(message, cid, tid, lang_id):
             await message.answer(tr.t("all_paid", lang_id))
             
             # Check if ratings are done
-            draft_data = db.get_draft_state(cid, tid)
+            draft_data = drafts.get(cid, tid)
             if draft_data and draft_data.get('ratings_done'):
                  db.update_match_settings(cid, tid, "is_active", 0)
-                 db.clear_draft_state(cid, tid)
+                 drafts.clear(cid, tid)
                  db.clear_registrations(cid, tid)
                  await message.answer(tr.t("match_finished_full", lang_id))
         except:
@@ -1664,7 +1709,7 @@ async def refresh_payment_reminder(message, cid, tid, lang_id):
     except:
         pass
 
-@router.callback_query(F.data.startswith("pay_claim_"))
+@callbacks.prefix("pay_claim_")
 async def process_pay_claim(callback: CallbackQuery, state: FSMContext):
     pid = int(callback.data.split("_")[2])
     cid, tid = get_ids(callback.message)
@@ -1683,7 +1728,7 @@ async def process_pay_claim(callback: CallbackQuery, state: FSMContext):
     # Refresh poll or wherever it was
     await utils.update_poll_message(chat_id=cid, thread_id=tid)
 
-@router.callback_query(F.data.startswith("pay_confirm_"))
+@callbacks.prefix("pay_confirm_")
 async def process_pay_confirm(callback: CallbackQuery, state: FSMContext):
     cid, tid = get_ids(callback.message)
     lang_id = utils.get_chat_lang(cid, tid)
@@ -1695,7 +1740,7 @@ async def process_pay_confirm(callback: CallbackQuery, state: FSMContext):
     await callback.answer(tr.t("payment_confirmed", lang_id).format(name=p_info[2]))
     await utils.update_poll_message(chat_id=cid, thread_id=tid)
 
-@router.callback_query(F.data == "edit_championship_start")
+@callbacks.exact("edit_championship_start")
 async def edit_championship_start(callback: CallbackQuery, state: FSMContext):
     cid, tid = get_ids(callback)
     lang_id = utils.get_chat_lang(cid, tid)
@@ -1724,7 +1769,7 @@ async def process_championship_edit(message: Message, state: FSMContext):
     await message.answer(tr.t("settings_saved", lang_id))
     await state.clear()
 
-@router.callback_query(F.data == "admin_mgmt_regular")
+# Unreachable before the callback dispatcher too: the admin_mgmt_regular prefix route above wins
 async def admin_mgmt_regular(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     cid = data.get('chat_id') or callback.message.chat.id
@@ -1739,7 +1784,7 @@ async def admin_mgmt_regular(callback: CallbackQuery, state: FSMContext):
     except Exception:
         await callback.answer()
 
-@router.callback_query(F.data.startswith("edit_bot_lang"))
+@callbacks.prefix("edit_bot_lang")
 async def edit_bot_language(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     cid = data.get('chat_id') or callback.message.chat.id
@@ -1751,7 +1796,7 @@ async def edit_bot_language(callback: CallbackQuery, state: FSMContext):
         pass # Message is not modified, no need to update
     await callback.answer()
 
-@router.callback_query(F.data.startswith("set_lang_"))
+@callbacks.prefix("set_lang_")
 async def process_language_selection(callback: CallbackQuery, state: FSMContext):
     parts = callback.data.split("_")
     lang_id = int(parts[2])
@@ -1781,7 +1826,7 @@ async def process_language_selection(callback: CallbackQuery, state: FSMContext)
         await state.update_data(chat_id=cid, thread_id=tid)
         await process_admin_bot_settings(callback, state)
 
-@router.callback_query(F.data.startswith("lang_"))
+@callbacks.prefix("lang_")
 async def process_lang_select_group(callback: CallbackQuery, state: FSMContext):
     cid, tid = get_ids(callback)
     lang_id = int(callback.data.split("_")[1])
@@ -1815,8 +1860,8 @@ async def process_initial_player_count(message: Message, state: FSMContext):
         
         # Delete previous bot message and user's input
         if data.get('last_bot_msg_id'):
-            asyncio.create_task(utils.auto_delete_message(cid, data['last_bot_msg_id'], delay_seconds=2))
-        asyncio.create_task(utils.auto_delete_message(cid, message.message_id, delay_seconds=2))
+            utils.schedule_delete(cid, data['last_bot_msg_id'], delay_seconds=2)
+        utils.schedule_delete(cid, message.message_id, delay_seconds=2)
         
         msg = await message.answer(tr.t("initial_setup_timezone", lang_id), reply_markup=kb.get_timezone_kb())
         
@@ -1830,7 +1875,7 @@ async def process_initial_player_count(message: Message, state: FSMContext):
 
         await message.answer(tr.t("initial_setup_count_error", lang_id))
 
-@router.callback_query(InitialSetup.waiting_for_timezone)
+@callbacks.state(InitialSetup.waiting_for_timezone)
 async def process_initial_timezone(callback: CallbackQuery, state: FSMContext):
     cid, tid = get_ids(callback)
     lang_id = utils.get_chat_lang(cid, tid)
@@ -1841,7 +1886,7 @@ async def process_initial_timezone(callback: CallbackQuery, state: FSMContext):
         
         # Delete previous bot message
         if data.get('last_bot_msg_id'):
-            asyncio.create_task(utils.auto_delete_message(cid, data['last_bot_msg_id'], delay_seconds=2))
+            utils.schedule_delete(cid, data['last_bot_msg_id'], delay_seconds=2)
         
         # Ask for Match DAY
         msg = await callback.message.answer(tr.t("initial_setup_day", lang_id), reply_markup=kb.get_day_selection_kb(lang_id))
@@ -1851,7 +1896,7 @@ async def process_initial_timezone(callback: CallbackQuery, state: FSMContext):
     else:
         await callback.answer("Error")
 
-@router.callback_query(InitialSetup.waiting_for_match_day)
+@callbacks.state(InitialSetup.waiting_for_match_day)
 async def process_initial_match_day(callback: CallbackQuery, state: FSMContext):
     cid, tid = get_ids(callback)
     lang_id = utils.get_chat_lang(cid, tid)
@@ -1863,7 +1908,7 @@ async def process_initial_match_day(callback: CallbackQuery, state: FSMContext):
         
         # Delete previous bot message
         if data.get('last_bot_msg_id'):
-            asyncio.create_task(utils.auto_delete_message(cid, data['last_bot_msg_id'], delay_seconds=2))
+            utils.schedule_delete(cid, data['last_bot_msg_id'], delay_seconds=2)
         
         # Next: Hour
         msg = await callback.message.answer(tr.t("initial_setup_hour", lang_id), reply_markup=kb.get_hour_selection_kb())
@@ -1871,7 +1916,7 @@ async def process_initial_match_day(callback: CallbackQuery, state: FSMContext):
         await state.set_state(InitialSetup.waiting_for_match_times)
         await callback.answer()
 
-@router.callback_query(InitialSetup.waiting_for_match_times)
+@callbacks.state(InitialSetup.waiting_for_match_times)
 async def process_initial_match_time(callback: CallbackQuery, state: FSMContext):
     cid, tid = get_ids(callback)
     lang_id = utils.get_chat_lang(cid, tid)
@@ -1891,11 +1936,12 @@ async def process_initial_match_time(callback: CallbackQuery, state: FSMContext)
         
         # Save as match_times (string format: "day hour:minute", e.g. "sat 20:00")
         time_str = f"{day} {hour}:{minute}"
-        db.update_match_settings(cid, tid, 'match_times', time_str)
+        current = db.get_match_settings(cid, tid).get('match_times')
+        db.update_match_settings(cid, tid, 'match_times', schedule.replace_weekly(current, time_str))
         
         # Delete previous bot message
         if data.get('last_bot_msg_id'):
-            asyncio.create_task(utils.auto_delete_message(cid, data['last_bot_msg_id'], delay_seconds=2))
+            utils.schedule_delete(cid, data['last_bot_msg_id'], delay_seconds=2)
         
         # Next: Skill Level
         msg = await callback.message.answer(tr.t("initial_setup_skill", lang_id), reply_markup=kb.get_skill_level_kb(lang_id))
@@ -1903,7 +1949,7 @@ async def process_initial_match_time(callback: CallbackQuery, state: FSMContext)
         await state.set_state(InitialSetup.waiting_for_skill_level)
         await callback.answer()
 
-@router.callback_query(InitialSetup.waiting_for_skill_level)
+@callbacks.state(InitialSetup.waiting_for_skill_level)
 async def process_initial_skill(callback: CallbackQuery, state: FSMContext):
     cid, tid = get_ids(callback)
     lang_id = utils.get_chat_lang(cid, tid)
@@ -1915,7 +1961,7 @@ async def process_initial_skill(callback: CallbackQuery, state: FSMContext):
         
         # Delete previous bot message
         if data.get('last_bot_msg_id'):
-            asyncio.create_task(utils.auto_delete_message(cid, data['last_bot_msg_id'], delay_seconds=2))
+            utils.schedule_delete(cid, data['last_bot_msg_id'], delay_seconds=2)
         
         # Next: Age Group
         msg = await callback.message.answer(tr.t("initial_setup_age", lang_id), reply_markup=kb.get_age_group_kb(lang_id))
@@ -1923,7 +1969,7 @@ async def process_initial_skill(callback: CallbackQuery, state: FSMContext):
         await state.set_state(InitialSetup.waiting_for_age_group)
         await callback.answer()
 
-@router.callback_query(InitialSetup.waiting_for_age_group)
+@callbacks.state(InitialSetup.waiting_for_age_group)
 async def process_initial_age(callback: CallbackQuery, state: FSMContext):
     cid, tid = get_ids(callback)
     lang_id = utils.get_chat_lang(cid, tid)
@@ -1935,7 +1981,7 @@ async def process_initial_age(callback: CallbackQuery, state: FSMContext):
         
         # Delete previous bot message
         if data.get('last_bot_msg_id'):
-            asyncio.create_task(utils.auto_delete_message(cid, data['last_bot_msg_id'], delay_seconds=2))
+            utils.schedule_delete(cid, data['last_bot_msg_id'], delay_seconds=2)
         
         # Next: Gender
         msg = await callback.message.answer(tr.t("initial_setup_gender", lang_id), reply_markup=kb.get_gender_kb(lang_id))
@@ -1943,7 +1989,7 @@ async def process_initial_age(callback: CallbackQuery, state: FSMContext):
         await state.set_state(InitialSetup.waiting_for_gender)
         await callback.answer()
 
-@router.callback_query(InitialSetup.waiting_for_gender)
+@callbacks.state(InitialSetup.waiting_for_gender)
 async def process_initial_gender(callback: CallbackQuery, state: FSMContext):
     cid, tid = get_ids(callback)
     lang_id = utils.get_chat_lang(cid, tid)
@@ -1955,7 +2001,7 @@ async def process_initial_gender(callback: CallbackQuery, state: FSMContext):
         
         # Delete previous bot message
         if data.get('last_bot_msg_id'):
-            asyncio.create_task(utils.auto_delete_message(cid, data['last_bot_msg_id'], delay_seconds=2))
+            utils.schedule_delete(cid, data['last_bot_msg_id'], delay_seconds=2)
         
         # Next: Venue Type
         msg = await callback.message.answer(tr.t("initial_setup_venue", lang_id), reply_markup=kb.get_venue_type_kb(lang_id))
@@ -1963,7 +2009,7 @@ async def process_initial_gender(callback: CallbackQuery, state: FSMContext):
         await state.set_state(InitialSetup.waiting_for_venue)
         await callback.answer()
 
-@router.callback_query(InitialSetup.waiting_for_venue)
+@callbacks.state(InitialSetup.waiting_for_venue)
 async def process_initial_venue(callback: CallbackQuery, state: FSMContext):
     cid, tid = get_ids(callback)
     lang_id = utils.get_chat_lang(cid, tid)
@@ -1975,7 +2021,7 @@ async def process_initial_venue(callback: CallbackQuery, state: FSMContext):
         # Delete previous bot message with buttons
         data = await state.get_data()
         if data.get('last_bot_msg_id'):
-            asyncio.create_task(utils.auto_delete_message(cid, data['last_bot_msg_id'], delay_seconds=2))
+            utils.schedule_delete(cid, data['last_bot_msg_id'], delay_seconds=2)
         
         # Next: Cost (Message)
         sent = await callback.message.answer(tr.t("initial_setup_cost", lang_id))
@@ -1994,8 +2040,8 @@ async def process_initial_cost(message: Message, state: FSMContext):
     
     # Delete previous bot message and user's input
     if data.get('last_bot_msg_id'):
-        asyncio.create_task(utils.auto_delete_message(cid, data['last_bot_msg_id'], delay_seconds=2))
-    asyncio.create_task(utils.auto_delete_message(cid, message.message_id, delay_seconds=2))
+        utils.schedule_delete(cid, data['last_bot_msg_id'], delay_seconds=2)
+    utils.schedule_delete(cid, message.message_id, delay_seconds=2)
     
     # Next: Championship Name
     msg = await message.answer(tr.t("initial_setup_championship", lang_id))
@@ -2017,24 +2063,24 @@ async def process_initial_championship(message: Message, state: FSMContext):
     
     # Delete previous bot message and user's input
     if data.get('last_bot_msg_id'):
-        asyncio.create_task(utils.auto_delete_message(cid, data['last_bot_msg_id'], delay_seconds=2))
-    asyncio.create_task(utils.auto_delete_message(cid, message.message_id, delay_seconds=2))
+        utils.schedule_delete(cid, data['last_bot_msg_id'], delay_seconds=2)
+    utils.schedule_delete(cid, message.message_id, delay_seconds=2)
     
     # FINISH
     complete_msg = await message.answer(tr.t("initial_setup_complete", lang_id))
     await state.clear()
     
     # Auto-delete completion message after 2 minutes
-    asyncio.create_task(utils.auto_delete_message(cid, complete_msg.message_id, delay_seconds=120))
+    utils.schedule_delete(cid, complete_msg.message_id, delay_seconds=120)
     
     # Show main menu or welcome
     await asyncio.sleep(2)
     welcome_msg = await message.answer(tr.t("welcome_msg_admin", lang_id))
     # Auto-delete welcome message after 2 minutes
-    asyncio.create_task(utils.auto_delete_message(cid, welcome_msg.message_id, delay_seconds=120))
+    utils.schedule_delete(cid, welcome_msg.message_id, delay_seconds=120)
 
 
-@router.callback_query(F.data.startswith("process_settings_done"))
+@callbacks.prefix("process_settings_done")
 async def process_settings_done(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     cid = data.get('chat_id')
@@ -2048,7 +2094,7 @@ async def process_settings_done(callback: CallbackQuery, state: FSMContext):
     await admin_main_menu_back(callback, state)
     await callback.answer()
 
-@router.callback_query(F.data.startswith("edit_count_start"))
+@callbacks.prefix("edit_count_start")
 async def edit_count_start(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     lang_id = utils.get_chat_lang(data.get('chat_id'), data.get('thread_id'))
@@ -2057,7 +2103,7 @@ async def edit_count_start(callback: CallbackQuery, state: FSMContext):
     await state.set_state(MatchSettings.waiting_for_player_count)
     await callback.answer()
 
-@router.callback_query(F.data.startswith("edit_skill_start"))
+@callbacks.prefix("edit_skill_start")
 async def edit_skill_start(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     lang_id = utils.get_chat_lang(data.get('chat_id'), data.get('thread_id'))
@@ -2065,7 +2111,7 @@ async def edit_skill_start(callback: CallbackQuery, state: FSMContext):
     await state.set_state(MatchSettings.waiting_for_skill_level)
     await callback.answer()
 
-@router.callback_query(F.data.startswith("edit_age_start"))
+@callbacks.prefix("edit_age_start")
 async def edit_age_start(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     lang_id = utils.get_chat_lang(data.get('chat_id'), data.get('thread_id'))
@@ -2073,7 +2119,7 @@ async def edit_age_start(callback: CallbackQuery, state: FSMContext):
     await state.set_state(MatchSettings.waiting_for_age_group)
     await callback.answer()
 
-@router.callback_query(F.data.startswith("edit_gender_start"))
+@callbacks.prefix("edit_gender_start")
 async def edit_gender_start(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     lang_id = utils.get_chat_lang(data.get('chat_id'), data.get('thread_id'))
@@ -2081,7 +2127,7 @@ async def edit_gender_start(callback: CallbackQuery, state: FSMContext):
     await state.set_state(MatchSettings.waiting_for_gender)
     await callback.answer()
 
-@router.callback_query(F.data.startswith("edit_cost_start"))
+@callbacks.prefix("edit_cost_start")
 async def edit_cost_start(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     lang_id = utils.get_chat_lang(data.get('chat_id'), data.get('thread_id'))
@@ -2090,7 +2136,7 @@ async def edit_cost_start(callback: CallbackQuery, state: FSMContext):
     await state.set_state(MatchSettings.waiting_for_cost)
     await callback.answer()
 
-@router.callback_query(F.data.startswith("edit_venue_start"))
+@callbacks.prefix("edit_venue_start")
 async def edit_venue_start(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     lang_id = utils.get_chat_lang(data.get('chat_id'), data.get('thread_id'))
@@ -2098,12 +2144,12 @@ async def edit_venue_start(callback: CallbackQuery, state: FSMContext):
     await state.set_state(MatchSettings.waiting_for_venue)
     await callback.answer()
 
-@router.callback_query(F.data.startswith("edit_location_start"))
+@callbacks.prefix("edit_location_start")
 async def edit_location_start(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     lang_id = utils.get_chat_lang(data.get('chat_id'), data.get('thread_id'))
     markup = InlineKeyboardBuilder()
-    markup.button(text=tr.t("btn_back", lang_id), callback_data="process_admin_settings")
+    markup.button(text=tr.t("btn_back", lang_id), callback_data="admin_match_settings")
     sent = await callback.message.answer(tr.t("ask_location", lang_id), reply_markup=markup.as_markup())
     await utils.track_msg(state, sent.message_id)
     await state.set_state(MatchSettings.waiting_for_location)
@@ -2126,7 +2172,7 @@ async def process_location(message: Message, state: FSMContext):
     else:
         await message.answer(tr.t("error_send_location", lang_id))
 
-@router.callback_query(F.data.startswith("edit_time_group"))
+@callbacks.prefix("edit_time_group")
 async def edit_time_group(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     cid = data.get('chat_id')
@@ -2135,14 +2181,14 @@ async def edit_time_group(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text(tr.t("timesettingstitle", lang_id), reply_markup=kb.get_admin_time_settings_kb(cid, tid, lang_id), parse_mode="Markdown")
     await callback.answer()
 
-@router.callback_query(F.data.startswith("edit_timezone_start"))
+@callbacks.prefix("edit_timezone_start")
 async def edit_timezone_start(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     lang_id = utils.get_chat_lang(data.get('chat_id'), data.get('thread_id'))
     await callback.message.edit_text(tr.t("choose_timezone", lang_id), reply_markup=kb.get_timezone_kb())
     await callback.answer()
 
-@router.callback_query(F.data.startswith("set_tz_"))
+@callbacks.prefix("set_tz_")
 async def process_timezone_cb(callback: CallbackQuery, state: FSMContext):
     tz = callback.data.replace("set_tz_", "")
     data = await state.get_data()
@@ -2160,14 +2206,14 @@ async def process_timezone_cb(callback: CallbackQuery, state: FSMContext):
     await callback.answer(f"Timezone: {tz}")
     await edit_time_group(callback, state)
 
-@router.callback_query(F.data.startswith("edit_times_start"))
+@callbacks.prefix("edit_times_start")
 async def edit_times_start(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     lang_id = utils.get_chat_lang(data.get('chat_id'), data.get('thread_id'))
     await callback.message.edit_text(tr.t("choose_day", lang_id), reply_markup=kb.get_day_selection_kb(lang_id))
     await callback.answer()
 
-@router.callback_query(F.data.startswith("set_day_"))
+@callbacks.prefix("set_day_")
 async def process_times_day(callback: CallbackQuery, state: FSMContext):
     day = callback.data.split("_")[2]
     await state.update_data(temp_day=day)
@@ -2176,7 +2222,7 @@ async def process_times_day(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text(tr.t("choose_hour", lang_id), reply_markup=kb.get_hour_selection_kb())
     await callback.answer()
 
-@router.callback_query(F.data.startswith("set_hour_"))
+@callbacks.prefix("set_hour_")
 async def process_times_hour(callback: CallbackQuery, state: FSMContext):
     hour = callback.data.split("_")[2]
     await state.update_data(temp_hour=hour)
@@ -2185,7 +2231,7 @@ async def process_times_hour(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text(tr.t("choose_min", lang_id), reply_markup=kb.get_min_selection_kb())
     await callback.answer()
 
-@router.callback_query(F.data.startswith("set_min_"))
+@callbacks.prefix("set_min_")
 async def process_times_min(callback: CallbackQuery, state: FSMContext):
     minute = callback.data.split("_")[2]
     data = await state.get_data()
@@ -2195,13 +2241,15 @@ async def process_times_min(callback: CallbackQuery, state: FSMContext):
     hour = data['temp_hour']
     lang_id = utils.get_chat_lang(cid, tid)
     time_str = f"{day} {hour}:{minute}"
-    db.update_match_settings(cid, tid, "match_times", time_str)
+    # Replaces the weekly slots, one-off dates set with /schedule stay
+    current = db.get_match_settings(cid, tid).get('match_times')
+    db.update_match_settings(cid, tid, "match_times", schedule.replace_weekly(current, time_str))
     # For user feedback, we can still show translated
     user_time_str = f"{tr.t('wd_'+day, lang_id)}, {hour}:{minute}"
     await callback.answer(f"Time: {user_time_str}")
     await edit_time_group(callback, state)
 
-@router.callback_query(F.data.startswith("edit_season_group"))
+@callbacks.prefix("edit_season_group")
 async def edit_season_group(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     cid = data.get('chat_id')
@@ -2210,7 +2258,7 @@ async def edit_season_group(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_text(tr.t("title_season_settings", lang_id), reply_markup=kb.get_admin_season_settings_kb(cid, tid, lang_id), parse_mode="Markdown")
     await callback.answer()
 
-@router.callback_query(F.data.startswith("edit_season_start_cb"))
+@callbacks.prefix("edit_season_start_cb")
 async def edit_season_start_cb(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     lang_id = utils.get_chat_lang(data.get('chat_id'), data.get('thread_id'))
@@ -2219,7 +2267,7 @@ async def edit_season_start_cb(callback: CallbackQuery, state: FSMContext):
     await state.set_state(MatchSettings.waiting_for_season_start)
     await callback.answer()
 
-@router.callback_query(F.data.startswith("edit_season_end_cb"))
+@callbacks.prefix("edit_season_end_cb")
 async def edit_season_end_cb(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     lang_id = utils.get_chat_lang(data.get('chat_id'), data.get('thread_id'))
@@ -2254,7 +2302,7 @@ async def process_manual_season_end(message: Message, state: FSMContext):
 
 # --- DRAW FLOW ---
 
-@router.callback_query(F.data.startswith("admin_draw"))
+@callbacks.prefix("admin_draw")
 async def process_draw_start(callback: CallbackQuery, state: FSMContext):
     if not await utils.is_admin(callback, state):
         return await callback.answer("⛔ Нет прав", show_alert=True)
@@ -2275,7 +2323,7 @@ async def process_draw_start(callback: CallbackQuery, state: FSMContext):
     await utils.track_msg(state, msg.message_id)
     await callback.answer()
 
-@router.callback_query(F.data.startswith("cap_ask_"))
+@callbacks.prefix("cap_ask_")
 async def process_cap_ask(callback: CallbackQuery, state: FSMContext):
     choice = callback.data.split("_")[2]
     cid, tid = get_ids(callback)
@@ -2297,7 +2345,7 @@ async def process_cap_ask(callback: CallbackQuery, state: FSMContext):
         await utils.track_msg(state, msg.message_id)
     await callback.answer()
 
-@router.callback_query(F.data.startswith("cap_sel_"))
+@callbacks.prefix("cap_sel_")
 async def process_cap_sel(callback: CallbackQuery, state: FSMContext):
     pid = int(callback.data.split("_")[2])
     data = await state.get_data()
@@ -2320,7 +2368,7 @@ async def process_cap_sel(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_reply_markup(reply_markup=kb.get_players_selection_kb(players, selected, lang_id=lang_id))
     await callback.answer()
 
-@router.callback_query(F.data == "cap_done")
+@callbacks.exact("cap_done")
 async def process_cap_done(callback: CallbackQuery, state: FSMContext):
     cid, tid = get_ids(callback)
     lang_id = utils.get_chat_lang(cid, tid)
@@ -2328,7 +2376,7 @@ async def process_cap_done(callback: CallbackQuery, state: FSMContext):
     await utils.track_msg(state, msg.message_id)
     await callback.answer()
 
-@router.callback_query(F.data.startswith("draw_count_"))
+@callbacks.prefix("draw_count_")
 async def process_draw_count_choice(callback: CallbackQuery, state: FSMContext):
     count_data = callback.data.split("_")[2]
     data = await state.get_data()
@@ -2361,7 +2409,7 @@ async def process_draw_count_choice(callback: CallbackQuery, state: FSMContext):
             "draft_caps": caps,
             "admin_id": callback.from_user.id
         }
-        db.set_draft_state(cid, tid, draft_data)
+        drafts.save(cid, tid, draft_data)
         poll_id = data.get('poll_msg_id')
         exclude = [poll_id] if poll_id else []
         await utils.cleanup_msgs(callback.message.chat.id, state, exclude_ids=exclude)
@@ -2405,7 +2453,7 @@ async def process_draw_count_choice(callback: CallbackQuery, state: FSMContext):
     await utils.track_msg(state, msg.message_id)
     await callback.answer()
 
-@router.callback_query(F.data.startswith("draw_mode_"))
+@callbacks.prefix("draw_mode_")
 async def process_draw_mode(callback: CallbackQuery, state: FSMContext):
     if not await utils.is_admin(callback, state): return
     data = await state.get_data()
@@ -2424,7 +2472,7 @@ async def process_draw_mode(callback: CallbackQuery, state: FSMContext):
         gks = [p for p in players if p[7] == 'gk']
         if len(gks) < 2:
             return await callback.answer(tr.t("error_min_gks", lang_id), show_alert=True)
-    db.clear_draw_votes(cid, tid)
+    vote_tally.clear(cid, tid)
     captains = data.get("captains", [])
     poll_id = data.get('poll_msg_id')
     exclude = [poll_id] if poll_id else []
@@ -2438,7 +2486,7 @@ async def process_draw_mode(callback: CallbackQuery, state: FSMContext):
             "draft_caps": caps,
             "admin_id": callback.from_user.id
         }
-        db.set_draft_state(cid, tid, final_data)
+        drafts.save(cid, tid, final_data)
         await send_draw_variant(callback.message, t1, t2, s1, s2, mode, 0, captains=captains, kb_markup=kb.get_score_entry_kb(lang_id))
     else:
         t1, t2, s1, s2 = utils.balance_teams(players, cid, tid, mode=mode, use_history=False, captains=captains)
@@ -2450,6 +2498,8 @@ async def process_draw_mode(callback: CallbackQuery, state: FSMContext):
         t1, t2, s1, s2 = utils.balance_teams(players, cid, tid, mode=mode, use_history=True, shuffle_factor=15, captains=captains)
         m3 = await send_draw_variant(callback.message, t1, t2, s1, s2, mode, 3, is_vote=True, type_label=tr.t("mode_random_stats", lang_id), captains=captains)
         variants[3] = {"t1": t1, "t2": t2, "s1": s1, "s2": s2}
+        for v_id, m in ((1, m1), (2, m2), (3, m3)):
+            vote_tally.bind_message(cid, tid, v_id, m.message_id, lang_id)
         await state.update_data(variant_msg_ids={1: m1.message_id, 2: m2.message_id, 3: m3.message_id}, draw_variants=variants)
     await callback.answer()
 
@@ -2476,7 +2526,6 @@ async def send_draft_status(message, data, edit_id=None):
     text += "\n\n"
     if not available:
         text += tr.t("manual_draft_finished", lang_id)
-        db.set_draft_state(cid, tid, data)
         kb_score = kb.get_score_entry_kb(lang_id)
         if edit_id:
             try: return await bot.edit_message_text(text, chat_id=message.chat.id if isinstance(message, Message) else message.message.chat.id, message_id=edit_id, reply_markup=kb_score, parse_mode="Markdown")
@@ -2491,11 +2540,12 @@ async def send_draft_status(message, data, edit_id=None):
         except: pass
     return await (message.answer(text, reply_markup=kb_markup, parse_mode="Markdown") if isinstance(message, Message) else message.message.answer(text, reply_markup=kb_markup, parse_mode="Markdown"))
 
-@router.callback_query(F.data.startswith("draft_pick_"))
+@callbacks.prefix("draft_pick_")
 async def process_draft_pick(callback: CallbackQuery, state: FSMContext):
     cid, tid = get_ids(callback)
     lang_id = utils.get_chat_lang(cid, tid)
-    data = db.get_draft_state(cid, tid)
+    session = drafts.load(cid, tid)
+    data = session.data
     if not data or 'draft_teams' not in data:
         await callback.answer(tr.t("error_draft_not_found", lang_id), show_alert=True)
         return
@@ -2530,14 +2580,15 @@ async def process_draft_pick(callback: CallbackQuery, state: FSMContext):
         "draft_caps": caps,
         "admin_id": initiator_admin_id
     }
-    db.set_draft_state(cid, tid, new_data)
+    # Both captains may click at once: only the pick made against the current version lands
+    if not drafts.commit(session, new_data):
+        return await callback.answer(tr.t("error_draft_conflict", lang_id), show_alert=True)
     await send_draft_status(callback, new_data, edit_id=callback.message.message_id)
     await callback.answer()
 
 async def send_draw_variant(message, t1, t2, s1, s2, mode, v_id, is_vote=False, type_label=None, captains=[], kb_markup=None):
     cid, tid = get_ids(message)
     lang_id = utils.get_chat_lang(cid, tid)
-    settings = db.get_match_settings(cid, tid)
     mode_text = type_label or {
         "all": tr.t("mode_all_pos", lang_id),
         "gk": tr.t("mode_gk_only", lang_id),
@@ -2555,25 +2606,10 @@ async def send_draw_variant(message, t1, t2, s1, s2, mode, v_id, is_vote=False,
     text += "\n".join([get_p_line(p) for p in t2])
     
     reply_markup = kb_markup or (kb.get_vote_kb(v_id, lang_id=lang_id) if is_vote else None)
-    
-    cost = settings.get('cost', '0')
-    is_cost_set = cost and str(cost) != "0" and str(cost) != "—"
-    
-    if settings.get('remind_before_game') and not is_vote and is_cost_set:
-        rem_text, rem_kb = utils.get_unpaid_players_mention(cid, tid, lang_id)
-        if rem_kb: # There are unpaid players
-            text += "\n\n" + rem_text
-            # If we already have a markup (like "Enter Score"), we should combine them or send rem_kb separately
-            # We'll send it as a separate message for better UI if we have score entry button
-            if reply_markup:
-                 await message.answer(text, reply_markup=reply_markup, parse_mode="Markdown")
-                 return await message.answer(tr.t("admin_reminders_settings", lang_id), reply_markup=rem_kb)
-            else:
-                 reply_markup = rem_kb
-
+    # Unpaid players are reminded before the game by reminders.py (remind_before_game)
     return await message.answer(text, reply_markup=reply_markup, parse_mode="Markdown")
 
-@router.callback_query(F.data.startswith("vote_"))
+@callbacks.prefix("vote_")
 async def process_vote(callback: CallbackQuery, state: FSMContext):
     cid, tid = get_ids(callback)
     lang_id = utils.get_chat_lang(cid, tid)
@@ -2582,14 +2618,14 @@ async def process_vote(callback: CallbackQuery, state: FSMContext):
     regs = db.get_registrations(cid, tid)
     if not any(r[1] == user_id for r in regs):
         return await callback.answer(tr.t("error_only_players_vote", lang_id), show_alert=True)
-    db.add_draw_vote(cid, tid, v_id, user_id)
+    vote_tally.bind_message(cid, tid, v_id, callback.message.message_id, lang_id)
+    votes = vote_tally.vote(cid, tid, v_id, user_id)
     await callback.answer(tr.t("vote_success", lang_id))
     total_players = len(regs)
     needed = (total_players // 2) + 1
-    votes = db.get_draw_votes_count(cid, tid, v_id)
-    try: await callback.message.edit_reply_markup(reply_markup=kb.get_vote_kb(v_id, votes))
-    except: pass
+    # Button counters are refreshed by vote_tally in one coalesced round
     if votes >= needed:
+        vote_tally.close(cid, tid)
         data = await state.get_data()
         msg_ids = data.get("variant_msg_ids", {})
         for vid, mid in msg_ids.items():
@@ -2609,11 +2645,58 @@ async def process_vote(callback: CallbackQuery, state: FSMContext):
                 "draft_caps": caps,
                 "admin_id": callback.from_user.id
             }
-            db.set_draft_state(cid, tid, final_data)
+            drafts.save(cid, tid, final_data)
         try: await callback.message.edit_reply_markup(reply_markup=kb.get_score_entry_kb(lang_id=lang_id))
         except: pass
         await state.update_data(variant_msg_ids={})
 
+@router.message(Command("schedule"))
+async def cmd_schedule(message: Message, command: CommandObject, state: FSMContext):
+    """
+    /schedule                              - show
+    /schedule mon 21:00; thu 20:00         - weekly slots (replaces everything)
+    /schedule add 2026-10-25 19:00         - one-off extra game
+    /schedule skip 2026-10-22              - no game on that date
+    """
+    if message.chat.type == 'private':
+        return
+    cid, tid = get_ids(message)
+    lang_id = utils.get_chat_lang(cid, tid)
+    settings = db.get_match_settings(cid, tid)
+    args = (command.args or "").strip()
+    if args:
+        if not await utils.is_admin(message, state):
+            sent = await message.answer(tr.t("no_admin_rights", lang_id))
+            utils.schedule_delete(message.chat.id, sent.message_id, delay_seconds=15)
+            utils.schedule_delete(message.chat.id, message.message_id, delay_seconds=15)
+            return
+        current = settings.get('match_times')
+        current = "" if current == "—" else current
+        action, _, rest = args.partition(" ")
+        if action.lower() == "add":
+            added = f"+{rest.strip()}"
+            value = f"{current}; {added}"
+        elif action.lower() == "skip":
+            added = f"-{rest.strip()}"
+            value = f"{current}; {added}"
+        else:
+            added = value = args
+        # Checked on their own: format_schedule would drop a bad token and keep the rest
+        if schedule.invalid_tokens(added):
+            return await message.answer(tr.t("schedule_invalid", lang_id))
+        value = schedule.format_schedule(value)
+        if value == "—":
+            return await message.answer(tr.t("schedule_invalid", lang_id))
+        db.update_match_settings(cid, tid, 'match_times', value)
+        settings['match_times'] = value
+    next_dt = schedule.next_match(cid, tid, settings)
+    text = tr.t("schedule_current", lang_id).format(
+        schedule=settings.get('match_times', '—'),
+        timezone=settings.get('timezone', 'GMT+3'),
+        next=next_dt.strftime("%d.%m.%y %H:%M") if next_dt else "—"
+    )
+    await message.answer(text + "\n\n" + tr.t("schedule_help", lang_id))
+
 @router.message(Command("finish_draw"))
 async def cmd_finish_draw(message: Message, state: FSMContext):
     if message.chat.type == 'private':
@@ -2622,24 +2705,25 @@ async def cmd_finish_draw(message: Message, state: FSMContext):
         cid, tid = get_ids(message)
         lang_id = utils.get_chat_lang(cid, tid)
         sent = await message.answer(tr.t("no_admin_rights", lang_id))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, sent.message_id, delay_seconds=15))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, message.message_id, delay_seconds=15))
+        utils.schedule_delete(message.chat.id, sent.message_id, delay_seconds=15)
+        utils.schedule_delete(message.chat.id, message.message_id, delay_seconds=15)
         return
     cid, tid = get_ids(message)
     lang_id = utils.get_chat_lang(cid, tid)
-    winner_id = db.get_draw_winner(cid, tid)
+    winner_id = vote_tally.winner(cid, tid)
     if winner_id is None:
         sent = await message.answer(tr.t("draw_no_votes", lang_id))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, sent.message_id, delay_seconds=15))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, message.message_id, delay_seconds=15))
+        utils.schedule_delete(message.chat.id, sent.message_id, delay_seconds=15)
+        utils.schedule_delete(message.chat.id, message.message_id, delay_seconds=15)
         return
     data = await state.get_data()
     msg_ids = data.get("variant_msg_ids", {})
     if not msg_ids:
         sent = await message.answer(tr.t("draw_not_found", lang_id))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, sent.message_id, delay_seconds=15))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, message.message_id, delay_seconds=15))
+        utils.schedule_delete(message.chat.id, sent.message_id, delay_seconds=15)
+        utils.schedule_delete(message.chat.id, message.message_id, delay_seconds=15)
         return
+    vote_tally.close(cid, tid)
     await message.answer(tr.t("draw_finished_admin", lang_id).format(v_id=winner_id), parse_mode="Markdown")
     for vid, mid in msg_ids.items():
         if vid != winner_id:
@@ -2659,14 +2743,14 @@ async def cmd_finish_draw(message: Message, state: FSMContext):
             "draft_caps": caps,
             "admin_id": message.from_user.id
         }
-        db.set_draft_state(cid, tid, final_data)
+        drafts.save(cid, tid, final_data)
     mid = msg_ids.get(winner_id)
     if mid:
         try: await bot.edit_message_reply_markup(chat_id=cid, message_id=mid, reply_markup=kb.get_score_entry_kb(lang_id))
         except: pass
     await state.update_data(variant_msg_ids={})
 
-@router.callback_query(F.data.regexp(r"^match_decision_(overwrite|new|cancel)(?:_(\d+)_([\d:]+))?$"))
+@callbacks.prefix("match_decision_", pattern=r"^match_decision_(overwrite|new|cancel)(?:_(\d+)_([\d:]+))?$")
 async def process_match_decision(callback: CallbackQuery, state: FSMContext):
     """Handle decision for duplicate match (Overwrite / New / Cancel)"""
     import re
@@ -2692,15 +2776,7 @@ async def process_match_decision(callback: CallbackQuery, state: FSMContext):
     championship = settings.get('championship_name')
     
     # Calculate match date (UTC)
-    match_date_local = utils.get_match_date(settings.get('match_times'), settings.get('timezone'), find_past=True)
-    match_date = None
-    if match_date_local:
-        from datetime import timedelta
-        tz_val = settings.get('timezone', 'GMT+3')
-        offset = 3
-        tm_match = re.search(r"GMT([+-]?\d+)", str(tz_val))
-        if tm_match: offset = int(tm_match.group(1))
-        match_date = match_date_local - timedelta(hours=offset)
+    match_date = schedule.previous_match_utc(cid, tid, settings)
 
     if action == "overwrite":
         # Clear old stats
@@ -2723,7 +2799,7 @@ async def process_match_decision(callback: CallbackQuery, state: FSMContext):
 
 # --- SCORING & RATING ---
 
-@router.callback_query(F.data == "match_enter_score")
+@callbacks.exact("match_enter_score")
 async def process_match_score_start(callback: CallbackQuery, state: FSMContext):
     if not await utils.is_admin(callback): return
     cid, tid = get_ids(callback)
@@ -2741,32 +2817,23 @@ async def process_match_score(message: Message, state: FSMContext):
         tid = data.get('thread_id') or 0
         lang_id = utils.get_chat_lang(cid, tid)
         sent = await message.answer(tr.t("no_admin_rights", lang_id))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, sent.message_id, delay_seconds=15))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, message.message_id, delay_seconds=15))
+        utils.schedule_delete(message.chat.id, sent.message_id, delay_seconds=15)
+        utils.schedule_delete(message.chat.id, message.message_id, delay_seconds=15)
         return
     cid, tid = get_ids(message)
     lang_id = utils.get_chat_lang(cid, tid)
     import re
     if not re.match(r'^\d+[:\- ]\d+$', message.text):
         sent = await message.answer(tr.t("error_score_format", lang_id))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, sent.message_id, delay_seconds=15))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, message.message_id, delay_seconds=15))
+        utils.schedule_delete(message.chat.id, sent.message_id, delay_seconds=15)
+        utils.schedule_delete(message.chat.id, message.message_id, delay_seconds=15)
         return
     score = message.text.replace("-", ":").replace(" ", ":")
     await state.update_data(chat_id=cid, thread_id=tid)
     settings = db.get_match_settings(cid, tid)
     
     # Calculate match date (UTC)
-    match_date_local = utils.get_match_date(settings.get('match_times'), settings.get('timezone'), find_past=True)
-    match_date = None
-    if match_date_local:
-        # Convert back to UTC
-        from datetime import timedelta
-        tz_val = settings.get('timezone', 'GMT+3')
-        offset = 3
-        tm_match = re.search(r"GMT([+-]?\d+)", str(tz_val))
-        if tm_match: offset = int(tm_match.group(1))
-        match_date = match_date_local - timedelta(hours=offset)
+    match_date = schedule.previous_match_utc(cid, tid, settings)
 
     # Check for existing match to prevent duplicates
     championship = settings.get('championship_name')
@@ -2787,15 +2854,15 @@ async def process_match_score(message: Message, state: FSMContext):
     skill = db.get_label_by_id("skill_levels", skill_id, lang_id) if skill_id else "—"
     match_id = db.create_match(cid, tid, skill, score, match_date=match_date)
     # Parse score
-    g1, g2 = map(int, score.split(":"))
+    g1, g2 = db.parse_score(score)
     total_goals = g1 + g2
     
-    draft_data = db.get_draft_state(cid, tid)
+    draft_data = drafts.get(cid, tid)
     if not draft_data:
         return await message.answer(tr.t("error_no_teams_data", lang_id))
     draft_data['match_id'] = match_id
     draft_data['rated_teams'] = []
-    db.set_draft_state(cid, tid, draft_data)
+    drafts.save(cid, tid, draft_data)
     season_match_num = db.get_season_match_number(cid, tid, match_id)
     match_saved_msg = tr.t("match_saved", lang_id).format(score=score, id=season_match_num)
     
@@ -2891,32 +2958,23 @@ async def process_match_score(message: Message, state: FSMContext):
         tid = data.get('thread_id') or 0
         lang_id = utils.get_chat_lang(cid, tid)
         sent = await message.answer(tr.t("no_admin_rights", lang_id))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, sent.message_id, delay_seconds=15))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, message.message_id, delay_seconds=15))
+        utils.schedule_delete(message.chat.id, sent.message_id, delay_seconds=15)
+        utils.schedule_delete(message.chat.id, message.message_id, delay_seconds=15)
         return
     cid, tid = get_ids(message)
     lang_id = utils.get_chat_lang(cid, tid)
     import re
     if not re.match(r'^\d+[:\- ]\d+$', message.text):
         sent = await message.answer(tr.t("error_score_format", lang_id))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, sent.message_id, delay_seconds=15))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, message.message_id, delay_seconds=15))
+        utils.schedule_delete(message.chat.id, sent.message_id, delay_seconds=15)
+        utils.schedule_delete(message.chat.id, message.message_id, delay_seconds=15)
         return
     score = message.text.replace("-", ":").replace(" ", ":")
     await state.update_data(chat_id=cid, thread_id=tid)
     settings = db.get_match_settings(cid, tid)
     
     # Calculate match date (UTC)
-    match_date_local = utils.get_match_date(settings.get('match_times'), settings.get('timezone'), find_past=True)
-    match_date = None
-    if match_date_local:
-        # Convert back to UTC
-        from datetime import timedelta
-        tz_val = settings.get('timezone', 'GMT+3')
-        offset = 3
-        tm_match = re.search(r"GMT([+-]?\d+)", str(tz_val))
-        if tm_match: offset = int(tm_match.group(1))
-        match_date = match_date_local - timedelta(hours=offset)
+    match_date = schedule.previous_match_utc(cid, tid, settings)
 
     lang_id = settings.get('language_id', 1)
     # Check for existing match
@@ -2947,7 +3005,7 @@ async def process_match_score(message: Message, state: FSMContext):
     
     await finalize_match_setup(message, state, match_id, score, settings, lang_id, cid, tid)
 
-@router.callback_query(F.data.startswith("match_decision_"), MatchResult.waiting_for_exists_decision)
+@callbacks.prefix("match_decision_", MatchResult.waiting_for_exists_decision)
 async def process_match_exists_decision(callback: CallbackQuery, state: FSMContext):
     action = callback.data.split("_")[2] # overwrite, new, cancel
     data = await state.get_data()
@@ -2990,15 +3048,15 @@ async def process_match_exists_decision(callback: CallbackQuery, state: FSMConte
 
 async def finalize_match_setup(message, state, match_id, score, settings, lang_id, cid, tid):
     # Parse score
-    g1, g2 = map(int, score.split(":"))
+    g1, g2 = db.parse_score(score)
     total_goals = g1 + g2
     
-    draft_data = db.get_draft_state(cid, tid)
+    draft_data = drafts.get(cid, tid)
     if not draft_data:
         return await message.answer(tr.t("error_no_teams_data", lang_id))
     draft_data['match_id'] = match_id
     draft_data['rated_teams'] = []
-    db.set_draft_state(cid, tid, draft_data)
+    drafts.save(cid, tid, draft_data)
     season_match_num = db.get_season_match_number(cid, tid, match_id)
     match_saved_msg = tr.t("match_saved", lang_id).format(score=score, id=season_match_num)
     
@@ -3091,7 +3149,7 @@ async def start_rating_phase(chat_id, thread_id, draft_data):
         if utils.is_payment_complete(chat_id, thread_id):
             # Match fully complete - clean everything up
             db.update_match_settings(chat_id, thread_id, "is_active", 0)
-            db.clear_draft_state(chat_id, thread_id)
+            drafts.clear(chat_id, thread_id)
             db.clear_registrations(chat_id, thread_id)
             await bot.send_message(
                 chat_id,
@@ -3101,7 +3159,7 @@ async def start_rating_phase(chat_id, thread_id, draft_data):
         else:
             # Waiting for payment - keep draft_data but mark ratings as done
             draft_data['ratings_done'] = True
-            db.set_draft_state(chat_id, thread_id, draft_data)
+            drafts.save(chat_id, thread_id, draft_data)
             await bot.send_message(
                 chat_id,
                 tr.t("rating_done_waiting_payment", lang_id),
@@ -3131,11 +3189,11 @@ async def start_rating_phase(chat_id, thread_id, draft_data):
             message_thread_id=thread_id if thread_id != 0 else None
         )
 
-@router.callback_query(F.data.startswith("rate_start_"))
+@callbacks.prefix("rate_start_")
 async def process_rate_start(callback: CallbackQuery, state: FSMContext):
     cid, tid = get_ids(callback)
     team_key = callback.data.split("_")[2]
-    draft_data = db.get_draft_state(cid, tid)
+    draft_data = drafts.get(cid, tid)
     lang_id = utils.get_chat_lang(cid, tid)
     if not draft_data: return await callback.answer(tr.t("error_data_load", lang_id))
     teams = draft_data['draft_teams']
@@ -3163,7 +3221,7 @@ async def process_rate_start(callback: CallbackQuery, state: FSMContext):
         parse_mode="Markdown"
     )
 
-@router.callback_query(F.data.startswith("rate_pick_"))
+@callbacks.prefix("rate_pick_")
 async def process_rate_pick(callback: CallbackQuery, state: FSMContext):
     pid = int(callback.data.split("_")[2])
     data = await state.get_data()
@@ -3195,7 +3253,7 @@ async def process_rate_pick(callback: CallbackQuery, state: FSMContext):
         await state.update_data({rating_key: curr})
         cid, tid = get_ids(callback)
         lang_id = utils.get_chat_lang(cid, tid)
-        draft_data = db.get_draft_state(cid, tid)
+        draft_data = drafts.get(cid, tid)
         
         # Check if best defender selection is enabled
         settings = db.get_match_settings(cid, tid)
@@ -3225,7 +3283,7 @@ async def finalize_team_rating(callback, state, rating_key, defender_pid=None):
         db.save_player_rating(curr['match_id'], res['id'], res['points'], curr['team_name'], is_def, is_captain=0)
     
     # Save captain rating
-    draft_data = db.get_draft_state(cid, tid)
+    draft_data = drafts.get(cid, tid)
     cap_id = draft_data['draft_caps'][0] if curr['team_name'] == "Red" else draft_data['draft_caps'][1]
     if defender_pid and cap_id == defender_pid:
         db.save_player_rating(curr['match_id'], cap_id, 0, curr['team_name'], 1, is_captain=1)
@@ -3239,17 +3297,17 @@ async def finalize_team_rating(callback, state, rating_key, defender_pid=None):
     if curr['team_key'] not in rated_teams:
         rated_teams.append(curr['team_key'])
         draft_data['rated_teams'] = rated_teams
-        db.set_draft_state(cid, tid, draft_data)
+        drafts.save(cid, tid, draft_data)
     
     # Check if all teams rated
     if len(rated_teams) >= len(draft_data['draft_teams']):
         draft_data['ratings_done'] = True
-        db.set_draft_state(cid, tid, draft_data)
+        drafts.save(cid, tid, draft_data)
         
         # Check payment completion
         if utils.is_payment_complete(cid, tid):
             db.update_match_settings(cid, tid, "is_active", 0)
-            db.clear_draft_state(cid, tid)
+            drafts.clear(cid, tid)
             db.clear_registrations(cid, tid)
             await callback.message.answer(tr.t("match_finished_full", lang_id))
         else:
@@ -3259,7 +3317,7 @@ async def finalize_team_rating(callback, state, rating_key, defender_pid=None):
     del data[rating_key]
     await state.set_data(data)
 
-@router.callback_query(F.data.startswith("def_pick_"))
+@callbacks.prefix("def_pick_")
 async def process_def_pick(callback: CallbackQuery, state: FSMContext):
     pid = int(callback.data.split("_")[2])
     data = await state.get_data()
@@ -3276,7 +3334,7 @@ async def process_def_pick(callback: CallbackQuery, state: FSMContext):
     await finalize_team_rating(callback, state, rating_key, defender_pid=pid)
 
 
-@router.callback_query(F.data == "goal_autogol_toggle", MatchScoring.waiting_for_scorers)
+@callbacks.exact("goal_autogol_toggle", MatchScoring.waiting_for_scorers)
 async def process_goal_autogol_toggle(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     s = data['scoring_data']
@@ -3290,7 +3348,7 @@ async def process_goal_autogol_toggle(callback: CallbackQuery, state: FSMContext
     await callback.message.edit_text(text, reply_markup=kb.get_goal_scorer_kb(s['players'], s['is_autogol_mode'], lang_id), parse_mode="Markdown")
     await callback.answer()
 
-@router.callback_query(F.data.startswith("goal_pick_"), MatchScoring.waiting_for_scorers)
+@callbacks.prefix("goal_pick_", MatchScoring.waiting_for_scorers)
 async def process_goal_pick(callback: CallbackQuery, state: FSMContext):
     pid = int(callback.data.split("_")[2])
     data = await state.get_data()
@@ -3305,7 +3363,7 @@ async def process_goal_pick(callback: CallbackQuery, state: FSMContext):
         
     lang_id = utils.get_chat_lang(cid, tid)
     settings = db.get_match_settings(cid, tid)
-    draft_data = db.get_draft_state(cid, tid)
+    draft_data = drafts.get(cid, tid)
     
     player_team = "Unknown"
     for t_key in draft_data['draft_teams']:
@@ -3394,8 +3452,8 @@ async def process_goal_pick(callback: CallbackQuery, state: FSMContext):
         await callback.message.edit_text(text, reply_markup=kb.get_goal_scorer_kb(s['players'], lang_id=lang_id), parse_mode="Markdown")
     await callback.answer()
 
-@router.callback_query(F.data.startswith("event_minute_goal"), MatchScoring.waiting_for_scorers)
-@router.callback_query(F.data.startswith("event_minute_autogoal"), MatchScoring.waiting_for_scorers)
+@callbacks.prefix("event_minute_goal", MatchScoring.waiting_for_scorers)
+@callbacks.prefix("event_minute_autogoal", MatchScoring.waiting_for_scorers)
 async def process_goal_minute(callback: CallbackQuery, state: FSMContext):
     """Handle minute input for goal/autogoal during scoring phase"""
     parts = callback.data.split("_")
@@ -3416,7 +3474,7 @@ async def process_goal_minute(callback: CallbackQuery, state: FSMContext):
         
     lang_id = utils.get_chat_lang(cid, tid)
     settings = db.get_match_settings(cid, tid)
-    draft_data = db.get_draft_state(cid, tid)
+    draft_data = drafts.get(cid, tid)
     
     # Get match_history_id and save event with minute
     mh_id = db.get_match_history_id(match_id, pid)
@@ -3457,9 +3515,9 @@ async def process_goal_minute(callback: CallbackQuery, state: FSMContext):
     
     await callback.answer()
 
-@router.callback_query(F.data.startswith("assist_pick_"), MatchScoring.waiting_for_assist)
-@router.callback_query(F.data.startswith("assist_none_"), MatchScoring.waiting_for_assist)
-@router.callback_query(F.data.startswith("assist_penalty_"), MatchScoring.waiting_for_assist)
+@callbacks.prefix("assist_pick_", MatchScoring.waiting_for_assist)
+@callbacks.prefix("assist_none_", MatchScoring.waiting_for_assist)
+@callbacks.prefix("assist_penalty_", MatchScoring.waiting_for_assist)
 async def process_assist_pick(callback: CallbackQuery, state: FSMContext):
     """Handle assist selection"""
     try:
@@ -3476,7 +3534,7 @@ async def process_assist_pick(callback: CallbackQuery, state: FSMContext):
             
         lang_id = utils.get_chat_lang(cid, tid)
         settings = db.get_match_settings(cid, tid)
-        draft_data = db.get_draft_state(cid, tid)
+        draft_data = drafts.get(cid, tid)
         
         if callback.data.startswith("assist_pick_"):
             assist_pid = int(callback.data.split("_")[2])
@@ -3586,7 +3644,7 @@ async def process_goal_minute_text(message: Message, state: FSMContext):
     tid = data.get('thread_id', 0)
     lang_id = utils.get_chat_lang(cid, tid)
     settings = db.get_match_settings(cid, tid)
-    draft_data = db.get_draft_state(cid, tid)
+    draft_data = drafts.get(cid, tid)
 
     mh_id = db.get_match_history_id(match_id, pid)
     event_id = None
@@ -3596,7 +3654,7 @@ async def process_goal_minute_text(message: Message, state: FSMContext):
     await state.update_data(last_minute=minute)
     
     # Cleanup invalid message
-    asyncio.create_task(utils.auto_delete_message(message.chat.id, message.message_id, delay_seconds=15))
+    utils.schedule_delete(message.chat.id, message.message_id, delay_seconds=15)
 
      # Check for assist
     if settings.get('track_assists', 0) and event_type == "goal" and event_id:
@@ -3647,10 +3705,10 @@ async def process_card_minute_text(message: Message, state: FSMContext):
     await state.update_data(last_minute=minute)
     
     # Cleanup invalid message
-    asyncio.create_task(utils.auto_delete_message(message.chat.id, message.message_id, delay_seconds=15))
+    utils.schedule_delete(message.chat.id, message.message_id, delay_seconds=15)
     
     # Also save to match_history for aggregated stats
-    draft_data = db.get_draft_state(cid, tid)
+    draft_data = drafts.get(cid, tid)
     pid = data.get('current_card_player_id')
     player_team = "Unknown"
     for t_key in draft_data['draft_teams']:
@@ -3703,7 +3761,7 @@ async def start_card_input_phase(message, draft_data, cid, tid, state):
         parse_mode="Markdown"
     )
 
-@router.callback_query(F.data.startswith("event_card_player_"))
+@callbacks.prefix("event_card_player_")
 async def process_card_player_select(callback: CallbackQuery, state: FSMContext):
     """Handle player selection for card"""
     parts = callback.data.split("_")
@@ -3728,7 +3786,7 @@ async def process_card_player_select(callback: CallbackQuery, state: FSMContext)
     )
     await callback.answer()
 
-@router.callback_query(F.data.startswith("event_card_"))
+@callbacks.prefix("event_card_")
 async def process_card_type_select(callback: CallbackQuery, state: FSMContext):
     """Handle card type selection (yellow/red)"""
     parts = callback.data.split("_")
@@ -3769,7 +3827,7 @@ async def process_card_type_select(callback: CallbackQuery, state: FSMContext):
         db.add_match_event(mh_id, card_type, minute=None)
         
         # Also save to match_history for aggregated stats
-        draft_data = db.get_draft_state(cid, tid)
+        draft_data = drafts.get(cid, tid)
         player_team = "Unknown"
         for t_key in draft_data['draft_teams']:
             if any(p['id'] == pid for p in draft_data['draft_teams'][t_key]):
@@ -3793,7 +3851,7 @@ async def process_card_type_select(callback: CallbackQuery, state: FSMContext):
         )
     await callback.answer()
 
-@router.callback_query(F.data.startswith("event_minute_"))
+@callbacks.prefix("event_minute_")
 async def process_card_minute(callback: CallbackQuery, state: FSMContext):
     """Handle minute input for card"""
     parts = callback.data.split("_")
@@ -3829,7 +3887,7 @@ async def process_card_minute(callback: CallbackQuery, state: FSMContext):
         await state.update_data(last_minute=minute)
     
     # Also save to match_history for aggregated stats
-    draft_data = db.get_draft_state(cid, tid)
+    draft_data = drafts.get(cid, tid)
     player_team = "Unknown"
     for t_key in draft_data['draft_teams']:
         if any(p['id'] == pid for p in draft_data['draft_teams'][t_key]):
@@ -3852,7 +3910,7 @@ async def process_card_minute(callback: CallbackQuery, state: FSMContext):
         parse_mode="Markdown"
     )
 
-@router.callback_query(F.data.startswith("event_cards_done_"))
+@callbacks.prefix("event_cards_done_")
 async def process_cards_done(callback: CallbackQuery, state: FSMContext):
     """Handle completion of card input"""
     data = await state.get_data()
@@ -3870,7 +3928,7 @@ async def process_cards_done(callback: CallbackQuery, state: FSMContext):
 
 # --- PAIRS CONTEST ---
 
-@router.callback_query(F.data == "confirm_payment_all")
+@callbacks.exact("confirm_payment_all")
 async def process_payment_confirm_all(callback: CallbackQuery, state: FSMContext):
     """Handle 'Paid All' button click"""
     # Check admin rights
@@ -3896,7 +3954,7 @@ async def process_payment_confirm_all(callback: CallbackQuery, state: FSMContext
     # Check for match completion
     if utils.is_payment_complete(cid, tid):
         settings = db.get_match_settings(cid, tid)
-        draft_data = db.get_draft_state(cid, tid)
+        draft_data = drafts.get(cid, tid)
         rating_mode = settings.get('rating_mode', 'ranked')
         
         # Consider match finished if:
@@ -3905,14 +3963,14 @@ async def process_payment_confirm_all(callback: CallbackQuery, state: FSMContext
         if rating_mode == 'disabled' or (draft_data and draft_data.get('ratings_done')):
              # Match fully complete - clean everything up
             db.update_match_settings(cid, tid, "is_active", 0)
-            db.clear_draft_state(cid, tid)
+            drafts.clear(cid, tid)
             db.clear_registrations(cid, tid)
             await callback.message.answer(
                 tr.t("match_finished_full", lang_id),
                 message_thread_id=tid if tid != 0 else None
             )
 
-@router.callback_query(F.data.startswith("pairs_sel_"))
+@callbacks.prefix("pairs_sel_")
 async def pairs_sel_cb(callback: CallbackQuery, state: FSMContext):
     pid = int(callback.data.split("_")[2])
     data = await state.get_data()
@@ -3932,7 +3990,7 @@ async def pairs_sel_cb(callback: CallbackQuery, state: FSMContext):
     await callback.message.edit_reply_markup(reply_markup=kb.get_pairs_builder_kb(avail, sel, phase, can_proceed))
     await callback.answer()
 
-@router.callback_query(F.data == "pairs_next")
+@callbacks.exact("pairs_next")
 async def pairs_next_cb(callback: CallbackQuery, state: FSMContext):
     cid, tid = get_ids(callback)
     lang_id = utils.get_chat_lang(cid, tid)
@@ -3953,7 +4011,7 @@ async def pairs_next_cb(callback: CallbackQuery, state: FSMContext):
     )
     await callback.answer()
 
-@router.callback_query(F.data == "pairs_save")
+@callbacks.exact("pairs_save")
 async def pairs_save_cb(callback: CallbackQuery, state: FSMContext):
     cid, tid = get_ids(callback)
     lang_id = utils.get_chat_lang(cid, tid)
@@ -3987,7 +4045,7 @@ async def finish_pairs_contest(callback, state, pairs, cid, tid):
         t2.extend(p['right'])
     s1 = sum(p['ovr'] for p in t1)
     s2 = sum(p['ovr'] for p in t2)
-    draft_data = db.get_draft_state(cid, tid)
+    draft_data = drafts.get(cid, tid)
     if not draft_data:
         draft_data = {"draft_teams": {}, "draw_variants": {}, "variant_msg_ids": {}, "rated_teams": []}
     import time
@@ -3995,7 +4053,7 @@ async def finish_pairs_contest(callback, state, pairs, cid, tid):
     existing_vars = draft_data.get("draw_variants", {})
     existing_vars[str(v_id)] = {"t1": t1, "t2": t2, "s1": s1, "s2": s2, "mode": "contest", "pairs": pairs}
     draft_data["draw_variants"] = existing_vars
-    db.set_draft_state(cid, tid, draft_data)
+    drafts.save(cid, tid, draft_data)
     user_name = callback.from_user.full_name
     text = tr.t("pairs_variant_title", lang_id).format(name=user_name) + "\n"
     for i, p in enumerate(pairs, 1):
@@ -4012,21 +4070,22 @@ async def finish_pairs_contest(callback, state, pairs, cid, tid):
         reply_markup=kb.get_vote_kb(v_id),
         parse_mode="Markdown"
     )
-    draft_data = db.get_draft_state(cid, tid)
+    draft_data = drafts.get(cid, tid)
     msg_ids = draft_data.get("variant_msg_ids", {})
     msg_ids[str(v_id)] = group_msg.message_id
+    vote_tally.bind_message(cid, tid, v_id, group_msg.message_id, lang_id)
     draft_data["variant_msg_ids"] = msg_ids
-    db.set_draft_state(cid, tid, draft_data)
+    drafts.save(cid, tid, draft_data)
     await callback.message.edit_text(f"{tr.t('pairs_sent_group', lang_id)}\n[{tr.t('pairs_go_to_msg', lang_id)}]({group_msg.get_url()})", parse_mode="Markdown")
     await state.clear()
 
-@router.callback_query(F.data == "contest_finish_best")
+@callbacks.exact("contest_finish_best")
 async def process_contest_finish_best(callback: CallbackQuery, state: FSMContext):
     if not await utils.is_admin(callback, state): return
     cid, tid = get_ids(callback)
     lang_id = utils.get_chat_lang(cid, tid)
-    votes_stats = db.get_all_variant_votes(cid, tid)
-    draft_data = db.get_draft_state(cid, tid)
+    votes_stats = vote_tally.stats(cid, tid)
+    draft_data = drafts.get(cid, tid)
     if not draft_data or "draw_variants" not in draft_data:
         return await callback.answer(tr.t("error_contest_no_variants", lang_id), show_alert=True)
     variants = draft_data["draw_variants"]
@@ -4063,7 +4122,7 @@ async def process_contest_finish_best(callback: CallbackQuery, state: FSMContext
         caps = []
     final_data = {"draft_teams": {str(caps[0]): t1, str(caps[1]): t2}, "draft_caps": caps, "admin_id": callback.from_user.id}
     draft_data.update(final_data)
-    db.set_draft_state(cid, tid, draft_data)
+    drafts.save(cid, tid, draft_data)
     await send_draw_variant(callback.message, t1, t2, s1, s2, mode="best_contest", v_id=0, is_vote=False, type_label=tr.t("pairs_result_label", lang_id).format(id=winner['id']), captains=caps, kb_markup=kb.get_score_entry_kb(lang_id))
     await callback.answer()
 
@@ -4077,8 +4136,8 @@ async def cmd_poll(message: Message, state: FSMContext):
         cid, tid = get_ids(message)
         lang_id = utils.get_chat_lang(cid, tid)
         sent = await message.answer(tr.t("no_admin_rights", lang_id))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, sent.message_id, delay_seconds=15))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, message.message_id, delay_seconds=15))
+        utils.schedule_delete(message.chat.id, sent.message_id, delay_seconds=15)
+        utils.schedule_delete(message.chat.id, message.message_id, delay_seconds=15)
         return
     cid, tid = get_ids(message)
     lang_id = utils.get_chat_lang(cid, tid)
@@ -4088,8 +4147,8 @@ async def cmd_poll(message: Message, state: FSMContext):
         sent2 = await message.answer(tr.t("restore_poll", lang_id), link_preview_options=types.LinkPreviewOptions(is_disabled=True))
         db.update_match_settings(cid, tid, "poll_message_id", sent2.message_id)
         await utils.update_poll_message(sent2)
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, sent1.message_id, delay_seconds=15))
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, message.message_id, delay_seconds=15))
+        utils.schedule_delete(message.chat.id, sent1.message_id, delay_seconds=15)
+        utils.schedule_delete(message.chat.id, message.message_id, delay_seconds=15)
         # Don't auto-delete poll message (sent2) - it should stay visible
         return
     
@@ -4172,7 +4231,7 @@ async def proceed_from_player_count(message: Message, state: FSMContext, count:
     else:
         await finish_poll_setup(message, state)
 
-@router.callback_query(F.data.startswith("skill_"), MatchSettings.waiting_for_skill_level)
+@callbacks.prefix("skill_", MatchSettings.waiting_for_skill_level)
 async def process_skill_level(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     cid = data.get('chat_id') or callback.message.chat.id
@@ -4185,7 +4244,7 @@ async def process_skill_level(callback: CallbackQuery, state: FSMContext):
     await proceed_from_player_count(callback.message, state, 0)
     await callback.answer(tr.t("set_installed", lang_id).format(val=label))
 
-@router.callback_query(F.data.startswith("age_"), MatchSettings.waiting_for_age_group)
+@callbacks.prefix("age_", MatchSettings.waiting_for_age_group)
 async def process_age_group(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     lang_id = utils.get_chat_lang(data.get('chat_id', callback.message.chat.id), data.get('thread_id', 0))
@@ -4196,7 +4255,7 @@ async def process_age_group(callback: CallbackQuery, state: FSMContext):
     await proceed_from_player_count(callback.message, state, 0)
     await callback.answer(tr.t("set_installed", lang_id).format(val=label))
 
-@router.callback_query(F.data.startswith("gender_"), MatchSettings.waiting_for_gender)
+@callbacks.prefix("gender_", MatchSettings.waiting_for_gender)
 async def process_gender(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     lang_id = utils.get_chat_lang(data.get('chat_id', callback.message.chat.id), data.get('thread_id', 0))
@@ -4207,7 +4266,7 @@ async def process_gender(callback: CallbackQuery, state: FSMContext):
     await proceed_from_player_count(callback.message, state, 0)
     await callback.answer(tr.t("set_installed", lang_id).format(val=label))
 
-@router.callback_query(F.data.startswith("venue_"), MatchSettings.waiting_for_venue)
+@callbacks.prefix("venue_", MatchSettings.waiting_for_venue)
 async def process_venue_type(callback: CallbackQuery, state: FSMContext):
     data = await state.get_data()
     lang_id = utils.get_chat_lang(data.get('chat_id', callback.message.chat.id), data.get('thread_id', 0))
@@ -0,0 +1,160 @@
+import inspect
+import logging
+import re
+
+from aiogram import Router
+from aiogram.dispatcher.event.bases import SkipHandler
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+from aiogram.types import CallbackQuery
+
+logger = logging.getLogger(__name__)
+
+_ENTRIES = "__entries__"
+
+
+class _Route:
+    __slots__ = ("prefix", "exact", "states", "pattern", "handler", "order", "wants_state")
+
+    def __init__(self, prefix, exact, states, pattern, handler, order):
+        self.prefix = prefix
+        self.exact = exact
+        self.states = frozenset(s.state if isinstance(s, State) else s for s in states) or None
+        self.pattern = re.compile(pattern) if pattern else None
+        self.handler = handler
+        self.order = order
+        self.wants_state = "state" in inspect.signature(handler).parameters
+
+
+class CallbackDispatcher:
+    """
+    Collects the routes for callback_data with one dict lookup (exact values) and a walk
+    over a prefix trie, then orders the matches: O(len(data) + m log m) for m matching
+    routes, independent of how many other handlers are registered.
+
+    Among the routes that match, the first registered wins, as with plain aiogram
+    handlers: the registration (import) order of the handler modules decides priority.
+    """
+
+    def __init__(self):
+        self._exact = {}
+        self._trie = {}
+        self._count = 0
+        self.router = Router(name="callback_dispatcher")
+        self.router.callback_query.register(self._dispatch)
+
+    def _add(self, prefix, states, pattern, handler, exact):
+        route = _Route(prefix, exact, states, pattern, handler, self._count)
+        self._count += 1
+        if exact:
+            self._exact.setdefault(prefix, []).append(route)
+        else:
+            node = self._trie
+            for ch in prefix:
+                node = node.setdefault(ch, {})
+            node.setdefault(_ENTRIES, []).append(route)
+        return handler
+
+    def exact(self, value: str, *states):
+        """callback_data == value"""
+        return lambda handler: self._add(value, states, None, handler, exact=True)
+
+    def prefix(self, prefix: str, *states, pattern: str = None):
+        """callback_data.startswith(prefix), optionally also matching a regex"""
+        return lambda handler: self._add(prefix, states, pattern, handler, exact=False)
+
+    def state(self, *states):
+        """Any callback_data while in one of the states"""
+        return self.prefix("", *states)
+
+    def candidates(self, data: str):
+        """All routes whose data part matches, in registration order (state is checked by the caller)"""
+        found = []
+        node = self._trie
+        if _ENTRIES in node:
+            found.extend(node[_ENTRIES])
+        for ch in data:
+            node = node.get(ch)
+            if node is None:
+                break
+            if _ENTRIES in node:
+                found.extend(node[_ENTRIES])
+        found.extend(self._exact.get(data, []))
+        found.sort(key=lambda r: r.order)
+        return found
+
+    def resolve(self, data: str, raw_state: str = None, routes=None):
+        for route in routes if routes is not None else self.candidates(data):
+            if route.states is not None and raw_state not in route.states:
+                continue
+            if route.pattern and not route.pattern.match(data):
+                continue
+            return route
+        return None
+
+    async def _dispatch(self, callback: CallbackQuery, state: FSMContext):
+        data = callback.data or ""
+        routes = self.candidates(data)
+        # Only read FSM state when some candidate depends on it
+        raw_state = await state.get_state() if any(r.states is not None for r in routes) else None
+        route = self.resolve(data, raw_state, routes)
+        if route is None:
+            raise SkipHandler()
+        if route.wants_state:
+            return await route.handler(callback, state)
+        return await route.handler(callback)
+
+    def routes(self):
+        """[(kind, prefix, states, handler name)] in registration order"""
+        result = [r for routes in self._exact.values() for r in routes]
+        stack = [self._trie]
+        while stack:
+            node = stack.pop()
+            for key, value in node.items():
+                if key == _ENTRIES:
+                    result.extend(value)
+                else:
+                    stack.append(value)
+        result.sort(key=lambda r: r.order)
+        return [("exact" if r.exact else "prefix", r.prefix, sorted(r.states or []), r.handler.__name__) for r in result]
+
+
+callbacks = CallbackDispatcher()
+
+
+def _static_callback_values(paths):
+    """Literal (or literal-prefix of f-string) callback_data values used in the sources"""
+    values = set()
+    pattern = re.compile(r'callback_data\s*=\s*f?"([^"{]*)')
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            values.update(m.group(1) for m in pattern.finditer(f.read()))
+    return sorted(values)
+
+
+if __name__ == "__main__":
+    # Conformance check: every callback string used in the code must resolve to a handler
+    # python callback_router.py
+    import importlib
+    import os
+    # Run as a script this module is __main__; the handlers register on the imported one
+    from callback_router import callbacks
+    # Imported for their route registrations, in the same order as main.py
+    for module in ("user_handlers", "admin_handlers"):
+        importlib.import_module(module)
+
+    base = os.path.dirname(os.path.abspath(__file__))
+    sources = [os.path.join(base, name) for name in ("keyboards.py", "utils.py", "admin_handlers.py", "user_handlers.py")]
+    unrouted = []
+    for value in _static_callback_values(sources):
+        if not value:
+            continue  # f-string starting with a placeholder
+        routes = callbacks.candidates(value)
+        status = ", ".join(f"{r.handler.__name__}{sorted(r.states) if r.states else ''}" for r in routes) or "-"
+        print(f"{value!r:45} -> {status}")
+        # State catch-alls match anything, they don't count as a route for the value
+        if not any(r.exact or r.prefix for r in routes):
+            unrouted.append(value)
+    print(f"\n{len(callbacks.routes())} routes, {len(unrouted)} unrouted callback values: {unrouted}")
+    if unrouted:
+        raise SystemExit(1)
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+logger = logging.getLogger(__name__)
+
+
+def get_update_key(update: Update) -> Optional[Tuple[int, int]]:
+    """(chat_id, thread_id) of an update, same convention as utils.get_ids"""
+    if update.message:
+        return update.message.chat.id, update.message.message_thread_id or 0
+    if update.callback_query and update.callback_query.message:
+        msg = update.callback_query.message
+        return msg.chat.id, getattr(msg, "message_thread_id", None) or 0
+    for event in (update.edited_message, update.chat_member, update.my_chat_member):
+        if event:
+            return event.chat.id, getattr(event, "message_thread_id", None) or 0
+    return None
+
+
+class _KeySlot:
+    __slots__ = ("lock", "depth")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.depth = 0  # running + waiting updates
+
+
+class ChatOrderingMiddleware(BaseMiddleware):
+    """
+    Runs updates of one (chat_id, thread_id) strictly one after another
+    while different chats run in parallel, up to max_concurrent handlers overall.
+    """
+
+    def __init__(self, max_concurrent: int = None, max_pending_per_key: int = None):
+        self.max_concurrent = max_concurrent or int(os.getenv("UPDATE_WORKERS", "16"))
+        self.max_pending_per_key = max_pending_per_key or int(os.getenv("MAX_PENDING_PER_CHAT", "50"))
+        self._global = asyncio.Semaphore(self.max_concurrent)
+        self._keys: Dict[Tuple[int, int], _KeySlot] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        key = get_update_key(event) if isinstance(event, Update) else None
+        if key is None:
+            async with self._global:
+                return await handler(event, data)
+
+        slot = self._keys.get(key)
+        if slot is None:
+            slot = self._keys[key] = _KeySlot()
+        if slot.depth >= self.max_pending_per_key:
+            logger.warning(f"Dropping update {event.update_id}: {slot.depth} updates pending for {key}")
+            return None
+
+        slot.depth += 1
+        try:
+            # Take the chat lock first so waiting updates don't occupy global slots
+            async with slot.lock:
+                async with self._global:
+                    return await handler(event, data)
+        finally:
+            slot.depth -= 1
+            if slot.depth == 0:
+                self._keys.pop(key, None)
+
+    def queue_depths(self) -> Dict[Tuple[int, int], int]:
+        """Pending (running + waiting) updates per (chat_id, thread_id)"""
+        return {key: slot.depth for key, slot in self._keys.items()}
+
+
+chat_ordering = ChatOrderingMiddleware()
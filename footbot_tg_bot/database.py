@@ -9,6 +9,26 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Callbacks (chat_id, thread_id, player_id, status) run after a registration is written.
+# status=None: the player left; player_id=None: the whole poll changed (cleared, capacity, core team).
+_registration_listeners = []
+
+def on_registration_change(callback):
+    _registration_listeners.append(callback)
+
+def _registration_changed(chat_id, thread_id, player_id=None, status=None):
+    for callback in _registration_listeners:
+        try:
+            callback(chat_id, thread_id, player_id, status)
+        except Exception as e:
+            print(f"Warning: registration listener failed: {e}")
+
+# Callbacks (chat_id, thread_id, key) run after a settings value is written
+_settings_listeners = []
+
+def on_settings_change(callback):
+    _settings_listeners.append(callback)
+
 def get_connection():
     return mysql.connector.connect(
         host=os.getenv("DB_HOST", "localhost"),
@@ -259,9 +279,13 @@ def init_db():
         variant_id INT,
         voter_id BIGINT NOT NULL,
         vote_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        PRIMARY KEY (chat_id, thread_id, voter_id)
+        PRIMARY KEY (chat_id, thread_id, voter_id),
+        INDEX idx_draw_votes_time (vote_time)
     )
     """)
+    cursor.execute("SHOW INDEX FROM draw_votes WHERE Key_name = 'idx_draw_votes_time'")
+    if not cursor.fetchone():
+        cursor.execute("ALTER TABLE draw_votes ADD INDEX idx_draw_votes_time (vote_time)")
 
     # Settings table
     cursor.execute("""
@@ -298,9 +322,17 @@ def init_db():
         chat_id BIGINT NOT NULL DEFAULT 0,
         thread_id BIGINT NOT NULL DEFAULT 0,
         state_data LONGTEXT,
-        PRIMARY KEY (chat_id, thread_id)
+        version INT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (chat_id, thread_id),
+        INDEX idx_draft_state_updated (updated_at)
     )
     """)
+    # Version counter for compare-and-swap writes (draft_session.py)
+    cursor.execute("SHOW COLUMNS FROM draft_state LIKE 'version'")
+    if not cursor.fetchone():
+        cursor.execute("ALTER TABLE draft_state ADD COLUMN version INT NOT NULL DEFAULT 0")
+        print("Added version to draft_state")
 
     # Persistent FSM Storage table
     cursor.execute("""
@@ -309,10 +341,163 @@ def init_db():
         user_id BIGINT NOT NULL,
         state VARCHAR(255) DEFAULT NULL,
         data LONGTEXT DEFAULT NULL,
-        PRIMARY KEY (chat_id, user_id)
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        PRIMARY KEY (chat_id, user_id),
+        INDEX idx_fsm_updated (updated_at)
     )
     """)
-    
+    # Last write time of FSM rows and drafts, for the retention job (maintenance.py)
+    for table, index in (("fsm_data", "idx_fsm_updated"), ("draft_state", "idx_draft_state_updated")):
+        cursor.execute(f"SHOW COLUMNS FROM {table} LIKE 'updated_at'")
+        if not cursor.fetchone():
+            cursor.execute(f"""
+                ALTER TABLE {table}
+                    ADD COLUMN updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                    ADD INDEX {index} (updated_at)
+            """)
+            print(f"Added updated_at to {table}")
+
+    # Pending delayed message deletions (see scheduler.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS scheduled_deletions (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        chat_id BIGINT NOT NULL,
+        message_id BIGINT NOT NULL,
+        due_at DATETIME NOT NULL,
+        INDEX idx_due_at (due_at)
+    )
+    """)
+
+    # Messages to clean up at the end of a flow, per FSM key (see utils.track_msg)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS tracked_messages (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        chat_id BIGINT NOT NULL,
+        thread_id BIGINT NOT NULL DEFAULT 0,
+        owner_id BIGINT NOT NULL,
+        message_id BIGINT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_flow (chat_id, thread_id, owner_id, id)
+    )
+    """)
+    cursor.execute("SHOW COLUMNS FROM tracked_messages LIKE 'thread_id'")
+    if not cursor.fetchone():
+        cursor.execute("""
+            ALTER TABLE tracked_messages
+                ADD COLUMN thread_id BIGINT NOT NULL DEFAULT 0 AFTER chat_id,
+                DROP INDEX idx_flow,
+                ADD INDEX idx_flow (chat_id, thread_id, owner_id, id)
+        """)
+        print("Added thread_id to tracked_messages")
+
+    # Reminder scheduler position per chat (UTC time of the last handled reminder)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS reminder_state (
+        chat_id BIGINT NOT NULL,
+        thread_id BIGINT NOT NULL DEFAULT 0,
+        fired_until DATETIME NOT NULL,
+        fired_kind VARCHAR(20) DEFAULT NULL,
+        PRIMARY KEY (chat_id, thread_id)
+    )
+    """)
+    cursor.execute("SHOW COLUMNS FROM reminder_state LIKE 'fired_kind'")
+    if not cursor.fetchone():
+        cursor.execute("ALTER TABLE reminder_state ADD COLUMN fired_kind VARCHAR(20) DEFAULT NULL")
+
+    # Stats version per chat: bumped by every write that changes the championship table,
+    # plus the Telegram file_id of the /table image rendered for the current version
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS stats_versions (
+        chat_id BIGINT NOT NULL,
+        thread_id BIGINT NOT NULL DEFAULT 0,
+        version INT NOT NULL DEFAULT 0,
+        image_file_id VARCHAR(255) DEFAULT NULL,
+        PRIMARY KEY (chat_id, thread_id)
+    )
+    """)
+
+    # Seasons per chat: bounds from the settings at the time of the first match, plus the
+    # range of match ids and the match counter used for season_match_no
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS seasons (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        chat_id BIGINT NOT NULL,
+        thread_id BIGINT NOT NULL DEFAULT 0,
+        start_date DATE DEFAULT NULL,
+        end_date DATE DEFAULT NULL,
+        first_match_id INT DEFAULT NULL,
+        last_match_id INT DEFAULT NULL,
+        match_count INT NOT NULL DEFAULT 0,
+        INDEX idx_seasons_chat (chat_id, thread_id, start_date, end_date)
+    )
+    """)
+
+    # Championship table kept up to date by the match writers (season_id 0 = all matches)
+    cursor.execute("SHOW TABLES LIKE 'standings'")
+    standings_missing = cursor.fetchone() is None
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS standings (
+        chat_id BIGINT NOT NULL,
+        thread_id BIGINT NOT NULL DEFAULT 0,
+        season_id INT NOT NULL DEFAULT 0,
+        player_id INT NOT NULL,
+        games INT NOT NULL DEFAULT 0,
+        wins INT NOT NULL DEFAULT 0,
+        draws INT NOT NULL DEFAULT 0,
+        losses INT NOT NULL DEFAULT 0,
+        points INT NOT NULL DEFAULT 0,
+        goals INT NOT NULL DEFAULT 0,
+        autogoals INT NOT NULL DEFAULT 0,
+        assists INT NOT NULL DEFAULT 0,
+        yellow_cards INT NOT NULL DEFAULT 0,
+        red_cards INT NOT NULL DEFAULT 0,
+        best_defender INT NOT NULL DEFAULT 0,
+        goals_diff INT NOT NULL DEFAULT 0,
+        rating_sum INT NOT NULL DEFAULT 0,
+        rating_count INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (chat_id, thread_id, season_id, player_id),
+        INDEX idx_standings_rank (chat_id, thread_id, season_id, points, goals, assists)
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS captain_standings (
+        chat_id BIGINT NOT NULL,
+        thread_id BIGINT NOT NULL DEFAULT 0,
+        season_id INT NOT NULL DEFAULT 0,
+        player_id INT NOT NULL,
+        games INT NOT NULL DEFAULT 0,
+        wins INT NOT NULL DEFAULT 0,
+        draws INT NOT NULL DEFAULT 0,
+        losses INT NOT NULL DEFAULT 0,
+        points INT NOT NULL DEFAULT 0,
+        goals_scored INT NOT NULL DEFAULT 0,
+        goals_conceded INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (chat_id, thread_id, season_id, player_id),
+        INDEX idx_captain_standings_rank (chat_id, thread_id, season_id, points, wins)
+    )
+    """)
+    # Last PLAYER_FORM_SIZE results of each player (JSON list, newest first) for /me
+    cursor.execute("SHOW TABLES LIKE 'player_form'")
+    form_missing = cursor.fetchone() is None
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS player_form (
+        chat_id BIGINT NOT NULL,
+        thread_id BIGINT NOT NULL DEFAULT 0,
+        player_id INT NOT NULL,
+        entries VARCHAR(2048) NOT NULL DEFAULT '[]',
+        PRIMARY KEY (chat_id, thread_id, player_id)
+    )
+    """)
+
+    # Shard ownership (advisory locks for sharded workers, see sharding.py)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS shard_locks (
+        shard_id INT PRIMARY KEY,
+        owner VARCHAR(255) NOT NULL,
+        heartbeat_at DATETIME NOT NULL
+    )
+    """)
+
     # Migration: add display_name to player_stats if missing
     cursor.execute("SHOW COLUMNS FROM player_stats LIKE 'display_name'")
     if not cursor.fetchone():
@@ -479,6 +664,47 @@ def init_db():
     if not cursor.fetchone():
         cursor.execute("ALTER TABLE matches ADD COLUMN championship_name VARCHAR(255) DEFAULT NULL")
         conn.commit()
+
+    # Migration: numeric score columns next to the 'red:white' text, result = SIGN(red - white)
+    cursor.execute("SHOW COLUMNS FROM matches LIKE 'red_goals'")
+    if not cursor.fetchone():
+        cursor.execute("""
+            ALTER TABLE matches
+                ADD COLUMN red_goals INT DEFAULT NULL,
+                ADD COLUMN white_goals INT DEFAULT NULL,
+                ADD COLUMN result TINYINT AS (SIGN(red_goals - white_goals)) STORED,
+                ADD INDEX idx_matches_chat_result (chat_id, thread_id, result)
+        """)
+        cursor.execute("""
+            UPDATE matches
+            SET red_goals = CAST(SUBSTRING_INDEX(score, ':', 1) AS SIGNED),
+                white_goals = CAST(SUBSTRING_INDEX(score, ':', -1) AS SIGNED)
+            WHERE score REGEXP '^[0-9]+:[0-9]+$'
+        """)
+        print(f"Added red_goals/white_goals to matches, backfilled {cursor.rowcount} scores")
+        conn.commit()
+
+    # Migration: season of each match and its number within the season
+    cursor.execute("SHOW COLUMNS FROM matches LIKE 'season_id'")
+    seasons_missing = cursor.fetchone() is None
+    if seasons_missing:
+        cursor.execute("""
+            ALTER TABLE matches
+                ADD COLUMN season_id INT DEFAULT NULL,
+                ADD COLUMN season_match_no INT DEFAULT NULL,
+                ADD INDEX idx_matches_season (chat_id, thread_id, season_id, id)
+        """)
+        conn.commit()
+
+    # Migration: matches whose events were folded into match_history by the retention job
+    cursor.execute("SHOW COLUMNS FROM matches LIKE 'events_rolled_up'")
+    if not cursor.fetchone():
+        cursor.execute("""
+            ALTER TABLE matches
+                ADD COLUMN events_rolled_up TINYINT NOT NULL DEFAULT 0,
+                ADD INDEX idx_matches_rollup (events_rolled_up, match_date)
+        """)
+        conn.commit()
     
     # Initialize localization data (languages and reference tables)
     try:
@@ -523,6 +749,13 @@ def init_db():
     conn.commit()
     conn.close()
 
+    if seasons_missing:
+        print(f"Seasons assigned to {backfill_seasons()} matches")
+    if standings_missing or seasons_missing or form_missing:
+        # First start with the standings table (or with seasons): fill it from the existing matches
+        rebuild_standings()
+        print("Standings built from match history")
+
 # === LOCALIZATION FUNCTIONS ===
 
 def get_languages():
@@ -663,13 +896,22 @@ def player_has_stats(player_id, chat_id, thread_id):
     conn.close()
     return res is not None
 
-def upsert_player(user_id, name):
-    conn = get_connection()
-    cursor = conn.cursor()
+def _upsert_player(cursor, user_id, name):
+    """Creates the player or refreshes the Telegram name; a changed name invalidates the player's chats"""
+    cursor.execute("SELECT id, name FROM players WHERE user_id = %s", (user_id,))
+    existing = cursor.fetchone()
     cursor.execute("""
     INSERT INTO players (user_id, name) VALUES (%s, %s) 
     ON DUPLICATE KEY UPDATE name=VALUES(name)
     """, (user_id, name))
+    if existing and existing[1] != name:
+        # Standings and /me show p.name where no display_name is set
+        _bump_stats_version(cursor, _PLAYER_CHATS, existing[0], existing[0])
+
+def upsert_player(user_id, name):
+    conn = get_connection()
+    cursor = conn.cursor()
+    _upsert_player(cursor, user_id, name)
     conn.commit()
     conn.close()
 
@@ -678,6 +920,8 @@ def update_player_name_by_id(player_id, name):
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("UPDATE players SET name = %s WHERE id = %s", (name, player_id))
+    if cursor.rowcount:
+        _bump_stats_version(cursor, _PLAYER_CHATS, player_id, player_id)
     conn.commit()
     conn.close()
 
@@ -690,6 +934,7 @@ def update_player_display_name(player_id, chat_id, thread_id, display_name):
         VALUES (%s, %s, %s, %s)
         ON DUPLICATE KEY UPDATE display_name = VALUES(display_name)
     """, (player_id, chat_id, thread_id, display_name))
+    _bump_chat_stats_version(cursor, chat_id, thread_id)
     conn.commit()
     conn.close()
 
@@ -747,6 +992,7 @@ def register_player(player_id, chat_id, thread_id, position, status='active'):
     """, (player_id, chat_id, thread_id, position, status))
     conn.commit()
     conn.close()
+    _registration_changed(chat_id, thread_id, player_id, status)
 
 def unregister_player(player_id, chat_id, thread_id):
     conn = get_connection()
@@ -754,6 +1000,7 @@ def unregister_player(player_id, chat_id, thread_id):
     cursor.execute("DELETE FROM registrations WHERE player_id = %s AND chat_id = %s AND thread_id = %s", (player_id, chat_id, thread_id))
     conn.commit()
     conn.close()
+    _registration_changed(chat_id, thread_id, player_id, None)
 
 def get_registrations(chat_id, thread_id):
     conn = get_connection()
@@ -781,6 +1028,7 @@ def update_registration_status(player_id, chat_id, thread_id, status):
                    (status, player_id, chat_id, thread_id))
     conn.commit()
     conn.close()
+    _registration_changed(chat_id, thread_id, player_id, status)
 
 def get_queue(chat_id, thread_id):
     """Get players in queue ordered by join time"""
@@ -798,12 +1046,41 @@ def get_queue(chat_id, thread_id):
     conn.close()
     return queue
 
+def get_waitlist_rows(chat_id, thread_id):
+    """(player_id, status, seconds since the last status change) in join order"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT player_id, status, TIMESTAMPDIFF(SECOND, updated_at, NOW())
+        FROM registrations
+        WHERE chat_id = %s AND thread_id = %s
+        ORDER BY updated_at ASC
+    """, (chat_id, thread_id))
+    res = cursor.fetchall()
+    conn.close()
+    return res
+
+def get_polls_with_pending_confirm(shard=None):
+    """(chat_id, thread_id) of polls where someone still has to confirm a queue spot"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    query = "SELECT DISTINCT chat_id, thread_id FROM registrations WHERE status = 'pending_confirm'"
+    params = []
+    if shard:
+        query += " AND MOD(ABS(chat_id), %s) = %s"
+        params += [shard[1], shard[0]]
+    cursor.execute(query, tuple(params))
+    res = cursor.fetchall()
+    conn.close()
+    return res
+
 def clear_registrations(chat_id, thread_id):
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("DELETE FROM registrations WHERE chat_id = %s AND thread_id = %s", (chat_id, thread_id))
     conn.commit()
     conn.close()
+    _registration_changed(chat_id, thread_id)
 
 def get_player_by_name(name_pattern, chat_id=0, thread_id=0):
     conn = get_connection()
@@ -960,8 +1237,18 @@ def update_match_settings(chat_id, thread_id, key, value):
             ON DUPLICATE KEY UPDATE {key} = VALUES({key})
         """
         cursor.execute(query, (chat_id, thread_id, value))
+        if key in ('championship_name', 'language_id'):
+            # Title and headers of the /table image
+            _bump_chat_stats_version(cursor, chat_id, thread_id)
     conn.commit()
     conn.close()
+    if key in ('player_count', 'core_team_mode', 'language_id'):
+        _registration_changed(chat_id, thread_id)
+    for callback in _settings_listeners:
+        try:
+            callback(chat_id, thread_id, key)
+        except Exception as e:
+            print(f"Warning: settings listener failed: {e}")
 
 def calculate_player_cost(chat_id, thread_id):
     """Calculate cost per player based on cost mode setting"""
@@ -1008,10 +1295,7 @@ def create_player_full(user_id, name, chat_id, thread_id, attack, defense, speed
     cursor = conn.cursor()
     
     # 1. Ensure basic player info exists
-    cursor.execute("""
-    INSERT INTO players (user_id, name) VALUES (%s, %s) 
-    ON DUPLICATE KEY UPDATE name=VALUES(name)
-    """, (user_id, name))
+    _upsert_player(cursor, user_id, name)
     
     cursor.execute("SELECT id FROM players WHERE user_id = %s", (user_id,))
     res = cursor.fetchone()
@@ -1049,6 +1333,7 @@ def upsert_player_stats(player_id, chat_id, thread_id, attack, defense, speed, g
             speed=VALUES(speed), 
             gk=VALUES(gk)
         """, (player_id, chat_id, thread_id, display_name, attack, defense, speed, gk))
+        _bump_chat_stats_version(cursor, chat_id, thread_id)
     else:
         cursor.execute("""
         INSERT INTO player_stats (player_id, chat_id, thread_id, attack, defense, speed, gk) 
@@ -1076,6 +1361,7 @@ def set_player_core(player_id, chat_id, thread_id, is_core):
     """, (player_id, chat_id, thread_id, int(is_core)))
     conn.commit()
     conn.close()
+    _registration_changed(chat_id, thread_id)
 
 def get_core_players(chat_id, thread_id):
     """Get list of core players for chat"""
@@ -1120,6 +1406,27 @@ def add_draw_vote(chat_id, thread_id, variant_id, voter_id):
     conn.commit()
     conn.close()
 
+def get_draw_votes(chat_id, thread_id):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT variant_id, voter_id, vote_time FROM draw_votes WHERE chat_id = %s AND thread_id = %s", (chat_id, thread_id))
+    res = cursor.fetchall()
+    conn.close()
+    return res
+
+def save_draw_votes(rows):
+    """rows: [(chat_id, thread_id, variant_id, voter_id, vote_time)], one vote per voter (REPLACE on the PK)"""
+    if not rows:
+        return
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.executemany("""
+        REPLACE INTO draw_votes (chat_id, thread_id, variant_id, voter_id, vote_time)
+        VALUES (%s, %s, %s, %s, %s)
+    """, rows)
+    conn.commit()
+    conn.close()
+
 def get_draw_votes_count(chat_id, thread_id, variant_id):
     conn = get_connection()
     cursor = conn.cursor()
@@ -1158,16 +1465,53 @@ def get_draw_winner(chat_id, thread_id):
     return res[0] if res else None
 
 def set_draft_state(chat_id, thread_id, data):
+    """Unconditional write. Returns the new version."""
     conn = get_connection()
     cursor = conn.cursor()
-    json_data = json.dumps(data)
+    json_data = data if isinstance(data, str) else json.dumps(data)
     cursor.execute("""
-        INSERT INTO draft_state (chat_id, thread_id, state_data) 
-        VALUES (%s, %s, %s)
-        ON DUPLICATE KEY UPDATE state_data = %s
+        INSERT INTO draft_state (chat_id, thread_id, state_data, version) 
+        VALUES (%s, %s, %s, 1)
+        ON DUPLICATE KEY UPDATE state_data = %s, version = version + 1
     """, (chat_id, thread_id, json_data, json_data))
+    cursor.execute("SELECT version FROM draft_state WHERE chat_id = %s AND thread_id = %s", (chat_id, thread_id))
+    res = cursor.fetchone()
+    conn.commit()
+    conn.close()
+    return res[0] if res else 0
+
+def get_draft_state_versioned(chat_id, thread_id):
+    """(state_json, version); (None, 0) when there is no draft"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT state_data, version FROM draft_state WHERE chat_id = %s AND thread_id = %s", (chat_id, thread_id))
+    res = cursor.fetchone()
+    conn.close()
+    if res:
+        return res[0], res[1]
+    return None, 0
+
+def cas_draft_state(chat_id, thread_id, json_data, expected_version):
+    """
+    Compare-and-swap write: stores json_data only if the row is still at expected_version
+    (0 = row must not exist yet). Returns the new version or None on conflict.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    if expected_version == 0:
+        cursor.execute("""
+            INSERT IGNORE INTO draft_state (chat_id, thread_id, state_data, version)
+            VALUES (%s, %s, %s, 1)
+        """, (chat_id, thread_id, json_data))
+    else:
+        cursor.execute("""
+            UPDATE draft_state SET state_data = %s, version = version + 1
+            WHERE chat_id = %s AND thread_id = %s AND version = %s
+        """, (json_data, chat_id, thread_id, expected_version))
+    ok = cursor.rowcount == 1
     conn.commit()
     conn.close()
+    return expected_version + 1 if ok else None
 
 def get_draft_state(chat_id, thread_id):
     conn = get_connection()
@@ -1186,57 +1530,310 @@ def clear_draft_state(chat_id, thread_id):
     conn.commit()
     conn.close()
 
+# --- STANDINGS ---
+# standings / captain_standings hold the championship table per player. Every writer below
+# that touches match_history, match_events or a match score subtracts the old contribution of
+# the rows it changes and adds the new one in the same transaction; rebuild_standings()
+# recomputes everything from scratch. Assists come from goal events, or from match_history.assists
+# for matches whose events were rolled up (rollup_match_events).
+
+STANDINGS_COLUMNS = ("games", "wins", "draws", "losses", "points", "goals", "autogoals", "assists",
+                     "yellow_cards", "red_cards", "best_defender", "goals_diff", "rating_sum", "rating_count")
+CAPTAIN_COLUMNS = ("games", "wins", "draws", "losses", "points", "goals_scored", "goals_conceded")
+
+_HISTORY_ROWS = """
+    SELECT m.chat_id, m.thread_id, mh.player_id, mh.team, mh.points, mh.goals, mh.autogoals,
+           mh.yellow_cards, mh.red_cards, mh.best_defender, mh.is_captain, m.red_goals, m.white_goals,
+           IF(m.events_rolled_up, mh.assists, 0), m.season_id
+    FROM match_history mh
+    JOIN matches m ON mh.match_id = m.id
+"""
+_ASSIST_ROWS = """
+    SELECT m.chat_id, m.thread_id, me.assist_player_id, m.season_id
+    FROM match_events me
+    JOIN match_history mh ON me.match_history_id = mh.id
+    JOIN matches m ON mh.match_id = m.id
+    WHERE me.event_type = 'goal' AND me.assist_player_id IS NOT NULL
+"""
+
+def _team_goals(red_goals, white_goals, team):
+    """(scored, conceded) of the team, None if the score or the team is unknown"""
+    if red_goals is None or white_goals is None or team not in ('Red', 'White'):
+        return None
+    return (red_goals, white_goals) if team == 'Red' else (white_goals, red_goals)
+
+def _history_contribution(row):
+    """One match_history row -> ({standings column: value}, {captain column: value} or None)"""
+    chat_id, thread_id, player_id, team, points, goals, autogoals, yellow, red, best_def, is_captain, red_goals, white_goals, assists, _ = row
+    result = _team_goals(red_goals, white_goals, team)
+    wins = draws = losses = tournament_points = goals_diff = 0
+    if result:
+        scored, conceded = result
+        wins, draws, losses = int(scored > conceded), int(scored == conceded), int(scored < conceded)
+        tournament_points = 3 * wins + draws
+        goals_diff = scored - conceded
+    rated = not is_captain and points is not None
+    player = {
+        "games": 1, "wins": wins, "draws": draws, "losses": losses, "points": tournament_points,
+        "goals": goals or 0, "autogoals": autogoals or 0, "assists": assists or 0,
+        "yellow_cards": yellow or 0, "red_cards": red or 0, "best_defender": best_def or 0,
+        "goals_diff": goals_diff, "rating_sum": points if rated else 0, "rating_count": int(rated),
+    }
+    captain = None
+    if is_captain:
+        captain = {
+            "games": 1, "wins": wins, "draws": draws, "losses": losses, "points": tournament_points,
+            "goals_scored": result[0] if result else 0, "goals_conceded": result[1] if result else 0,
+        }
+    return player, captain
+
+def _seasons_of(season_id):
+    """Standings rows a match counts in: all-time (0) and its own season"""
+    return (0, season_id) if season_id else (0,)
+
+def _add_standings(cursor, table, columns, chat_id, thread_id, season_id, player_id, values, sign):
+    cursor.execute(f"""
+        INSERT INTO {table} (chat_id, thread_id, season_id, player_id, {", ".join(columns)})
+        VALUES (%s, %s, %s, %s, {", ".join(["%s"] * len(columns))})
+        ON DUPLICATE KEY UPDATE {", ".join(f"{c} = {c} + VALUES({c})" for c in columns)}
+    """, (chat_id, thread_id, season_id, player_id, *(sign * values.get(c, 0) for c in columns)))
+
+def _history_rows(cursor, where, params):
+    cursor.execute(f"{_HISTORY_ROWS} WHERE {where} FOR UPDATE", params)
+    return cursor.fetchall()
+
+def _assist_rows(cursor, where, params):
+    cursor.execute(f"{_ASSIST_ROWS} AND {where} FOR UPDATE", params)
+    return cursor.fetchall()
+
+def _apply_history(cursor, rows, sign):
+    for row in rows:
+        player, captain = _history_contribution(row)
+        chat_id, thread_id, player_id = row[0], row[1], row[2]
+        for season_id in _seasons_of(row[-1]):
+            _add_standings(cursor, "standings", STANDINGS_COLUMNS, chat_id, thread_id, season_id, player_id, player, sign)
+            if captain:
+                _add_standings(cursor, "captain_standings", CAPTAIN_COLUMNS, chat_id, thread_id, season_id, player_id, captain, sign)
+
+def _apply_assists(cursor, rows, sign):
+    for chat_id, thread_id, player_id, match_season_id in rows:
+        for season_id in _seasons_of(match_season_id):
+            _add_standings(cursor, "standings", STANDINGS_COLUMNS, chat_id, thread_id, season_id, player_id, {"assists": 1}, sign)
+
+def rebuild_standings(chat_id=None, thread_id=None):
+    """Recomputes standings and player forms of one chat/thread (or of all chats) from match_history in one transaction"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    scope, params = "", ()
+    if chat_id is not None:
+        scope, params = " AND m.chat_id = %s AND m.thread_id = %s", (chat_id, thread_id or 0)
+        for table in ("standings", "captain_standings"):
+            cursor.execute(f"DELETE FROM {table} WHERE chat_id = %s AND thread_id = %s", params)
+    else:
+        for table in ("standings", "captain_standings"):
+            cursor.execute(f"DELETE FROM {table}")
+    cursor.execute(f"{_HISTORY_ROWS} WHERE 1 = 1{scope}", params)
+    totals, captains = {}, {}
+    for row in cursor.fetchall():
+        player, captain = _history_contribution(row)
+        for season_id in _seasons_of(row[-1]):
+            key = (row[0], row[1], season_id, row[2])
+            acc = totals.setdefault(key, dict.fromkeys(STANDINGS_COLUMNS, 0))
+            for column, value in player.items():
+                acc[column] += value
+            if captain:
+                acc = captains.setdefault(key, dict.fromkeys(CAPTAIN_COLUMNS, 0))
+                for column, value in captain.items():
+                    acc[column] += value
+    cursor.execute(f"{_ASSIST_ROWS}{scope}", params)
+    for chat, thread, player_id, match_season_id in cursor.fetchall():
+        for season_id in _seasons_of(match_season_id):
+            totals.setdefault((chat, thread, season_id, player_id), dict.fromkeys(STANDINGS_COLUMNS, 0))["assists"] += 1
+    for table, columns, data in (("standings", STANDINGS_COLUMNS, totals), ("captain_standings", CAPTAIN_COLUMNS, captains)):
+        if data:
+            cursor.executemany(f"""
+                INSERT INTO {table} (chat_id, thread_id, season_id, player_id, {", ".join(columns)})
+                VALUES (%s, %s, %s, %s, {", ".join(["%s"] * len(columns))})
+            """, [(*key, *(values[c] for c in columns)) for key, values in data.items()])
+    _rebuild_forms(cursor, scope, params)
+    if chat_id is not None:
+        _bump_chat_stats_version(cursor, chat_id, thread_id or 0)
+    else:
+        cursor.execute("UPDATE stats_versions SET version = version + 1, image_file_id = NULL")
+    conn.commit()
+    conn.close()
+    return len(totals)
+
+# --- STATS VERSION ---
+
+# Queries resolving the chat of a stats write, for _bump_stats_version
+_MATCH_CHAT = "SELECT chat_id, thread_id FROM matches WHERE id = %s"
+_HISTORY_CHAT = """
+    SELECT m.chat_id, m.thread_id FROM match_history mh
+    JOIN matches m ON mh.match_id = m.id WHERE mh.id = %s
+"""
+_EVENT_CHAT = """
+    SELECT m.chat_id, m.thread_id FROM match_events me
+    JOIN match_history mh ON me.match_history_id = mh.id
+    JOIN matches m ON mh.match_id = m.id WHERE me.id = %s
+"""
+_PLAYER_CHATS = """
+    SELECT chat_id, thread_id FROM player_stats WHERE player_id = %s
+    UNION
+    SELECT m.chat_id, m.thread_id FROM match_history mh
+    JOIN matches m ON mh.match_id = m.id WHERE mh.player_id = %s
+"""
+
+def _bump_stats_version(cursor, chat_query, *keys):
+    """Invalidates the /table image of the chats chat_query selects, inside the writer's transaction"""
+    cursor.execute(f"""
+        INSERT INTO stats_versions (chat_id, thread_id, version)
+        SELECT chat_id, thread_id, 1 FROM ({chat_query}) AS c
+        ON DUPLICATE KEY UPDATE version = version + 1, image_file_id = NULL
+    """, keys)
+
+def _bump_chat_stats_version(cursor, chat_id, thread_id):
+    cursor.execute("""
+        INSERT INTO stats_versions (chat_id, thread_id, version) VALUES (%s, %s, 1)
+        ON DUPLICATE KEY UPDATE version = version + 1, image_file_id = NULL
+    """, (chat_id, thread_id))
+
+def get_stats_version(chat_id, thread_id):
+    """(version, image_file_id) of the chat; (0, None) before the first write"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT version, image_file_id FROM stats_versions WHERE chat_id = %s AND thread_id = %s", (chat_id, thread_id))
+    row = cursor.fetchone()
+    conn.close()
+    return (row[0], row[1]) if row else (0, None)
+
+def set_table_file_id(chat_id, thread_id, version, file_id):
+    """Remembers the sent image, unless the stats moved on while it was rendered"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO stats_versions (chat_id, thread_id, version, image_file_id)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE image_file_id = IF(version = VALUES(version), VALUES(image_file_id), image_file_id)
+    """, (chat_id, thread_id, version, file_id))
+    conn.commit()
+    conn.close()
+
+_SCORE_RE = re.compile(r"^\s*(\d+)\s*:\s*(\d+)\s*$")
+
+def parse_score(score):
+    """'3:2' -> (red_goals, white_goals); (None, None) if the score is not entered"""
+    m = _SCORE_RE.match(score or "")
+    return (int(m.group(1)), int(m.group(2))) if m else (None, None)
+
 def create_match(chat_id, thread_id, skill_level, score, match_date=None, championship_name=None):
     conn = get_connection()
     cursor = conn.cursor()
+    red_goals, white_goals = parse_score(score)
+    match_day = match_date.date() if isinstance(match_date, datetime) else (match_date or datetime.utcnow().date())
+    season_id, season_match_no = _next_season_match(cursor, chat_id, thread_id, match_day)
     if match_date:
-        cursor.execute("INSERT INTO matches (chat_id, thread_id, skill_level, score, match_date, championship_name) VALUES (%s, %s, %s, %s, %s, %s)", (chat_id, thread_id, skill_level, score, match_date, championship_name))
+        cursor.execute("INSERT INTO matches (chat_id, thread_id, skill_level, score, red_goals, white_goals, season_id, season_match_no, match_date, championship_name) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)", (chat_id, thread_id, skill_level, score, red_goals, white_goals, season_id, season_match_no, match_date, championship_name))
     else:
-        cursor.execute("INSERT INTO matches (chat_id, thread_id, skill_level, score, championship_name) VALUES (%s, %s, %s, %s, %s)", (chat_id, thread_id, skill_level, score, championship_name))
+        cursor.execute("INSERT INTO matches (chat_id, thread_id, skill_level, score, red_goals, white_goals, season_id, season_match_no, championship_name) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)", (chat_id, thread_id, skill_level, score, red_goals, white_goals, season_id, season_match_no, championship_name))
     match_id = cursor.lastrowid
+    if season_id:
+        cursor.execute("UPDATE seasons SET first_match_id = COALESCE(first_match_id, %s), last_match_id = %s WHERE id = %s", (match_id, match_id, season_id))
+    _bump_stats_version(cursor, _MATCH_CHAT, match_id)
     conn.commit()
     conn.close()
     return match_id
 
+# --- SEASONS ---
+
+def _season_bounds(cursor, chat_id, thread_id):
+    cursor.execute("SELECT season_start, season_end FROM settings WHERE chat_id = %s AND thread_id = %s", (chat_id, thread_id))
+    row = cursor.fetchone()
+    return (row[0], row[1]) if row else (None, None)
+
+def _get_season_id(cursor, chat_id, thread_id, start, end):
+    """Season row for the bounds (created on first use), locked for the caller's transaction"""
+    cursor.execute("""
+        SELECT id FROM seasons
+        WHERE chat_id = %s AND thread_id = %s AND start_date <=> %s AND end_date <=> %s
+        ORDER BY id LIMIT 1 FOR UPDATE
+    """, (chat_id, thread_id, start, end))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    cursor.execute("INSERT INTO seasons (chat_id, thread_id, start_date, end_date) VALUES (%s, %s, %s, %s)", (chat_id, thread_id, start, end))
+    return cursor.lastrowid
+
+def _next_season_match(cursor, chat_id, thread_id, match_day):
+    """(season_id, season_match_no) for a new match; (None, None) if it is outside the configured season"""
+    start, end = _season_bounds(cursor, chat_id, thread_id)
+    if (start and match_day < start) or (end and match_day > end):
+        return None, None
+    season_id = _get_season_id(cursor, chat_id, thread_id, start, end)
+    cursor.execute("UPDATE seasons SET match_count = match_count + 1 WHERE id = %s", (season_id,))
+    cursor.execute("SELECT match_count FROM seasons WHERE id = %s", (season_id,))
+    return season_id, cursor.fetchone()[0]
+
+def backfill_seasons():
+    """Puts matches without a season into the season currently configured for their chat"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT chat_id, thread_id FROM matches WHERE season_id IS NULL")
+    assigned = 0
+    for chat_id, thread_id in cursor.fetchall():
+        start, end = _season_bounds(cursor, chat_id, thread_id)
+        query = "SELECT id FROM matches WHERE chat_id = %s AND thread_id = %s AND season_id IS NULL"
+        params = [chat_id, thread_id]
+        if start:
+            query += " AND DATE(match_date) >= %s"
+            params.append(start)
+        if end:
+            query += " AND DATE(match_date) <= %s"
+            params.append(end)
+        cursor.execute(query + " ORDER BY id", tuple(params))
+        match_ids = [r[0] for r in cursor.fetchall()]
+        if not match_ids:
+            continue
+        season_id = _get_season_id(cursor, chat_id, thread_id, start, end)
+        cursor.execute("SELECT match_count FROM seasons WHERE id = %s", (season_id,))
+        count = cursor.fetchone()[0]
+        cursor.executemany(
+            "UPDATE matches SET season_id = %s, season_match_no = %s WHERE id = %s",
+            [(season_id, count + i, match_id) for i, match_id in enumerate(match_ids, 1)]
+        )
+        cursor.execute("""
+            UPDATE seasons SET match_count = match_count + %s,
+                first_match_id = COALESCE(first_match_id, %s), last_match_id = GREATEST(COALESCE(last_match_id, 0), %s)
+            WHERE id = %s
+        """, (len(match_ids), match_ids[0], match_ids[-1], season_id))
+        conn.commit()
+        assigned += len(match_ids)
+    conn.close()
+    return assigned
+
 def get_season_match_number(chat_id, thread_id, match_id=None):
     """Get the match number within the current season for this chat/thread.
     
-    If match_id is provided, returns the number for that specific match.
+    If match_id is provided, returns the number for that specific match
+    (stored on insert; matches outside any season get their overall number in the chat).
     Otherwise, returns the count of all matches in the current season.
     """
     conn = get_connection()
     cursor = conn.cursor()
-    
-    # Get season dates from settings
-    settings = get_match_settings(chat_id, thread_id)
-    season_start = settings.get('season_start')
-    season_end = settings.get('season_end')
-    
-    # Build date filter
-    date_filter = ""
-    params = [chat_id, thread_id]
-    
-    if season_start and season_start != "—":
-        date_filter += " AND DATE(match_date) >= %s"
-        params.append(season_start)
-    
-    if season_end and season_end != "—":
-        date_filter += " AND DATE(match_date) <= %s"
-        params.append(season_end)
-    
     if match_id:
-        # Count matches before this one (including it)
-        cursor.execute(f"""
-            SELECT COUNT(*) FROM matches 
-            WHERE chat_id = %s AND thread_id = %s AND id <= %s {date_filter}
-        """, params[:2] + [match_id] + params[2:])
+        cursor.execute("SELECT season_match_no FROM matches WHERE id = %s", (match_id,))
+        row = cursor.fetchone()
+        if row and row[0] is not None:
+            conn.close()
+            return row[0]
+        cursor.execute("SELECT COUNT(*) FROM matches WHERE chat_id = %s AND thread_id = %s AND id <= %s", (chat_id, thread_id, match_id))
     else:
-        # Count all matches in season
-        cursor.execute(f"""
-            SELECT COUNT(*) FROM matches 
-            WHERE chat_id = %s AND thread_id = %s {date_filter}
-        """, params)
-    
+        cursor.execute("""
+            SELECT COALESCE(MAX(se.match_count), 0) FROM settings st
+            JOIN seasons se ON se.chat_id = st.chat_id AND se.thread_id = st.thread_id
+                AND se.start_date <=> st.season_start AND se.end_date <=> st.season_end
+            WHERE st.chat_id = %s AND st.thread_id = %s
+        """, (chat_id, thread_id))
     count = cursor.fetchone()[0]
     conn.close()
     return count
@@ -1244,6 +1841,8 @@ def get_season_match_number(chat_id, thread_id, match_id=None):
 def save_player_rating(match_id, player_id, points, team, is_best_defender=0, goals=0, autogoals=0, is_captain=0, yellow_cards=0, red_cards=0):
     conn = get_connection()
     cursor = conn.cursor()
+    where = ("mh.match_id = %s AND mh.player_id = %s", (match_id, player_id))
+    _apply_history(cursor, _history_rows(cursor, *where), -1)
     cursor.execute("""
         INSERT INTO match_history (match_id, player_id, points, team, best_defender, goals, autogoals, is_captain, yellow_cards, red_cards)
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
@@ -1256,6 +1855,10 @@ def save_player_rating(match_id, player_id, points, team, is_best_defender=0, go
             yellow_cards = yellow_cards + VALUES(yellow_cards),
             red_cards = red_cards + VALUES(red_cards)
     """, (match_id, player_id, points, team, is_best_defender, goals, autogoals, is_captain, yellow_cards, red_cards))
+    rows = _history_rows(cursor, *where)
+    _apply_history(cursor, rows, 1)
+    _refresh_forms(cursor, rows)
+    _bump_stats_version(cursor, _MATCH_CHAT, match_id)
     conn.commit()
     conn.close()
 
@@ -1268,12 +1871,13 @@ def get_match_player_count(match_id):
     return count
 
 def update_payment_status(player_id, chat_id, thread_id, status):
-    """Update payment status for a player in a specific registration"""
+    """Update payment status for a player in a specific registration.
+    updated_at is the queue order (see get_waitlist_rows), a payment must not move the player."""
     conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("""
         UPDATE registrations 
-        SET is_paid = %s, updated_at = CURRENT_TIMESTAMP 
+        SET is_paid = %s, updated_at = updated_at
         WHERE player_id = %s AND chat_id = %s AND thread_id = %s
     """, (status, player_id, chat_id, thread_id))
     conn.commit()
@@ -1289,8 +1893,12 @@ def add_match_event(match_history_id, event_type, minute=None, assist_player_id=
         INSERT INTO match_events (match_history_id, event_type, minute, assist_player_id)
         VALUES (%s, %s, %s, %s)
     """, (match_history_id, event_type, minute, assist_player_id))
-    conn.commit()
     event_id = cursor.lastrowid
+    rows = _assist_rows(cursor, "me.id = %s", (event_id,))
+    _apply_assists(cursor, rows, 1)
+    _refresh_forms(cursor, rows)
+    _bump_stats_version(cursor, _HISTORY_CHAT, match_history_id)
+    conn.commit()
     conn.close()
     return event_id
 
@@ -1298,9 +1906,15 @@ def update_match_event_assist(event_id, assist_player_id):
     """Update assist_player_id for a match event"""
     conn = get_connection()
     cursor = conn.cursor()
+    before = _assist_rows(cursor, "me.id = %s", (event_id,))
+    _apply_assists(cursor, before, -1)
     cursor.execute("""
         UPDATE match_events SET assist_player_id = %s WHERE id = %s
     """, (assist_player_id, event_id))
+    after = _assist_rows(cursor, "me.id = %s", (event_id,))
+    _apply_assists(cursor, after, 1)
+    _refresh_forms(cursor, before, after)
+    _bump_stats_version(cursor, _EVENT_CHAT, event_id)
     conn.commit()
     conn.close()
 
@@ -1308,7 +1922,11 @@ def mark_event_as_penalty(event_id):
     """Mark a match event as a penalty goal"""
     conn = get_connection()
     cursor = conn.cursor()
+    rows = _assist_rows(cursor, "me.id = %s", (event_id,))
+    _apply_assists(cursor, rows, -1)
     cursor.execute("UPDATE match_events SET is_penalty = 1, assist_player_id = NULL WHERE id = %s", (event_id,))
+    _refresh_forms(cursor, rows)
+    _bump_stats_version(cursor, _EVENT_CHAT, event_id)
     conn.commit()
     conn.close()
 
@@ -1321,12 +1939,18 @@ def save_assist(match_id, player_id, team='Unknown'):
     # but if not, we need to insert. 
     # Ideally assists come from players who played.
     
+    where = ("mh.match_id = %s AND mh.player_id = %s", (match_id, player_id))
+    _apply_history(cursor, _history_rows(cursor, *where), -1)
     cursor.execute("""
         INSERT INTO match_history (match_id, player_id, points, team, assists)
         VALUES (%s, %s, 0, %s, 1)
         ON DUPLICATE KEY UPDATE 
             assists = assists + 1
     """, (match_id, player_id, team))
+    rows = _history_rows(cursor, *where)
+    _apply_history(cursor, rows, 1)
+    _refresh_forms(cursor, rows)
+    _bump_stats_version(cursor, _MATCH_CHAT, match_id)
     conn.commit()
     conn.close()
 
@@ -1346,7 +1970,12 @@ def delete_match_event(event_id):
     """Delete a match event"""
     conn = get_connection()
     cursor = conn.cursor()
+    # Bump first, the event row is needed to find the chat
+    _bump_stats_version(cursor, _EVENT_CHAT, event_id)
+    rows = _assist_rows(cursor, "me.id = %s", (event_id,))
+    _apply_assists(cursor, rows, -1)
     cursor.execute("DELETE FROM match_events WHERE id = %s", (event_id,))
+    _refresh_forms(cursor, rows)
     conn.commit()
     conn.close()
 
@@ -1394,24 +2023,472 @@ def clear_match_stats(match_id):
     # ON DELETE CASCADE is set for history->matches. 
     # But we want to keep match record.
     # So we delete from match_history and cascading will delete events.
+    history = _history_rows(cursor, "mh.match_id = %s", (match_id,))
+    assists = _assist_rows(cursor, "mh.match_id = %s", (match_id,))
+    _apply_history(cursor, history, -1)
+    _apply_assists(cursor, assists, -1)
     cursor.execute("DELETE FROM match_history WHERE match_id = %s", (match_id,))
+    # Stats entered again come with their events
+    cursor.execute("UPDATE matches SET events_rolled_up = 0 WHERE id = %s", (match_id,))
+    _refresh_forms(cursor, history, assists)
+    _bump_stats_version(cursor, _MATCH_CHAT, match_id)
     conn.commit()
     conn.close()
 
 def update_match_score(match_id, score, skill_level, championship_name):
     conn = get_connection()
     cursor = conn.cursor()
+    # W/D/L and goal difference of everyone in the match depend on the score
+    where = ("mh.match_id = %s", (match_id,))
+    _apply_history(cursor, _history_rows(cursor, *where), -1)
+    red_goals, white_goals = parse_score(score)
     cursor.execute("""
         UPDATE matches 
-        SET score = %s, skill_level = %s, championship_name = %s 
+        SET score = %s, red_goals = %s, white_goals = %s, skill_level = %s, championship_name = %s 
         WHERE id = %s
-    """, (score, skill_level, championship_name, match_id))
+    """, (score, red_goals, white_goals, skill_level, championship_name, match_id))
+    rows = _history_rows(cursor, *where)
+    _apply_history(cursor, rows, 1)
+    _refresh_forms(cursor, rows)
+    _bump_stats_version(cursor, _MATCH_CHAT, match_id)
     conn.commit()
     conn.close()
 
 def update_match_event_assist(event_id, assist_player_id):
     conn = get_connection()
     cursor = conn.cursor()
+    before = _assist_rows(cursor, "me.id = %s", (event_id,))
+    _apply_assists(cursor, before, -1)
     cursor.execute("UPDATE match_events SET assist_player_id = %s WHERE id = %s", (assist_player_id, event_id))
+    after = _assist_rows(cursor, "me.id = %s", (event_id,))
+    _apply_assists(cursor, after, 1)
+    _refresh_forms(cursor, before, after)
+    _bump_stats_version(cursor, _EVENT_CHAT, event_id)
+    conn.commit()
+    conn.close()
+
+# === SCHEDULED DELETIONS ===
+
+def add_scheduled_deletion(chat_id, message_id, due_at):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO scheduled_deletions (chat_id, message_id, due_at) VALUES (%s, %s, %s)", (chat_id, message_id, due_at))
+    job_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+    return job_id
+
+def get_scheduled_deletions(limit, due_before=None, shard=None):
+    """Returns the earliest pending deletions as (id, chat_id, message_id, due_at).
+    shard=(shard_id, shard_count) limits the result to chats of one shard."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    query = "SELECT id, chat_id, message_id, due_at FROM scheduled_deletions WHERE 1=1"
+    params = []
+    if shard:
+        query += " AND MOD(ABS(chat_id), %s) = %s"
+        params += [shard[1], shard[0]]
+    if due_before:
+        query += " AND due_at <= %s"
+        params.append(due_before)
+    query += " ORDER BY due_at LIMIT %s"
+    params.append(limit)
+    cursor.execute(query, tuple(params))
+    res = cursor.fetchall()
+    conn.close()
+    return res
+
+def delete_scheduled_deletions(job_ids):
+    if not job_ids:
+        return
+    conn = get_connection()
+    cursor = conn.cursor()
+    placeholders = ", ".join(["%s"] * len(job_ids))
+    cursor.execute(f"DELETE FROM scheduled_deletions WHERE id IN ({placeholders})", tuple(job_ids))
+    conn.commit()
+    conn.close()
+
+# === SHARD LOCKS ===
+
+def try_acquire_shard_lock(shard_id, owner, ttl_seconds):
+    """Takes or renews shard ownership. Stale locks (no heartbeat for ttl) can be taken over."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    # Assignments run left to right: heartbeat_at sees the already updated owner
+    cursor.execute("""
+        INSERT INTO shard_locks (shard_id, owner, heartbeat_at) VALUES (%s, %s, NOW())
+        ON DUPLICATE KEY UPDATE
+            owner = IF(owner = VALUES(owner) OR heartbeat_at < NOW() - INTERVAL %s SECOND, VALUES(owner), owner),
+            heartbeat_at = IF(owner = VALUES(owner), NOW(), heartbeat_at)
+    """, (shard_id, owner, ttl_seconds))
+    conn.commit()
+    cursor.execute("SELECT owner FROM shard_locks WHERE shard_id = %s", (shard_id,))
+    res = cursor.fetchone()
+    conn.close()
+    return bool(res and res[0] == owner)
+
+def get_fsm_target_chat(chat_id, user_id):
+    """Group chat_id an FSM flow works on (data['chat_id'] of private admin flows), None if there is none"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT data FROM fsm_data WHERE chat_id = %s AND user_id = %s", (chat_id, user_id))
+    row = cursor.fetchone()
+    conn.close()
+    if not row or not row[0]:
+        return None
+    try:
+        target = json.loads(row[0]).get('chat_id')
+    except (ValueError, AttributeError):
+        return None
+    return int(target) if target else None
+
+def release_shard_lock(shard_id, owner):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM shard_locks WHERE shard_id = %s AND owner = %s", (shard_id, owner))
+    conn.commit()
+    conn.close()
+
+# === TRACKED MESSAGES ===
+
+def add_tracked_message(chat_id, thread_id, owner_id, message_id, max_per_flow=200):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO tracked_messages (chat_id, thread_id, owner_id, message_id) VALUES (%s, %s, %s, %s)",
+        (chat_id, thread_id, owner_id, message_id)
+    )
+    # Keep only the newest max_per_flow rows of this flow
+    cursor.execute("""
+        DELETE t FROM tracked_messages t
+        JOIN (
+            SELECT id FROM tracked_messages
+            WHERE chat_id = %s AND thread_id = %s AND owner_id = %s
+            ORDER BY id DESC LIMIT 1 OFFSET %s
+        ) edge ON t.id <= edge.id
+        WHERE t.chat_id = %s AND t.thread_id = %s AND t.owner_id = %s
+    """, (chat_id, thread_id, owner_id, max_per_flow, chat_id, thread_id, owner_id))
+    conn.commit()
+    conn.close()
+
+def pop_tracked_messages(chat_id, thread_id, owner_id, exclude_ids=()):
+    """Returns tracked message ids of a flow and forgets them; ids in exclude_ids stay tracked"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT id, message_id FROM tracked_messages WHERE chat_id = %s AND thread_id = %s AND owner_id = %s",
+        (chat_id, thread_id, owner_id)
+    )
+    rows = [r for r in cursor.fetchall() if r[1] not in exclude_ids]
+    if rows:
+        placeholders = ", ".join(["%s"] * len(rows))
+        cursor.execute(f"DELETE FROM tracked_messages WHERE id IN ({placeholders})", tuple(r[0] for r in rows))
+        conn.commit()
+    conn.close()
+    return [r[1] for r in rows]
+
+def clear_tracked_messages(chat_id, thread_id, owner_id):
+    """Forgets the tracked messages of a flow without deleting them (the flow ended)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "DELETE FROM tracked_messages WHERE chat_id = %s AND thread_id = %s AND owner_id = %s",
+        (chat_id, thread_id, owner_id)
+    )
+    conn.commit()
+    conn.close()
+
+# === RETENTION (see maintenance.py) ===
+# Each call handles at most `limit` rows in its own short transaction and returns what it removed.
+
+def expire_fsm_data(idle_before, limit):
+    """Deletes FSM rows not written since idle_before"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM fsm_data WHERE updated_at < %s ORDER BY updated_at LIMIT %s", (idle_before, limit))
+    count = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return count
+
+def expire_draw_votes(before, limit):
+    """Deletes draw votes cast before `before` (draws are settled long before that)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM draw_votes WHERE vote_time < %s ORDER BY vote_time LIMIT %s", (before, limit))
+    count = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return count
+
+def expire_draft_states(idle_before, limit, shard=None):
+    """Deletes drafts not written since idle_before; ([(chat_id, thread_id)], bytes of state_data freed).
+    shard=(shard_id, shard_count) limits it to chats of one shard, whose process caches their drafts."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    query = "SELECT chat_id, thread_id, COALESCE(LENGTH(state_data), 0) FROM draft_state WHERE updated_at < %s"
+    params = [idle_before]
+    if shard:
+        query += " AND MOD(ABS(chat_id), %s) = %s"
+        params += [shard[1], shard[0]]
+    query += " ORDER BY updated_at LIMIT %s FOR UPDATE"
+    params.append(limit)
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    if rows:
+        cursor.executemany("DELETE FROM draft_state WHERE chat_id = %s AND thread_id = %s", [r[:2] for r in rows])
+    conn.commit()
+    conn.close()
+    return [r[:2] for r in rows], sum(r[2] for r in rows)
+
+def expire_tracked_messages(before, limit):
+    """Deletes tracked messages created before `before`"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM tracked_messages WHERE created_at < %s ORDER BY id LIMIT %s", (before, limit))
+    count = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return count
+
+def rollup_match_events(played_before, limit):
+    """
+    Folds the events of up to `limit` matches played before played_before into match_history:
+    assists go to match_history.assists, goals and cards are already counted there.
+    An assist of a player without a match_history row in that match keeps its event.
+    Standings and forms do not change. Returns (matches, events deleted).
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id FROM matches WHERE events_rolled_up = 0 AND match_date < %s
+        ORDER BY match_date LIMIT %s FOR UPDATE
+    """, (played_before, limit))
+    match_ids = [r[0] for r in cursor.fetchall()]
+    if not match_ids:
+        conn.close()
+        return 0, 0
+    placeholders = ", ".join(["%s"] * len(match_ids))
+    cursor.execute(f"""
+        SELECT mh.match_id, me.assist_player_id, COUNT(*)
+        FROM match_events me
+        JOIN match_history mh ON me.match_history_id = mh.id
+        WHERE mh.match_id IN ({placeholders}) AND me.event_type = 'goal' AND me.assist_player_id IS NOT NULL
+        GROUP BY mh.match_id, me.assist_player_id
+    """, tuple(match_ids))
+    assists = cursor.fetchall()
+    cursor.execute(f"UPDATE match_history SET assists = 0 WHERE match_id IN ({placeholders})", tuple(match_ids))
+    if assists:
+        cursor.executemany("UPDATE match_history SET assists = %s WHERE match_id = %s AND player_id = %s",
+                           [(count, match_id, player_id) for match_id, player_id, count in assists])
+    cursor.execute(f"""
+        DELETE me FROM match_events me
+        JOIN match_history mh ON me.match_history_id = mh.id
+        LEFT JOIN match_history ah ON ah.match_id = mh.match_id AND ah.player_id = me.assist_player_id
+        WHERE mh.match_id IN ({placeholders})
+          AND NOT (me.event_type = 'goal' AND me.assist_player_id IS NOT NULL AND ah.id IS NULL)
+    """, tuple(match_ids))
+    deleted = cursor.rowcount
+    cursor.execute(f"UPDATE matches SET events_rolled_up = 1 WHERE id IN ({placeholders})", tuple(match_ids))
+    conn.commit()
+    conn.close()
+    return len(match_ids), deleted
+
+def get_reminder_chats(shard=None):
+    """(chat_id, thread_id, match_times, timezone, fired_until, fired_kind) for every chat with a match time set"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    query = """
+        SELECT s.chat_id, s.thread_id, s.match_times, s.timezone, r.fired_until, r.fired_kind
+        FROM settings s
+        LEFT JOIN reminder_state r ON r.chat_id = s.chat_id AND r.thread_id = s.thread_id
+        WHERE s.match_times IS NOT NULL AND s.match_times <> '—'
+    """
+    params = []
+    if shard:
+        query += " AND MOD(ABS(s.chat_id), %s) = %s"
+        params += [shard[1], shard[0]]
+    cursor.execute(query, tuple(params))
+    res = cursor.fetchall()
+    conn.close()
+    return res
+
+def set_reminder_position(chat_id, thread_id, fired_until, fired_kind=None):
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO reminder_state (chat_id, thread_id, fired_until, fired_kind) VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE fired_until = VALUES(fired_until), fired_kind = VALUES(fired_kind)
+    """, (chat_id, thread_id, fired_until, fired_kind))
     conn.commit()
     conn.close()
+
+# --- STANDINGS ---
+
+# Result of one match_history row for its player: 1 win, 0 draw, -1 loss
+_RESULT_SQL = "CASE mh.team WHEN 'Red' THEN m.result WHEN 'White' THEN -m.result END"
+
+def get_championship_standings(chat_id, thread_id, season_id=0):
+    """Player rows of the championship table, best first (the #stats-card of the site); season_id 0 = all matches"""
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT
+            s.player_id AS id,
+            COALESCE(ps.display_name, p.name) AS name,
+            s.games, s.points, s.goals, s.autogoals, s.goals_diff, s.assists,
+            s.yellow_cards, s.red_cards,
+            s.rating_sum / NULLIF(s.rating_count, 0) AS avg_rating
+        FROM standings s
+        JOIN players p ON p.id = s.player_id
+        LEFT JOIN player_stats ps ON p.id = ps.player_id AND ps.chat_id = s.chat_id AND ps.thread_id = s.thread_id
+        WHERE s.chat_id = %s AND s.thread_id = %s AND s.season_id = %s AND s.games > 0
+        ORDER BY s.points DESC, s.goals DESC, s.assists DESC, s.games ASC
+    """, (chat_id, thread_id, season_id))
+    res = cursor.fetchall()
+    conn.close()
+    return res
+
+def get_recent_form(chat_id, thread_id, limit=5):
+    """{player_id: ['W'|'D'|'L'|None, ...]} over the last `limit` matches, oldest first (None = did not play)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id FROM matches WHERE chat_id = %s AND thread_id = %s
+        ORDER BY match_date DESC LIMIT %s
+    """, (chat_id, thread_id, limit))
+    match_ids = [r[0] for r in cursor.fetchall()][::-1]
+    form = {}
+    if match_ids:
+        placeholders = ", ".join(["%s"] * len(match_ids))
+        cursor.execute(f"""
+            SELECT mh.player_id, mh.match_id, {_RESULT_SQL} AS result
+            FROM match_history mh
+            JOIN matches m ON mh.match_id = m.id
+            WHERE mh.match_id IN ({placeholders})
+        """, tuple(match_ids))
+        position = {mid: i for i, mid in enumerate(match_ids)}
+        for player_id, match_id, result in cursor.fetchall():
+            row = form.setdefault(player_id, [None] * len(match_ids))
+            row[position[match_id]] = {1: 'W', 0: 'D', -1: 'L'}.get(result, 'D')
+    conn.close()
+    return form
+
+# --- PLAYER FORM ---
+
+# Results kept per player in player_form
+PLAYER_FORM_SIZE = int(os.getenv("PLAYER_FORM_SIZE", "5"))
+
+# One player's latest matches in a chat, newest first (match_history.player_id index + LIMIT)
+_FORM_ROWS = f"""
+    SELECT mh.match_id, m.match_date, m.score, {_RESULT_SQL} AS result, mh.goals, mh.points, mh.is_captain,
+           (SELECT COUNT(*) FROM match_events me
+            JOIN match_history h ON me.match_history_id = h.id
+            WHERE h.match_id = mh.match_id AND me.event_type = 'goal' AND me.assist_player_id = mh.player_id)
+           + IF(m.events_rolled_up, mh.assists, 0) AS assists
+    FROM match_history mh
+    JOIN matches m ON mh.match_id = m.id
+    WHERE mh.player_id = %s AND m.chat_id = %s AND m.thread_id = %s
+    ORDER BY m.match_date DESC, m.id DESC
+    LIMIT %s
+"""
+
+def _form_entry(match_id, match_date, score, result, goals, points, is_captain, assists):
+    """Compact player_form item: match, date, score, W/D/L (None without a score), goals, assists, rating, captain"""
+    return {
+        "m": match_id, "d": match_date.strftime("%Y-%m-%d") if match_date else None, "s": score,
+        "r": {1: 'W', 0: 'D', -1: 'L'}.get(result), "g": goals or 0, "a": assists or 0,
+        "p": points, "c": int(bool(is_captain)),
+    }
+
+def _write_form(cursor, chat_id, thread_id, player_id, entries):
+    if entries:
+        cursor.execute("""
+            INSERT INTO player_form (chat_id, thread_id, player_id, entries) VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE entries = VALUES(entries)
+        """, (chat_id, thread_id, player_id, json.dumps(entries, separators=(",", ":"))))
+    else:
+        cursor.execute("DELETE FROM player_form WHERE chat_id = %s AND thread_id = %s AND player_id = %s",
+                       (chat_id, thread_id, player_id))
+
+def _refresh_forms(cursor, *row_lists):
+    """Reloads player_form of the players in _history_rows/_assist_rows results, inside the writer's transaction"""
+    players = {(row[0], row[1], row[2]) for rows in row_lists for row in rows if row[2] is not None}
+    for chat_id, thread_id, player_id in players:
+        cursor.execute(_FORM_ROWS, (player_id, chat_id, thread_id, PLAYER_FORM_SIZE))
+        _write_form(cursor, chat_id, thread_id, player_id, [_form_entry(*row) for row in cursor.fetchall()])
+
+def _rebuild_forms(cursor, scope, params):
+    """player_form of every player in the scope of rebuild_standings"""
+    if params:
+        cursor.execute("DELETE FROM player_form WHERE chat_id = %s AND thread_id = %s", params)
+    else:
+        cursor.execute("DELETE FROM player_form")
+    cursor.execute(f"""
+        SELECT mh.match_id, me.assist_player_id, COUNT(*)
+        FROM match_events me
+        JOIN match_history mh ON me.match_history_id = mh.id
+        JOIN matches m ON mh.match_id = m.id
+        WHERE me.event_type = 'goal' AND me.assist_player_id IS NOT NULL{scope}
+        GROUP BY mh.match_id, me.assist_player_id
+    """, params)
+    assists = {(match_id, player_id): count for match_id, player_id, count in cursor.fetchall()}
+    cursor.execute(f"""
+        SELECT m.chat_id, m.thread_id, mh.player_id,
+               mh.match_id, m.match_date, m.score, {_RESULT_SQL}, mh.goals, mh.points, mh.is_captain,
+               IF(m.events_rolled_up, mh.assists, 0)
+        FROM match_history mh
+        JOIN matches m ON mh.match_id = m.id
+        WHERE 1 = 1{scope}
+        ORDER BY m.chat_id, m.thread_id, mh.player_id, m.match_date DESC, m.id DESC
+    """, params)
+    forms = {}
+    for chat_id, thread_id, player_id, *row, rolled_assists in cursor.fetchall():
+        entries = forms.setdefault((chat_id, thread_id, player_id), [])
+        if len(entries) < PLAYER_FORM_SIZE:
+            entries.append(_form_entry(*row, assists.get((row[0], player_id), 0) + rolled_assists))
+    if forms:
+        cursor.executemany("INSERT INTO player_form (chat_id, thread_id, player_id, entries) VALUES (%s, %s, %s, %s)",
+                           [(*key, json.dumps(entries, separators=(",", ":"))) for key, entries in forms.items()])
+
+def get_player_profile(chat_id, thread_id, user_id):
+    """/me card of a Telegram user in a chat: all-time standings row + player_form, primary-key lookups only"""
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT
+            p.id, COALESCE(ps.display_name, p.name) AS name,
+            COALESCE(s.games, 0) AS games, COALESCE(s.wins, 0) AS wins, COALESCE(s.draws, 0) AS draws,
+            COALESCE(s.losses, 0) AS losses, COALESCE(s.points, 0) AS points, COALESCE(s.goals, 0) AS goals,
+            COALESCE(s.assists, 0) AS assists, COALESCE(s.goals_diff, 0) AS goals_diff,
+            COALESCE(s.yellow_cards, 0) AS yellow_cards, COALESCE(s.red_cards, 0) AS red_cards,
+            COALESCE(s.best_defender, 0) AS best_defender,
+            s.rating_sum / NULLIF(s.rating_count, 0) AS avg_rating,
+            f.entries
+        FROM players p
+        LEFT JOIN player_stats ps ON ps.player_id = p.id AND ps.chat_id = %s AND ps.thread_id = %s
+        LEFT JOIN standings s ON s.chat_id = %s AND s.thread_id = %s AND s.season_id = 0 AND s.player_id = p.id
+        LEFT JOIN player_form f ON f.chat_id = %s AND f.thread_id = %s AND f.player_id = p.id
+        WHERE p.user_id = %s
+    """, (chat_id, thread_id) * 3 + (user_id,))
+    profile = cursor.fetchone()
+    conn.close()
+    if profile:
+        profile["form"] = json.loads(profile.pop("entries") or "[]")
+    return profile
+
+
+if __name__ == "__main__":
+    # Maintenance: python database.py rebuild-standings [chat_id [thread_id]]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Database maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild = commands.add_parser("rebuild-standings", help="Recompute standings from match history")
+    rebuild.add_argument("chat_id", type=int, nargs="?")
+    rebuild.add_argument("thread_id", type=int, nargs="?", default=0)
+    args = parser.parse_args()
+
+    if args.command == "rebuild-standings":
+        count = rebuild_standings(args.chat_id, args.thread_id)
+        print(f"Standings rebuilt: {count} player rows")
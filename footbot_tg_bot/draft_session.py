@@ -0,0 +1,74 @@
+import json
+import logging
+
+import database as db
+
+logger = logging.getLogger(__name__)
+
+
+class DraftSession:
+    """Draft state of one chat/thread as last seen in the DB, with its version"""
+
+    __slots__ = ("chat_id", "thread_id", "version", "_raw")
+
+    def __init__(self, chat_id: int, thread_id: int, raw: str = None, version: int = 0):
+        self.chat_id = chat_id
+        self.thread_id = thread_id
+        self.version = version
+        self._raw = raw
+
+    @property
+    def data(self):
+        # Fresh copy on every access: callers mutate what they get
+        return json.loads(self._raw) if self._raw else None
+
+
+# (chat_id, thread_id) -> DraftSession
+_sessions = {}
+
+
+def load(chat_id: int, thread_id: int) -> DraftSession:
+    key = (chat_id, thread_id)
+    session = _sessions.get(key)
+    if session is None:
+        raw, version = db.get_draft_state_versioned(chat_id, thread_id)
+        session = DraftSession(chat_id, thread_id, raw, version)
+        _sessions[key] = session
+    return session
+
+
+def get(chat_id: int, thread_id: int):
+    """Drop-in for db.get_draft_state served from the cache"""
+    return load(chat_id, thread_id).data
+
+
+def save(chat_id: int, thread_id: int, data):
+    """Unconditional write (last writer wins), keeps the cache in sync"""
+    raw = json.dumps(data)
+    version = db.set_draft_state(chat_id, thread_id, raw)
+    _sessions[(chat_id, thread_id)] = DraftSession(chat_id, thread_id, raw, version)
+
+
+def commit(session: DraftSession, data) -> bool:
+    """
+    Compare-and-swap write against the version the session was loaded at.
+    False means someone else wrote first: the cache is dropped and the caller should re-read.
+    """
+    raw = json.dumps(data)
+    version = db.cas_draft_state(session.chat_id, session.thread_id, raw, session.version)
+    key = (session.chat_id, session.thread_id)
+    if version is None:
+        logger.info(f"Draft write conflict in {key} at version {session.version}")
+        _sessions.pop(key, None)
+        return False
+    _sessions[key] = DraftSession(session.chat_id, session.thread_id, raw, version)
+    return True
+
+
+def clear(chat_id: int, thread_id: int):
+    db.clear_draft_state(chat_id, thread_id)
+    _sessions.pop((chat_id, thread_id), None)
+
+
+def invalidate(chat_id: int, thread_id: int):
+    _sessions.pop((chat_id, thread_id), None)
@@ -1,8 +1,37 @@
+import functools
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram import types
 import translations as tr
 
+# Keyboards that depend only on lang_id and a few hashable params are built once per
+# parameter combination. Markups are shared between calls and must not be mutated.
+# Keyboards read from DB tables are not cached: the tables can change under us.
+_cached_builders = []
+
+def cached_markup(maxsize=256):
+    def decorator(fn):
+        cached = functools.lru_cache(maxsize=maxsize)(fn)
+        _cached_builders.append(cached)
+        return cached
+    return decorator
+
+def clear_keyboard_cache():
+    for fn in _cached_builders:
+        fn.cache_clear()
+
+def keyboard_cache_stats():
+    """{builder name: {hits, misses, maxsize, currsize}}"""
+    return {fn.__name__: fn.cache_info()._asdict() for fn in _cached_builders}
+
+# Labels come from translations
+tr.on_reload(clear_keyboard_cache)
+
 def get_registration_kb(player_count=0, lang_id=1, lat=None, lon=None, chat_id=None, thread_id=None, bot_username=None):
+    # Only "2+ players" matters for the layout, so the count itself is not part of the cache key
+    return _registration_kb(player_count >= 2, lang_id, lat, lon, chat_id, thread_id, bot_username)
+
+@cached_markup(maxsize=1024)
+def _registration_kb(show_draw, lang_id, lat, lon, chat_id, thread_id, bot_username):
     builder = InlineKeyboardBuilder()
     builder.button(text=tr.t("reg_att", lang_id), callback_data="reg_att")
     builder.button(text=tr.t("reg_def", lang_id), callback_data="reg_def")
@@ -18,7 +47,7 @@ def get_registration_kb(player_count=0, lang_id=1, lat=None, lon=None, chat_id=N
         # Fallback if no username passed (should not happen if updated correctly)
         builder.button(text=tr.t("reg_add_legionnaire", lang_id), callback_data="admin_add_legionnaire")
     
-    if player_count >= 2:
+    if show_draw:
         builder.button(text=tr.t("reg_draw", lang_id), callback_data="admin_draw")
     builder.adjust(2)
     return builder.as_markup()
@@ -38,6 +67,14 @@ def get_admin_main_kb(chat_id=None, thread_id=None, lang_id=1):
     builder.adjust(1)
     return builder.as_markup()
 
+def get_cancel_game_confirm_kb(chat_id=None, thread_id=None, lang_id=1):
+    builder = InlineKeyboardBuilder()
+    suffix = f"_{chat_id}_{thread_id}" if chat_id else ""
+    builder.button(text=tr.t("btn_confirm", lang_id), callback_data=f"cancel_game_yes{suffix}")
+    builder.button(text=tr.t("btn_back", lang_id), callback_data=f"admin_main_menu_back{suffix}")
+    builder.adjust(2)
+    return builder.as_markup()
+
 def get_admin_settings_kb(chat_id, thread_id, lang_id=1):
     builder = InlineKeyboardBuilder()
     builder.button(text=tr.t("setting_players", lang_id), callback_data="edit_count_start")
@@ -211,7 +248,7 @@ def get_payment_settings_kb(chat_id, thread_id, lang_id=1, settings=None):
         builder.button(text=f"{radio} {mode_text}", callback_data=f"set_cost_mode_{mode}_{chat_id}_{thread_id}")
     
     # Payment details edit button
-    builder.button(text=f"💳 {tr.t('setting_payment_details', lang_id)}", callback_data=f"edit_payment_details_{chat_id}_{thread_id}")
+    builder.button(text=f"💳 {tr.t('setting_payment_details', lang_id)}", callback_data=f"admin_edit_pay_details_{chat_id}_{thread_id}")
     
     builder.button(text=tr.t("btn_back", lang_id), callback_data=f"payment_settings_back_{chat_id}_{thread_id}")
     builder.adjust(1)
@@ -270,6 +307,7 @@ def get_admin_season_settings_kb(chat_id, thread_id, lang_id=1):
     builder.adjust(1)
     return builder.as_markup()
 
+@cached_markup()
 def get_day_selection_kb(lang_id=1):
     builder = InlineKeyboardBuilder()
     days = [("mon", "wd_mon"), ("tue", "wd_tue"), ("wed", "wd_wed"), ("thu", "wd_thu"), ("fri", "wd_fri"), ("sat", "wd_sat"), ("sun", "wd_sun")]
@@ -278,6 +316,7 @@ def get_day_selection_kb(lang_id=1):
     builder.adjust(4)
     return builder.as_markup()
 
+@cached_markup()
 def get_hour_selection_kb():
     builder = InlineKeyboardBuilder()
     for h in range(24):
@@ -285,6 +324,7 @@ def get_hour_selection_kb():
     builder.adjust(6)
     return builder.as_markup()
 
+@cached_markup()
 def get_min_selection_kb():
     builder = InlineKeyboardBuilder()
     for m in ["00", "15", "30", "45"]:
@@ -356,23 +396,6 @@ def get_core_players_selection_kb(chat_id, thread_id, lang_id=1):
     builder.adjust(1)
     return builder.as_markup()
 
-def get_stat_edit_kb(lang_id=1):
-    builder = InlineKeyboardBuilder()
-    builder.button(text=tr.t("stat_attack", lang_id), callback_data="stat_attack")
-    builder.button(text=tr.t("stat_defense", lang_id), callback_data="stat_defense")
-    builder.button(text=tr.t("stat_speed", lang_id), callback_data="stat_speed")
-    builder.button(text=tr.t("stat_gk", lang_id), callback_data="stat_gk")
-    builder.adjust(2)
-    return builder.as_markup()
-
-def get_players_list_kb(players):
-    builder = InlineKeyboardBuilder()
-    for p in players:
-        # p[0] is player_id, p[2] is name
-        builder.button(text=f"⚙️ {p[2]}", callback_data=f"edit_p_{p[0]}")
-    builder.adjust(2)
-    return builder.as_markup()
-
 def get_legionnaire_list_kb(players, action_prefix="sel_myth_", create_callback="create_new_legionnaire", back_callback="admin_player_mgmt", lang_id=1):
     builder = InlineKeyboardBuilder()
     for p in players:
@@ -445,6 +468,7 @@ def get_chat_players_kb(players, lang_id=1):
     builder.adjust(1)
     return builder.as_markup()
 
+@cached_markup()
 def get_draw_options_kb(lang_id=1):
     builder = InlineKeyboardBuilder()
     builder.button(text=tr.t("draw_opt_all", lang_id), callback_data="draw_mode_all")
@@ -492,6 +516,7 @@ def get_venue_type_kb(lang_id=1):
 
 # ... language_kb skipped (dynamic) ...
 
+@cached_markup()
 def get_draw_count_kb(lang_id=1):
     builder = InlineKeyboardBuilder()
     builder.button(text=tr.t("draw_1_auto", lang_id), callback_data="draw_count_1")
@@ -514,6 +539,7 @@ def get_vote_kb(variant_id, votes=0, lang_id=1):
     builder.button(text=f"{tr.t('vote_this', lang_id)} ({votes})", callback_data=f"vote_{variant_id}")
     return builder.as_markup()
 
+@cached_markup()
 def get_ask_captains_kb(lang_id=1):
     builder = InlineKeyboardBuilder()
     builder.button(text=tr.t("cap_yes", lang_id), callback_data="cap_ask_yes")
@@ -562,22 +588,12 @@ def get_defender_pick_kb(players):
     builder.adjust(2)
     return builder.as_markup()
 
+@cached_markup()
 def get_score_entry_kb(lang_id=1):
     builder = InlineKeyboardBuilder()
     builder.button(text=tr.t("enter_score", lang_id), callback_data="match_enter_score")
     return builder.as_markup()
 
-def get_edit_stats_kb(players):
-    builder = InlineKeyboardBuilder()
-    for p in players:
-        # p[0]=id, p[1]=name, p[2]=att, p[3]=def, p[4]=spd, p[5]=gk
-        att = p[2] if p[2] is not None else 50
-        df = p[3] if p[3] is not None else 50
-        spd = p[4] if p[4] is not None else 50
-        gk = p[5] if p[5] is not None else 50
-        builder.button(text=f"{p[1]} ({att}/{df}/{spd}/{gk})", callback_data=f"edit_stats_{p[0]}")
-    builder.adjust(1)
-    return builder.as_markup()
 def get_goal_scorer_kb(players, is_autogol_mode=False, lang_id=1):
     builder = InlineKeyboardBuilder()
     for p in players:
@@ -589,33 +605,7 @@ def get_goal_scorer_kb(players, is_autogol_mode=False, lang_id=1):
     builder.adjust(2)
     return builder.as_markup()
 
-def get_weekday_kb(lang_id=1):
-    builder = InlineKeyboardBuilder()
-    days = [
-        (tr.t("wd_mon", lang_id), "mon"), (tr.t("wd_tue", lang_id), "tue"), 
-        (tr.t("wd_wed", lang_id), "wed"), (tr.t("wd_thu", lang_id), "thu"),
-        (tr.t("wd_fri", lang_id), "fri"), (tr.t("wd_sat", lang_id), "sat"), 
-        (tr.t("wd_sun", lang_id), "sun")
-    ]
-    for label, val in days:
-        builder.button(text=label, callback_data=f"time_day_{val}")
-    builder.adjust(4)
-    return builder.as_markup()
-
-def get_hours_kb():
-    builder = InlineKeyboardBuilder()
-    for h in range(24):
-        builder.button(text=f"{h:02d}:00", callback_data=f"time_hour_{h}")
-    builder.adjust(4)
-    return builder.as_markup()
-
-def get_minutes_kb():
-    builder = InlineKeyboardBuilder()
-    for m in [0, 15, 30, 45]:
-        builder.button(text=f":{m:02d}", callback_data=f"time_min_{m}")
-    builder.adjust(2)
-    return builder.as_markup()
-
+@cached_markup()
 def get_timezone_kb():
     builder = InlineKeyboardBuilder()
     zones = ["GMT-1", "GMT+0", "GMT+1", "GMT+2", "GMT+3", "GMT+4", "GMT+5", "GMT+6", "GMT+7", "GMT+8", "GMT+9"]
@@ -624,36 +614,6 @@ def get_timezone_kb():
     builder.adjust(3)
     return builder.as_markup()
 
-def get_months_kb(lang_id=1):
-    builder = InlineKeyboardBuilder()
-    months_keys = [
-        ("mon_jan", 1), ("mon_feb", 2), ("mon_mar", 3), ("mon_apr", 4),
-        ("mon_may", 5), ("mon_jun", 6), ("mon_jul", 7), ("mon_aug", 8),
-        ("mon_sep", 9), ("mon_oct", 10), ("mon_nov", 11), ("mon_dec", 12)
-    ]
-    for key, val in months_keys:
-        builder.button(text=tr.t(key, lang_id), callback_data=f"date_month_{val}")
-    builder.adjust(3)
-    return builder.as_markup()
-
-def get_days_kb(month: int):
-    builder = InlineKeyboardBuilder()
-    # Simplified: 31 days for any month for UI ease, or calculate
-    days_in_month = {1:31, 2:29, 3:31, 4:30, 5:31, 6:30, 7:31, 8:31, 9:30, 10:31, 11:30, 12:31}
-    for d in range(1, days_in_month.get(month, 31) + 1):
-        builder.button(text=str(d), callback_data=f"date_day_{d}")
-    builder.adjust(7)
-    return builder.as_markup()
-
-def get_years_kb():
-    builder = InlineKeyboardBuilder()
-    import datetime
-    curr_year = datetime.datetime.now().year
-    builder.button(text=str(curr_year), callback_data=f"date_year_{curr_year}")
-    builder.button(text=str(curr_year + 1), callback_data=f"date_year_{curr_year + 1}")
-    builder.adjust(2)
-    return builder.as_markup()
-
 def get_pairs_builder_kb(players, selected_ids, selection_phase="left", can_proceed=False, lang_id=1):
     builder = InlineKeyboardBuilder()
     
@@ -686,15 +646,6 @@ def get_pairs_builder_kb(players, selected_ids, selection_phase="left", can_proc
 
 # --- MATCH EVENTS KEYBOARDS ---
 
-def get_goal_count_kb(player_id, match_id, event_type="goal", lang_id=1):
-    """Keyboard for selecting goal count (0-5+)"""
-    builder = InlineKeyboardBuilder()
-    for i in range(6):
-        builder.button(text=str(i), callback_data=f"event_count_{event_type}_{player_id}_{match_id}_{i}")
-    builder.button(text=tr.t("btn_skip", lang_id), callback_data=f"event_count_{event_type}_{player_id}_{match_id}_0")
-    builder.adjust(3)
-    return builder.as_markup()
-
 def get_minute_input_kb(player_id, match_id, event_type, event_num=1, lang_id=1, min_val=0):
     """Keyboard for entering minute (0-90)"""
     builder = InlineKeyboardBuilder()
@@ -730,15 +681,6 @@ def get_card_player_kb(players, match_id, lang_id=1):
     builder.adjust(2)
     return builder.as_markup()
 
-def get_player_goals_kb(players, match_id, event_type="goal", lang_id=1):
-    """Keyboard for selecting player to enter goals"""
-    builder = InlineKeyboardBuilder()
-    for p in players:
-        builder.button(text=f"⚽ {p[2]}", callback_data=f"event_player_{event_type}_{p[0]}_{match_id}")
-    builder.button(text=tr.t("btn_done", lang_id), callback_data=f"event_goals_done_{match_id}")
-    builder.adjust(2)
-    return builder.as_markup()
-
 def get_assist_selection_kb(players, scorer_id, match_id, lang_id=1):
     """Keyboard for selecting player who assisted"""
     builder = InlineKeyboardBuilder()
@@ -769,3 +711,21 @@ def get_site_link_kb(chat_id, thread_id, lang_id=1):
     url = f"https://playmygame.duckdns.org/championship?chat_id={chat_id}&thread_id={tid}"
     builder.button(text=tr.t("btn_open_site", lang_id), url=url)
     return builder.as_markup()
+
+def get_table_kb(chat_id, thread_id, lang_id=1):
+    """Under the /table image: site link plus the switch to the text table"""
+    builder = InlineKeyboardBuilder()
+    tid = thread_id if thread_id else 0
+    url = f"https://playmygame.duckdns.org/championship?chat_id={chat_id}&thread_id={tid}"
+    builder.button(text=tr.t("btn_open_site", lang_id), url=url)
+    builder.button(text=tr.t("btn_table_text", lang_id), callback_data="table_page_0")
+    builder.adjust(1)
+    return builder.as_markup()
+
+def get_table_text_kb(page, total_pages, lang_id=1):
+    builder = InlineKeyboardBuilder()
+    if total_pages > 1:
+        builder.button(text="◀️", callback_data=f"table_page_{(page - 1) % total_pages}")
+        builder.button(text=f"{page + 1}/{total_pages}", callback_data=f"table_page_{page}")
+        builder.button(text="▶️", callback_data=f"table_page_{(page + 1) % total_pages}")
+    return builder.as_markup()
@@ -1,14 +1,26 @@
 import logging
 import asyncio
+import os
 from aiogram.types import BotCommand, BotCommandScopeAllPrivateChats, BotCommandScopeAllGroupChats
 
 import database as db
 import translations as tr
 from init_bot import bot, dp
+from scheduler import delete_scheduler
+from vote_tally import vote_tally
+from waitlist import waitlist
+from reminders import reminder_scheduler
+from webhook import WebhookServer, env_flag
+from chat_ordering import chat_ordering
+from maintenance import maintenance_job
+import sharding
+import utils
+from callback_router import callbacks
 
-# Import routers from modular handlers
-import admin_handlers
+# Import routers from modular handlers; callbacks go to the first registered handler,
+# so user handlers are imported (and win) before admin ones
 import user_handlers
+import admin_handlers
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -19,6 +31,8 @@ async def set_bot_commands(bot):
         BotCommand(command="poll", description=tr.t("cmd_poll_desc", 1)),
         BotCommand(command="admin", description=tr.t("cmd_admin_desc", 1)),
         BotCommand(command="table", description=tr.t("cmd_table_desc", 1)),
+        BotCommand(command="me", description=tr.t("cmd_me_desc", 1)),
+        BotCommand(command="schedule", description=tr.t("cmd_schedule_desc", 1)),
         BotCommand(command="finish_draw", description=tr.t("cmd_finish_draw_desc", 1)),
         BotCommand(command="cancel", description=tr.t("cmd_cancel_desc", 1)),
         BotCommand(command="site", description=tr.t("cmd_site_desc", 1)),
@@ -28,6 +42,8 @@ async def set_bot_commands(bot):
         BotCommand(command="poll", description=tr.t("cmd_poll_desc", 2)),
         BotCommand(command="admin", description=tr.t("cmd_admin_desc", 2)),
         BotCommand(command="table", description=tr.t("cmd_table_desc", 2)),
+        BotCommand(command="me", description=tr.t("cmd_me_desc", 2)),
+        BotCommand(command="schedule", description=tr.t("cmd_schedule_desc", 2)),
         BotCommand(command="finish_draw", description=tr.t("cmd_finish_draw_desc", 2)),
         BotCommand(command="cancel", description=tr.t("cmd_cancel_desc", 2)),
         BotCommand(command="site", description=tr.t("cmd_site_desc", 2)),
@@ -46,25 +62,59 @@ async def main():
     # Initialize DB
     db.init_db()
     
-    # Load translations
+    # Load translations and hot-reload them when locales/*.json change
     tr.load_translations()
+    asyncio.create_task(tr.watch_locales())
     
     # Setup commands
     await set_bot_commands(bot)
     
-    # Register routers
+    # Register routers (callback queries are resolved by the callback dispatcher first)
+    dp.include_router(callbacks.router)
     dp.include_router(user_handlers.router)
     dp.include_router(admin_handlers.router)
     
     # Register middleware
     from utils import PMContextMiddleware
     dp.message.outer_middleware(PMContextMiddleware())
+    # Sequential per (chat_id, thread_id), parallel across chats
+    dp.update.outer_middleware(chat_ordering)
+    
+    mode = os.getenv("BOT_MODE", "polling").lower()
+    # Pending updates are dropped by default; set DROP_PENDING_UPDATES=0 to keep clicks made during a restart
+    drop_pending = env_flag("DROP_PENDING_UPDATES", default=True)
+    
+    if mode == "front":
+        # Only forwards updates to shard workers, no handlers run here
+        await sharding.ShardFront(bot, dp).run(drop_pending_updates=drop_pending)
+        return
+    
+    # Resume pending delayed deletions, queue confirmations and reminders (shard workers start them once they own their shard)
+    if mode != "worker":
+        delete_scheduler.start()
+        waitlist.start()
+        reminder_scheduler.start()
+        maintenance_job.start()
     
     logger.info("Bot started with modular handlers...")
     
-    # Reset webhooks and start polling
-    await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
+    try:
+        if mode == "webhook":
+            await WebhookServer(bot, dp).run(drop_pending_updates=drop_pending)
+        elif mode == "worker":
+            await sharding.run_worker(bot, dp, int(os.getenv("SHARD_ID", "0")))
+        else:
+            # Reset webhooks and start polling
+            await bot.delete_webhook(drop_pending_updates=drop_pending)
+            await dp.start_polling(bot)
+    finally:
+        await delete_scheduler.stop()
+        await waitlist.stop()
+        await reminder_scheduler.stop()
+        await maintenance_job.stop()
+        await utils.close_http_session()
+        # Votes not yet written by the background flush
+        vote_tally.flush()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+
+import database as db
+import draft_session as drafts
+
+logger = logging.getLogger(__name__)
+
+# FSM rows (one per chat/user) not written for this long are dropped
+FSM_IDLE_DAYS = int(os.getenv("FSM_IDLE_DAYS", "30"))
+# Draw votes and draft blobs of chats without a draw for this long are dropped
+DRAFT_IDLE_DAYS = int(os.getenv("DRAFT_IDLE_DAYS", "14"))
+# Bots cannot delete messages older than 48 hours, tracking them longer is useless
+TRACKED_MESSAGE_HOURS = 48
+# Events of matches older than this are rolled up into match_history (0 = keep all events)
+EVENTS_ROLLUP_DAYS = int(os.getenv("EVENTS_ROLLUP_DAYS", "0"))
+
+MAINTENANCE_INTERVAL_HOURS = float(os.getenv("MAINTENANCE_INTERVAL_HOURS", "24"))
+# Rows per DELETE; each batch is its own short transaction
+BATCH_SIZE = int(os.getenv("MAINTENANCE_BATCH_SIZE", "500"))
+ROLLUP_BATCH_MATCHES = 50
+# Pause between batches so bot writes get the locks in between
+BATCH_PAUSE_SECONDS = 0.2
+# First run after start, when the bot is not busy catching up
+START_DELAY_SECONDS = 300
+
+
+async def _drain(delete_batch, *args):
+    """Calls delete_batch(*args, BATCH_SIZE) until a batch comes back short; total rows"""
+    total = 0
+    while True:
+        count = await asyncio.to_thread(delete_batch, *args, BATCH_SIZE)
+        total += count
+        if count < BATCH_SIZE:
+            return total
+        await asyncio.sleep(BATCH_PAUSE_SECONDS)
+
+
+async def run_once(rollup_days: int = EVENTS_ROLLUP_DAYS, shard=None):
+    """
+    One pass over all retention rules; returns {item: amount} of what was reclaimed.
+    With shard=(shard_id, shard_count) drafts are expired only for the shard's own chats
+    (their cache lives in this process), the other rules run on shard 0 alone.
+    """
+    now = datetime.now()
+    report = {"draft_state": 0, "draft_state_bytes": 0}
+    while True:
+        keys, size = await asyncio.to_thread(db.expire_draft_states, now - timedelta(days=DRAFT_IDLE_DAYS), BATCH_SIZE, shard)
+        for chat_id, thread_id in keys:
+            drafts.invalidate(chat_id, thread_id)
+        report["draft_state"] += len(keys)
+        report["draft_state_bytes"] += size
+        if len(keys) < BATCH_SIZE:
+            break
+        await asyncio.sleep(BATCH_PAUSE_SECONDS)
+    if shard and shard[0] != 0:
+        logger.info(f"Maintenance (shard {shard[0]}): " + ", ".join(f"{key} {value}" for key, value in report.items()))
+        return report
+    report["fsm_data"] = await _drain(db.expire_fsm_data, now - timedelta(days=FSM_IDLE_DAYS))
+    report["draw_votes"] = await _drain(db.expire_draw_votes, now - timedelta(days=DRAFT_IDLE_DAYS))
+    report["tracked_messages"] = await _drain(db.expire_tracked_messages, now - timedelta(hours=TRACKED_MESSAGE_HOURS))
+    if rollup_days > 0:
+        report["matches_rolled_up"] = report["match_events"] = 0
+        while True:
+            matches, events = await asyncio.to_thread(db.rollup_match_events, now - timedelta(days=rollup_days), ROLLUP_BATCH_MATCHES)
+            report["matches_rolled_up"] += matches
+            report["match_events"] += events
+            if matches < ROLLUP_BATCH_MATCHES:
+                break
+            await asyncio.sleep(BATCH_PAUSE_SECONDS)
+    logger.info("Maintenance: " + ", ".join(f"{key} {value}" for key, value in report.items()))
+    return report
+
+
+class MaintenanceJob:
+    """Runs run_once every MAINTENANCE_INTERVAL_HOURS in the background"""
+
+    def __init__(self):
+        self._task = None
+        self.shard = None  # (shard_id, shard_count) when running as a shard worker
+
+    def start(self):
+        if self._task or MAINTENANCE_INTERVAL_HOURS <= 0:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        await asyncio.sleep(START_DELAY_SECONDS)
+        while True:
+            try:
+                await run_once(shard=self.shard)
+            except Exception as e:
+                logger.error(f"Maintenance failed: {e}")
+            await asyncio.sleep(MAINTENANCE_INTERVAL_HOURS * 3600)
+
+
+maintenance_job = MaintenanceJob()
+
+
+if __name__ == "__main__":
+    # One pass by hand: python maintenance.py [--rollup-days N]
+    # Expired drafts stay in the draft cache of a running bot until it restarts, run it with the bot stopped
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Drop stale FSM/draft rows and roll up old match events")
+    parser.add_argument("--rollup-days", type=int, default=EVENTS_ROLLUP_DAYS, help="Roll up events of matches older than this (0 = off)")
+    args = parser.parse_args()
+    for key, value in asyncio.run(run_once(args.rollup_days)).items():
+        print(f"{key}: {value}")
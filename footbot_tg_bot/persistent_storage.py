@@ -22,6 +22,9 @@ class MySQLStorage(BaseStorage):
         )
         conn.commit()
         conn.close()
+        if state_str is None:
+            # The flow ended (state.clear()), its tracked messages no longer belong to anything
+            db.clear_tracked_messages(key.chat_id, key.thread_id or 0, key.user_id)
 
     async def get_state(self, key: StorageKey) -> Optional[str]:
         conn = db.get_connection()
@@ -0,0 +1,77 @@
+import html
+import os
+from collections import OrderedDict
+
+import database as db
+import translations as tr
+
+# Profiles kept in memory, across all chats
+CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "512"))
+
+RESULT_EMOJI = {'W': "🟢", 'D': "⚪", 'L': "🔴", None: "▫️"}
+
+
+class ProfileCache:
+    """
+    /me profiles keyed by (chat_id, thread_id, user_id). An entry stays valid while
+    the chat's stats_version is unchanged, so a hit costs one stats_versions lookup.
+    """
+
+    def __init__(self, size: int = CACHE_SIZE):
+        self.size = size
+        self._profiles = OrderedDict()  # (chat_id, thread_id, user_id) -> (version, profile)
+
+    def get(self, chat_id: int, thread_id: int, user_id: int):
+        """Profile dict of db.get_player_profile, None if the user is not a player"""
+        key = (chat_id, thread_id, user_id)
+        version, _ = db.get_stats_version(chat_id, thread_id)
+        cached = self._profiles.get(key)
+        if cached and cached[0] == version:
+            self._profiles.move_to_end(key)
+            return cached[1]
+        profile = db.get_player_profile(chat_id, thread_id, user_id)
+        if profile is None:
+            # Not cached: registering as a player does not move the stats version
+            self._profiles.pop(key, None)
+            return None
+        self._profiles[key] = (version, profile)
+        self._profiles.move_to_end(key)
+        while len(self._profiles) > self.size:
+            self._profiles.popitem(last=False)
+        return profile
+
+
+def format_profile(profile, lang_id=1):
+    """HTML card for /me"""
+    lines = [tr.t("profile_title", lang_id).format(name=html.escape(profile["name"] or ""))]
+    if not profile["games"]:
+        lines.append(tr.t("profile_no_games", lang_id))
+        return "\n".join(lines)
+    diff = int(profile["goals_diff"])
+    rating = profile["avg_rating"]
+    lines += [
+        tr.t("profile_record", lang_id).format(games=profile["games"], wins=profile["wins"], draws=profile["draws"], losses=profile["losses"]),
+        tr.t("profile_points", lang_id).format(points=profile["points"], diff=f"+{diff}" if diff > 0 else diff),
+        tr.t("profile_attack", lang_id).format(goals=profile["goals"], assists=profile["assists"]),
+        tr.t("profile_discipline", lang_id).format(
+            yellow=profile["yellow_cards"], red=profile["red_cards"],
+            rating=f"{float(rating):.1f}" if rating is not None else "—"
+        ),
+    ]
+    form = profile["form"]
+    if form:
+        # Stored newest first, shown oldest -> newest like the table
+        lines.append(tr.t("profile_form", lang_id).format(form="".join(RESULT_EMOJI.get(e["r"]) for e in reversed(form))))
+        lines.append("")
+        lines.append(tr.t("profile_last_matches", lang_id))
+        for entry in form:
+            stats = f"⚽{entry['g']}" + (f" 🅰️{entry['a']}" if entry["a"] else "")
+            if entry["p"] is not None and not entry["c"]:
+                stats += f" ⭐{entry['p']}"
+            if entry["c"]:
+                stats += " ©"
+            lines.append(f"{RESULT_EMOJI.get(entry['r'])} {entry['d'] or '—'}  <b>{html.escape(entry['s'] or '-:-')}</b>  {stats}")
+    return "\n".join(lines)
+
+
+profile_cache = ProfileCache()
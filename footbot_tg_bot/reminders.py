@@ -0,0 +1,190 @@
+import asyncio
+import heapq
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+
+from init_bot import bot
+import database as db
+import keyboards as kb
+import translations as tr
+import draft_session as drafts
+import utils
+import schedule
+
+logger = logging.getLogger(__name__)
+
+# Offsets from the match start, in hours (negative = before the game)
+REMINDER_OFFSETS = {
+    "poll_nudge": -float(os.getenv("REMIND_POLL_HOURS", "24")),
+    "unpaid": -float(os.getenv("REMIND_UNPAID_HOURS", "3")),
+    "result_prompt": float(os.getenv("REMIND_RESULT_HOURS", "2")),
+}
+# Reminders missed while the bot was down are still sent if not older than this
+MISSED_GRACE = timedelta(hours=1)
+# Min pause between two reminders of the same chat
+TICK_SECONDS = 30
+
+# Settings that move the schedule of a chat
+SCHEDULE_KEYS = ('match_times', 'timezone')
+
+
+def next_reminder(sched, after, after_kind=""):
+    """
+    First (utc_time, kind) after the position (after, after_kind) for a schedule.Schedule.
+    The kind breaks ties when two reminders fall on the same minute.
+    """
+    latest = max(REMINDER_OFFSETS.values())
+    earliest = min(REMINDER_OFFSETS.values())
+    best = None
+    # Start from the first game whose latest reminder can still be ahead
+    start = after + timedelta(hours=sched.offset - latest)
+    for game in sched.games_after(start):
+        game_utc = sched.to_utc(game)
+        if best and game_utc + timedelta(hours=earliest) >= best[0]:
+            break
+        for kind, hours in REMINDER_OFFSETS.items():
+            at = game_utc + timedelta(hours=hours)
+            if (at, kind) > (after, after_kind) and (best is None or (at, kind) < best):
+                best = (at, kind)
+    return best
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ReminderScheduler:
+    """Min-heap of the next reminder per chat, rebuilt for a chat only when its match time changes"""
+
+    def __init__(self):
+        self.shard = None  # (shard_id, shard_count) when running as a shard worker
+        self._heap = []  # (fire_at_utc, chat_id, thread_id, kind, generation)
+        self._schedules = {}  # (chat_id, thread_id) -> schedule.Schedule
+        self._generation = {}
+        self._wakeup = asyncio.Event()
+        self._task = None
+        db.on_settings_change(self._on_settings_change)
+
+    def start(self):
+        if self._task:
+            return
+        floor = utcnow() - MISSED_GRACE
+        for chat_id, thread_id, match_times, tz, fired_until, fired_kind in db.get_reminder_chats(shard=self.shard):
+            if fired_until and fired_until >= floor:
+                position = (fired_until, fired_kind or "")
+            else:
+                position = (max(fired_until, floor) if fired_until else utcnow(), "")
+            self._reschedule(chat_id, thread_id, schedule.parse_schedule(match_times, tz), *position)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Reminder scheduler started for {len(self._schedules)} chats")
+
+    async def stop(self):
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _reschedule(self, chat_id, thread_id, sched, after, after_kind=""):
+        key = (chat_id, thread_id)
+        # Older heap entries of the chat become stale
+        generation = self._generation.get(key, 0) + 1
+        self._generation[key] = generation
+        if not sched:
+            self._schedules.pop(key, None)
+            return
+        self._schedules[key] = sched
+        nxt = next_reminder(sched, after, after_kind)
+        if not nxt:
+            return
+        fire_at, kind = nxt
+        is_earliest = not self._heap or fire_at < self._heap[0][0]
+        heapq.heappush(self._heap, (fire_at, chat_id, thread_id, kind, generation))
+        if is_earliest:
+            self._wakeup.set()
+
+    def _on_settings_change(self, chat_id, thread_id, key):
+        if key not in SCHEDULE_KEYS or not self._task:
+            return
+        if self.shard and abs(chat_id) % self.shard[1] != self.shard[0]:
+            return  # the chat belongs to another worker
+        settings = db.get_match_settings(chat_id, thread_id)
+        sched = schedule.parse_schedule(settings.get('match_times'), settings.get('timezone'))
+        self._reschedule(chat_id, thread_id, sched, utcnow())
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            timeout = None
+            if self._heap:
+                timeout = max(0.0, (self._heap[0][0] - utcnow()).total_seconds())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self._tick()
+            except Exception as e:
+                logger.error(f"Reminder tick failed: {e}")
+            await asyncio.sleep(TICK_SECONDS if self._has_due() else 0)
+
+    def _has_due(self):
+        return bool(self._heap) and self._heap[0][0] <= utcnow()
+
+    async def _tick(self):
+        now = utcnow()
+        handled = set()
+        postponed = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            fire_at, chat_id, thread_id, kind, generation = entry
+            key = (chat_id, thread_id)
+            if self._generation.get(key) != generation:
+                continue
+            if key in handled:
+                # One reminder per chat per tick, the rest waits for the next one
+                postponed.append(entry)
+                continue
+            handled.add(key)
+            try:
+                await self._send(chat_id, thread_id, kind)
+            except Exception as e:
+                logger.error(f"Reminder {kind} failed for {chat_id}/{thread_id}: {e}")
+            db.set_reminder_position(chat_id, thread_id, fire_at, kind)
+            self._reschedule(chat_id, thread_id, self._schedules.get(key), fire_at, kind)
+        for entry in postponed:
+            heapq.heappush(self._heap, entry)
+
+    async def _send(self, chat_id, thread_id, kind):
+        settings = db.get_match_settings(chat_id, thread_id)
+        lang_id = settings.get('language_id', 1)
+        send_kwargs = {"message_thread_id": thread_id if thread_id else None}
+
+        if kind == "poll_nudge":
+            if not settings.get('is_active'):
+                return
+            free = settings.get('player_count', 12) - db.count_registered_players(chat_id, thread_id)
+            if free > 0:
+                await bot.send_message(chat_id, tr.t("reminder_poll_nudge", lang_id).format(free=free), **send_kwargs)
+
+        elif kind == "unpaid":
+            cost = settings.get('cost', '0')
+            if not settings.get('remind_before_game') or not cost or str(cost) in ("0", "—"):
+                return
+            unpaid = [r for r in db.get_registrations(chat_id, thread_id) if r[8] < 2 and r[9] == 'active']
+            if unpaid:
+                text, _ = utils.get_unpaid_players_mention(chat_id, thread_id, lang_id)
+                await bot.send_message(chat_id, text, parse_mode="HTML", **send_kwargs)
+
+        elif kind == "result_prompt":
+            # Only when teams were drawn and the score has not been entered yet
+            draft = drafts.get(chat_id, thread_id)
+            if draft and draft.get('draft_teams') and not draft.get('match_id'):
+                await bot.send_message(chat_id, tr.t("reminder_enter_result", lang_id), reply_markup=kb.get_score_entry_kb(lang_id), **send_kwargs)
+
+
+reminder_scheduler = ReminderScheduler()
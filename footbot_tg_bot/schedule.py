@@ -0,0 +1,199 @@
+import bisect
+import functools
+import re
+from datetime import datetime, timedelta, timezone
+
+# match_times format: ';'-separated tokens
+#   "mon 21:00"          weekly slot (several allowed)
+#   "+2026-10-25 19:00"  one-off extra game
+#   "-2026-10-22"        no game on that date
+DAYS_MAP = {'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6}
+DAY_CODES = {v: k for k, v in DAYS_MAP.items()}
+
+_SLOT_RE = re.compile(r"^([a-z]{3})\s+(\d{1,2}):(\d{2})$")
+_EXTRA_RE = re.compile(r"^\+(\d{4}-\d{2}-\d{2})\s+(\d{1,2}):(\d{2})$")
+_SKIP_RE = re.compile(r"^-(\d{4}-\d{2}-\d{2})$")
+
+
+class Schedule:
+    """Parsed match_times of a chat. All datetimes are naive local match time."""
+
+    __slots__ = ("slots", "extra", "skip", "offset")
+
+    def __init__(self, slots, extra, skip, offset):
+        self.slots = slots  # [(weekday, hour, minute)]
+        self.extra = extra  # sorted [datetime]
+        self.skip = skip  # frozenset of dates
+        self.offset = offset  # hours from UTC
+
+    def local_now(self):
+        return datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=self.offset)
+
+    def to_utc(self, local_dt):
+        return local_dt - timedelta(hours=self.offset) if local_dt else None
+
+    def next_after(self, t):
+        """First game strictly after t"""
+        best = None
+        for wd, hh, mm in self.slots:
+            cand = (t + timedelta(days=(wd - t.weekday()) % 7)).replace(hour=hh, minute=mm, second=0, microsecond=0)
+            if cand <= t:
+                cand += timedelta(days=7)
+            # Each skipped date can push a slot at most one week
+            for _ in range(len(self.skip) + 1):
+                if cand.date() not in self.skip:
+                    break
+                cand += timedelta(days=7)
+            if best is None or cand < best:
+                best = cand
+        i = bisect.bisect_right(self.extra, t)
+        if i < len(self.extra) and (best is None or self.extra[i] < best):
+            best = self.extra[i]
+        return best
+
+    def prev_at_or_before(self, t):
+        """Latest game that started at or before t"""
+        best = None
+        for wd, hh, mm in self.slots:
+            cand = (t - timedelta(days=(t.weekday() - wd) % 7)).replace(hour=hh, minute=mm, second=0, microsecond=0)
+            if cand > t:
+                cand -= timedelta(days=7)
+            for _ in range(len(self.skip) + 1):
+                if cand.date() not in self.skip:
+                    break
+                cand -= timedelta(days=7)
+            if best is None or cand > best:
+                best = cand
+        i = bisect.bisect_right(self.extra, t)
+        if i > 0 and (best is None or self.extra[i - 1] > best):
+            best = self.extra[i - 1]
+        return best
+
+    def games_after(self, t):
+        """Games after t in order (endless when there is a weekly slot)"""
+        game = self.next_after(t)
+        while game is not None:
+            yield game
+            game = self.next_after(game)
+
+
+def parse_offset(timezone_str):
+    m = re.search(r"GMT([+-]?\d+)", str(timezone_str)) if timezone_str else None
+    return int(m.group(1)) if m else 3
+
+
+def _tokens(match_times_str):
+    return [t.strip().lower() for t in str(match_times_str).replace(",", ";").split(";") if t.strip()]
+
+
+def _parse_token(token):
+    """("slot", (weekday, hour, minute)) / ("extra", datetime) / ("skip", date), or None if invalid"""
+    m = _SLOT_RE.match(token)
+    if m:
+        hh, mm = int(m.group(2)), int(m.group(3))
+        if m.group(1) in DAYS_MAP and hh < 24 and mm < 60:
+            return "slot", (DAYS_MAP[m.group(1)], hh, mm)
+        return None
+    m = _EXTRA_RE.match(token)
+    if m:
+        try:
+            return "extra", datetime.strptime(f"{m.group(1)} {int(m.group(2)):02d}:{m.group(3)}", "%Y-%m-%d %H:%M")
+        except ValueError:
+            return None
+    m = _SKIP_RE.match(token)
+    if m:
+        try:
+            return "skip", datetime.strptime(m.group(1), "%Y-%m-%d").date()
+        except ValueError:
+            return None
+    return None
+
+
+def invalid_tokens(match_times_str):
+    """Tokens that parse_schedule would silently drop"""
+    return [t for t in _tokens(match_times_str) if _parse_token(t) is None]
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_schedule(match_times_str, timezone_str):
+    """match_times + timezone -> Schedule, or None if there is nothing to schedule"""
+    if not match_times_str or match_times_str == "—":
+        return None
+    slots, extra, skip = [], [], set()
+    for token in _tokens(match_times_str):
+        parsed = _parse_token(token)
+        if parsed is None:
+            continue
+        kind, value = parsed
+        if kind == "slot":
+            slots.append(value)
+        elif kind == "extra":
+            extra.append(value)
+        else:
+            skip.add(value)
+    if not slots and not extra:
+        return None
+    return Schedule(sorted(set(slots)), sorted(extra), frozenset(skip), parse_offset(timezone_str))
+
+
+def format_schedule(match_times_str):
+    """Normalised text for a list of tokens (sorted slots, then extra games, then skips)"""
+    sched = parse_schedule(match_times_str, None)
+    if not sched:
+        return "—"
+    tokens = [f"{DAY_CODES[wd]} {hh:02d}:{mm:02d}" for wd, hh, mm in sched.slots]
+    tokens += [f"+{d:%Y-%m-%d %H:%M}" for d in sched.extra]
+    tokens += [f"-{d:%Y-%m-%d}" for d in sorted(sched.skip)]
+    return "; ".join(tokens)
+
+
+def replace_weekly(match_times_str, slot_str):
+    """Sets a single weekly slot (the button flow) and keeps the one-off exceptions"""
+    sched = parse_schedule(match_times_str, None)
+    exceptions = []
+    if sched:
+        exceptions = [f"+{d:%Y-%m-%d %H:%M}" for d in sched.extra] + [f"-{d:%Y-%m-%d}" for d in sorted(sched.skip)]
+    return "; ".join([slot_str] + exceptions)
+
+
+class _ChatEntry:
+    __slots__ = ("source", "schedule", "prev", "next")
+
+
+# (chat_id, thread_id) -> _ChatEntry with prev/next for "now"; rebuilt when now passes next
+_chat_cache = {}
+
+
+def _entry(chat_id, thread_id, settings):
+    source = (settings.get('match_times'), settings.get('timezone'))
+    entry = _chat_cache.get((chat_id, thread_id))
+    if entry is not None and entry.source == source:
+        if entry.schedule is None:
+            return entry
+        if entry.next is not None and entry.schedule.local_now() < entry.next:
+            return entry
+    entry = _ChatEntry()
+    entry.source = source
+    entry.schedule = parse_schedule(*source)
+    entry.prev = entry.next = None
+    if entry.schedule:
+        now = entry.schedule.local_now()
+        entry.prev = entry.schedule.prev_at_or_before(now)
+        entry.next = entry.schedule.next_after(now)
+    _chat_cache[(chat_id, thread_id)] = entry
+    return entry
+
+
+def next_match(chat_id, thread_id, settings):
+    """Next game of the chat in local time (None if not scheduled)"""
+    return _entry(chat_id, thread_id, settings).next
+
+
+def previous_match(chat_id, thread_id, settings):
+    """Latest game that already started, local time"""
+    return _entry(chat_id, thread_id, settings).prev
+
+
+def previous_match_utc(chat_id, thread_id, settings):
+    entry = _entry(chat_id, thread_id, settings)
+    return entry.schedule.to_utc(entry.prev) if entry.schedule else None
@@ -0,0 +1,122 @@
+import asyncio
+import heapq
+import logging
+from datetime import datetime, timedelta
+
+from init_bot import bot
+import database as db
+
+logger = logging.getLogger(__name__)
+
+# Max jobs kept in memory; the rest wait in the scheduled_deletions table
+MAX_IN_MEMORY = 5000
+# Bot API limit for a single deleteMessages call
+DELETE_BATCH_SIZE = 100
+# How often to look at the DB for due jobs when the heap has overflowed
+OVERFLOW_POLL_SECONDS = 5
+
+
+async def delete_messages_batched(chat_id: int, message_ids: list):
+    """Deletes messages of one chat with as few deleteMessages calls as possible"""
+    for i in range(0, len(message_ids), DELETE_BATCH_SIZE):
+        try:
+            await bot.delete_messages(chat_id, message_ids[i:i + DELETE_BATCH_SIZE])
+        except Exception as e:
+            logger.debug(f"deleteMessages failed for chat {chat_id}: {e}")
+
+
+class DeleteScheduler:
+    """Persistent min-heap scheduler for delayed message deletions"""
+
+    def __init__(self, max_in_memory: int = MAX_IN_MEMORY):
+        self.max_in_memory = max_in_memory
+        self.shard = None  # (shard_id, shard_count) when running as a shard worker
+        self._heap = []  # (due_at, job_id, chat_id, message_id)
+        self._overflow = False
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        """Loads pending jobs from DB (survives restarts) and starts the loop"""
+        if self._task:
+            return
+        self._reload()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Delete scheduler started with {len(self._heap)} pending jobs")
+
+    async def stop(self):
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def schedule(self, chat_id: int, message_id: int, delay_seconds: int = 10):
+        due_at = datetime.now() + timedelta(seconds=delay_seconds)
+        try:
+            job_id = db.add_scheduled_deletion(chat_id, message_id, due_at)
+        except Exception as e:
+            logger.error(f"Failed to persist scheduled deletion: {e}")
+            return
+        if len(self._heap) >= self.max_in_memory:
+            # Stays in DB only, picked up by the overflow poll
+            self._overflow = True
+            return
+        is_earliest = not self._heap or due_at < self._heap[0][0]
+        heapq.heappush(self._heap, (due_at, job_id, chat_id, message_id))
+        if is_earliest:
+            self._wakeup.set()
+
+    def _reload(self):
+        rows = db.get_scheduled_deletions(self.max_in_memory, shard=self.shard)
+        self._heap = [(due_at, job_id, chat_id, message_id) for job_id, chat_id, message_id, due_at in rows]
+        heapq.heapify(self._heap)
+        self._overflow = len(rows) >= self.max_in_memory
+
+    def _seconds_until_next(self):
+        timeout = None
+        if self._heap:
+            timeout = max(0.0, (self._heap[0][0] - datetime.now()).total_seconds())
+        if self._overflow:
+            timeout = OVERFLOW_POLL_SECONDS if timeout is None else min(timeout, OVERFLOW_POLL_SECONDS)
+        return timeout
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._seconds_until_next())
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self._process_due()
+            except Exception as e:
+                logger.error(f"Delete scheduler tick failed: {e}")
+
+    async def _process_due(self):
+        now = datetime.now()
+        due = {}
+        while self._heap and self._heap[0][0] <= now:
+            _, job_id, chat_id, message_id = heapq.heappop(self._heap)
+            due[job_id] = (chat_id, message_id)
+        if self._overflow:
+            for job_id, chat_id, message_id, _ in db.get_scheduled_deletions(self.max_in_memory, due_before=now, shard=self.shard):
+                due[job_id] = (chat_id, message_id)
+        if not due:
+            return
+
+        by_chat = {}
+        for chat_id, message_id in due.values():
+            by_chat.setdefault(chat_id, []).append(message_id)
+        for chat_id, message_ids in by_chat.items():
+            await delete_messages_batched(chat_id, message_ids)
+
+        db.delete_scheduled_deletions(list(due.keys()))
+        if self._overflow and not self._heap:
+            self._reload()
+
+
+delete_scheduler = DeleteScheduler()
@@ -0,0 +1,193 @@
+import asyncio
+import hmac
+import logging
+import os
+import re
+import socket
+
+import aiohttp
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+
+import database as db
+from scheduler import delete_scheduler
+from waitlist import waitlist
+from reminders import reminder_scheduler
+from maintenance import maintenance_job
+import utils
+from webhook import SECRET_HEADER, WebhookServer, add_stop_signals
+
+logger = logging.getLogger(__name__)
+
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "1"))
+SHARD_BASE_PORT = int(os.getenv("SHARD_BASE_PORT", "8100"))
+SHARD_LOCK_TTL = int(os.getenv("SHARD_LOCK_TTL", "60"))
+
+
+def shard_for_chat(chat_id: int, shard_count: int = SHARD_COUNT) -> int:
+    # Same formula as MOD(ABS(chat_id), n) on the SQL side
+    return abs(chat_id) % shard_count
+
+
+def extract_chat_id(payload: dict) -> int:
+    """Finds the chat of a raw update without building aiogram objects"""
+    for key, event in payload.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        user = event.get("from")
+        if user:
+            return user["id"]
+    return 0
+
+
+# Deep links that open an admin flow of a group in the private chat (see keyboards / admin_handlers)
+_DEEP_LINK_RE = re.compile(r"^/start(?:@\w+)?\s+(?:admin_quick_|admin_|pairs_)(-?\d+)")
+
+
+def private_target(payload: dict, chat_id: int) -> int:
+    """
+    Private admin flows write the rows of a group (FSM data['chat_id']), so they must run on
+    the worker owning that group: its waitlist, reminder and draft caches see the change.
+    Blocking (one fsm_data read); returns chat_id when the private chat has no group target.
+    """
+    message = payload.get("message") or {}
+    m = _DEEP_LINK_RE.match(message.get("text") or "")
+    if m:
+        return int(m.group(1))
+    # Private chat id == user id, the FSM key of the flow
+    target = db.get_fsm_target_chat(chat_id, chat_id)
+    return target if target is not None else chat_id
+
+
+class ShardFront:
+    """Webhook receiver that forwards each update to the worker owning its chat"""
+
+    def __init__(self, bot: Bot, dp: Dispatcher):
+        self.bot = bot
+        self.dp = dp
+        self.url = os.getenv("WEBHOOK_URL")
+        self.path = os.getenv("WEBHOOK_PATH", "/webhook")
+        self.host = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+        self.port = int(os.getenv("WEBHOOK_PORT", "8080"))
+        self.secret = os.getenv("WEBHOOK_SECRET", "")
+        self.session = None
+
+    def worker_url(self, shard_id: int) -> str:
+        return f"http://127.0.0.1:{SHARD_BASE_PORT + shard_id}{self.path}"
+
+    async def handle(self, request: web.Request):
+        if self.secret and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            return web.Response(status=401)
+        body = await request.read()
+        try:
+            payload = await request.json()
+            chat_id = extract_chat_id(payload)
+        except Exception:
+            return web.Response(status=400)
+        if chat_id > 0:
+            try:
+                chat_id = await asyncio.to_thread(private_target, payload, chat_id)
+            except Exception as e:
+                logger.warning(f"Group target lookup failed for private chat {chat_id}: {e}")
+        shard_id = shard_for_chat(chat_id)
+        try:
+            async with self.session.post(self.worker_url(shard_id), data=body, headers={
+                "Content-Type": "application/json",
+                SECRET_HEADER: self.secret,
+            }) as resp:
+                return web.Response(status=resp.status)
+        except Exception as e:
+            # Telegram will redeliver, keeping the update for the shard when it is back
+            logger.warning(f"Shard {shard_id} unavailable: {e}")
+            return web.Response(status=503)
+
+    async def run(self, drop_pending_updates: bool = False):
+        if not self.url:
+            raise RuntimeError("WEBHOOK_URL is required in front mode")
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, self.host, self.port).start()
+
+        await self.bot.set_webhook(
+            url=self.url.rstrip("/") + self.path,
+            secret_token=self.secret or None,
+            drop_pending_updates=drop_pending_updates,
+            allowed_updates=self.dp.resolve_used_update_types()
+        )
+        logger.info(f"Shard front listening on {self.host}:{self.port}, {SHARD_COUNT} shards")
+
+        stop_event = asyncio.Event()
+        add_stop_signals(stop_event)
+        try:
+            await stop_event.wait()
+        finally:
+            await runner.cleanup()
+            await self.session.close()
+            await self.bot.session.close()
+
+
+class ShardLock:
+    """Exclusive shard ownership via the shard_locks table, kept alive by heartbeats"""
+
+    def __init__(self, shard_id: int):
+        self.shard_id = shard_id
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._task = None
+
+    async def acquire(self):
+        while not db.try_acquire_shard_lock(self.shard_id, self.owner, SHARD_LOCK_TTL):
+            logger.warning(f"Shard {self.shard_id} is owned by another process, retrying...")
+            await asyncio.sleep(SHARD_LOCK_TTL / 3)
+        logger.info(f"Acquired shard {self.shard_id} as {self.owner}")
+
+    def keep_alive(self, on_lost):
+        self._task = asyncio.create_task(self._heartbeat(on_lost))
+
+    async def _heartbeat(self, on_lost):
+        while True:
+            await asyncio.sleep(SHARD_LOCK_TTL / 3)
+            try:
+                owned = db.try_acquire_shard_lock(self.shard_id, self.owner, SHARD_LOCK_TTL)
+            except Exception as e:
+                logger.error(f"Shard {self.shard_id} heartbeat failed: {e}")
+                continue
+            if not owned:
+                logger.error(f"Lost ownership of shard {self.shard_id}, stopping")
+                on_lost()
+                return
+
+    def release(self):
+        if self._task:
+            self._task.cancel()
+        try:
+            db.release_shard_lock(self.shard_id, self.owner)
+        except Exception as e:
+            logger.error(f"Failed to release shard {self.shard_id}: {e}")
+
+
+async def run_worker(bot: Bot, dp: Dispatcher, shard_id: int):
+    """Runs one shard: owns its chats exclusively and gets their updates from the front"""
+    lock = ShardLock(shard_id)
+    await lock.acquire()
+    delete_scheduler.shard = (shard_id, SHARD_COUNT)
+    delete_scheduler.start()
+    waitlist.shard = (shard_id, SHARD_COUNT)
+    waitlist.start()
+    reminder_scheduler.shard = (shard_id, SHARD_COUNT)
+    reminder_scheduler.start()
+    # Every shard expires the drafts it caches; the other retention rules run on shard 0
+    maintenance_job.shard = (shard_id, SHARD_COUNT)
+    maintenance_job.start()
+    server = WebhookServer(bot, dp, port=SHARD_BASE_PORT + shard_id, register_webhook=False)
+    lock.keep_alive(server.stop_event.set)
+    try:
+        await server.run()
+    finally:
+        await utils.close_http_session()
+        lock.release()
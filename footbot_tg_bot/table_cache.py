@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+
+import database as db
+import utils
+
+logger = logging.getLogger(__name__)
+
+# Rendered images kept until Telegram gives us a file_id for them
+TABLE_CACHE_SIZE = int(os.getenv("TABLE_CACHE_SIZE", "32"))
+# Renders running at the same time, across all chats
+RENDER_CONCURRENCY = int(os.getenv("RENDER_CONCURRENCY", "2"))
+
+
+class TableImageCache:
+    """
+    /table images keyed by (chat_id, thread_id, stats_version). Once an image was sent,
+    its Telegram file_id is stored next to the version in stats_versions and later
+    calls resend by id: one lookup, no rendering, no upload.
+    Concurrent requests for the same version share one render (singleflight).
+    """
+
+    def __init__(self, size: int = TABLE_CACHE_SIZE, concurrency: int = RENDER_CONCURRENCY):
+        self.size = size
+        self._images = OrderedDict()  # (chat_id, thread_id, version) -> BufferedInputFile
+        self._inflight = {}  # (chat_id, thread_id, version) -> asyncio.Task
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def lookup(self, chat_id: int, thread_id: int):
+        """(file_id or None, current stats version)"""
+        version, file_id = db.get_stats_version(chat_id, thread_id)
+        return file_id, version
+
+    async def render(self, chat_id: int, thread_id: int, version: int):
+        """InputFile for the version, rendered at most once while it has no file_id yet"""
+        key = (chat_id, thread_id, version)
+        photo = self._images.get(key)
+        if photo is not None:
+            self._images.move_to_end(key)
+            return photo
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._render(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: a caller that gives up does not cancel the render for the others
+        return await asyncio.shield(task)
+
+    async def _render(self, key):
+        chat_id, thread_id, _ = key
+        async with self._semaphore:
+            photo = await utils.get_championship_image(chat_id, thread_id)
+        if photo is not None:
+            self._images[key] = photo
+            while len(self._images) > self.size:
+                self._images.popitem(last=False)
+        return photo
+
+    def remember(self, chat_id: int, thread_id: int, version: int, sent_message):
+        """Stores the file_id Telegram assigned to the sent photo"""
+        if not sent_message or not sent_message.photo:
+            return
+        self._images.pop((chat_id, thread_id, version), None)
+        try:
+            db.set_table_file_id(chat_id, thread_id, version, sent_message.photo[-1].file_id)
+        except Exception as e:
+            logger.error(f"Failed to store table file_id for {chat_id}/{thread_id}: {e}")
+
+
+table_cache = TableImageCache()
@@ -0,0 +1,202 @@
+import asyncio
+import functools
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import database as db
+import translations as tr
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:  # Pillow is optional, utils falls back to the site renderer
+    Image = ImageDraw = ImageFont = None
+
+logger = logging.getLogger(__name__)
+
+# Query + drawing run here so the event loop never waits on either
+RENDER_THREADS = int(os.getenv("RENDER_THREADS", "2"))
+_executor = ThreadPoolExecutor(max_workers=RENDER_THREADS, thread_name_prefix="table-render")
+
+FONT_PATH = os.getenv("TABLE_FONT", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+FONT_BOLD_PATH = os.getenv("TABLE_FONT_BOLD", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf")
+
+# Layout
+ROW_H = 34
+HEADER_H = 40
+TITLE_H = 56
+PAD = 16
+FORM_DOT = 12
+
+BG = (18, 24, 38)
+TITLE_BG = (27, 35, 56)
+HEADER_BG = (36, 47, 74)
+ROW_BG = ((24, 31, 49), (30, 38, 59))
+TEXT = (232, 236, 244)
+MUTED = (140, 150, 172)
+ACCENT = (255, 196, 0)
+FORM_COLORS = {'W': (46, 204, 113), 'D': (149, 165, 166), 'L': (231, 76, 60), None: (60, 70, 92)}
+YELLOW = (241, 196, 15)
+RED = (231, 76, 60)
+MEDALS = {1: (255, 196, 0), 2: (192, 192, 192), 3: (205, 127, 50)}
+
+# (key, header translation, width, align) — same columns and order as the site table
+COLUMNS = (
+    ("rank", "table_col_rank", 44, "center"),
+    ("name", "table_col_player", 220, "left"),
+    ("games", "table_col_games", 56, "center"),
+    ("points", "table_col_points", 56, "center"),
+    ("form", "table_col_form", 100, "center"),
+    ("goals", "table_col_goals", 64, "center"),
+    ("autogoals", "table_col_autogoals", 52, "center"),
+    ("goals_diff", "table_col_diff", 56, "center"),
+    ("gpm", "table_col_gpm", 60, "center"),
+    ("assists", "table_col_assists", 60, "center"),
+    ("yellow_cards", "table_col_yellow", 52, "center"),
+    ("red_cards", "table_col_red", 52, "center"),
+    ("avg_rating", "table_col_rating", 72, "center"),
+)
+
+
+def is_available():
+    return Image is not None
+
+
+@functools.lru_cache(maxsize=8)
+def _font(size, bold=False):
+    path = FONT_BOLD_PATH if bold else FONT_PATH
+    try:
+        return ImageFont.truetype(path, size)
+    except OSError:
+        logger.warning(f"Font {path} not found, using the built-in one")
+        return ImageFont.load_default()
+
+
+def _fit(draw, text, font, width):
+    """Cuts text with an ellipsis so it fits into width pixels"""
+    if draw.textlength(text, font=font) <= width:
+        return text
+    while text and draw.textlength(text + "…", font=font) > width:
+        text = text[:-1]
+    return text + "…"
+
+
+def _cell(row, key):
+    if key == "gpm":
+        games = row.get("games") or 0
+        return f"{(row.get('goals') or 0) / games:.2f}" if games else "0.00"
+    if key == "avg_rating":
+        value = row.get("avg_rating")
+        return f"{float(value):.1f}" if value is not None else "—"
+    if key == "goals_diff":
+        value = int(row.get("goals_diff") or 0)
+        return f"+{value}" if value > 0 else str(value)
+    return str(int(row.get(key) or 0))
+
+
+def render_standings(rows, form, title, lang_id=1) -> bytes:
+    """Standings rows (db.get_championship_standings) -> PNG bytes"""
+    width = sum(c[2] for c in COLUMNS) + PAD * 2
+    height = TITLE_H + HEADER_H + ROW_H * len(rows) + PAD
+    img = Image.new("RGB", (width, height), BG)
+    draw = ImageDraw.Draw(img)
+    font = _font(15)
+    bold = _font(15, bold=True)
+    small = _font(12, bold=True)
+    title_font = _font(22, bold=True)
+
+    draw.rectangle((0, 0, width, TITLE_H), fill=TITLE_BG)
+    draw.text((PAD, TITLE_H // 2), _fit(draw, title, title_font, width - PAD * 2), font=title_font, fill=ACCENT, anchor="lm")
+
+    y = TITLE_H
+    draw.rectangle((0, y, width, y + HEADER_H), fill=HEADER_BG)
+    x = PAD
+    for key, header_key, col_w, align in COLUMNS:
+        label = _fit(draw, tr.t(header_key, lang_id), small, col_w - 4)
+        if align == "left":
+            draw.text((x + 4, y + HEADER_H // 2), label, font=small, fill=MUTED, anchor="lm")
+        else:
+            draw.text((x + col_w // 2, y + HEADER_H // 2), label, font=small, fill=MUTED, anchor="mm")
+        x += col_w
+
+    y += HEADER_H
+    for rank, row in enumerate(rows, 1):
+        draw.rectangle((0, y, width, y + ROW_H), fill=ROW_BG[rank % 2])
+        cy = y + ROW_H // 2
+        x = PAD
+        for key, _, col_w, align in COLUMNS:
+            cx = x + col_w // 2
+            if key == "rank":
+                if rank in MEDALS:
+                    draw.ellipse((cx - 11, cy - 11, cx + 11, cy + 11), fill=MEDALS[rank])
+                    draw.text((cx, cy), str(rank), font=bold, fill=BG, anchor="mm")
+                else:
+                    draw.text((cx, cy), str(rank), font=font, fill=MUTED, anchor="mm")
+            elif key == "name":
+                draw.text((x + 4, cy), _fit(draw, row.get("name") or "", font, col_w - 8), font=font, fill=TEXT, anchor="lm")
+            elif key == "form":
+                results = form.get(row.get("id"), [])
+                step = FORM_DOT + 6
+                fx = cx - (step * len(results) - 6) // 2
+                for result in results:
+                    draw.rounded_rectangle((fx, cy - FORM_DOT // 2, fx + FORM_DOT, cy + FORM_DOT // 2), radius=3, fill=FORM_COLORS.get(result, FORM_COLORS[None]))
+                    fx += step
+            elif key in ("yellow_cards", "red_cards"):
+                count = int(row.get(key) or 0)
+                if count:
+                    color = YELLOW if key == "yellow_cards" else RED
+                    draw.rectangle((cx - 14, cy - 8, cx - 4, cy + 7), fill=color)
+                    draw.text((cx + 6, cy), str(count), font=font, fill=TEXT, anchor="mm")
+                else:
+                    draw.text((cx, cy), "—", font=font, fill=MUTED, anchor="mm")
+            else:
+                highlight = key == "points"
+                draw.text((cx, cy), _cell(row, key), font=bold if highlight else font, fill=ACCENT if highlight else TEXT, anchor="mm")
+            x += col_w
+        y += ROW_H
+
+    buf = io.BytesIO()
+    img.save(buf, format="PNG", optimize=False, compress_level=3)
+    return buf.getvalue()
+
+
+def build_championship_png(chat_id: int, thread_id: int):
+    """Blocking: query + render. None when the chat has no games yet"""
+    rows = db.get_championship_standings(chat_id, thread_id)
+    if not rows:
+        return None
+    settings = db.get_match_settings(chat_id, thread_id)
+    lang_id = settings.get('language_id', 1)
+    title = settings.get('championship_name') or tr.t("championship_name_default", lang_id)
+    form = db.get_recent_form(chat_id, thread_id)
+    return render_standings(rows, form, title, lang_id)
+
+
+async def render_championship(chat_id: int, thread_id: int = 0):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, build_championship_png, chat_id, thread_id)
+
+
+if __name__ == "__main__":
+    # Benchmark on synthetic data: python table_image.py
+    import random
+    import time
+
+    tr.load_translations()
+    rows = []
+    for i in range(30):
+        games = random.randint(1, 40)
+        rows.append({
+            "id": i, "name": f"Player Number {i}", "games": games, "points": random.randint(0, games * 3),
+            "goals": random.randint(0, 50), "autogoals": random.randint(0, 3), "goals_diff": random.randint(-40, 40),
+            "assists": random.randint(0, 30), "yellow_cards": random.randint(0, 5), "red_cards": random.randint(0, 1),
+            "avg_rating": random.uniform(4, 9),
+        })
+    form = {i: [random.choice("WDL") for _ in range(5)] for i in range(30)}
+    render_standings(rows, form, "Weekly Games", 2)
+    n = 20
+    start = time.perf_counter()
+    for _ in range(n):
+        png = render_standings(rows, form, "Weekly Games", 2)
+    print(f"{len(rows)} rows: {(time.perf_counter() - start) / n * 1000:.1f} ms/render, {len(png) // 1024} KiB")
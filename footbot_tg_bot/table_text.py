@@ -0,0 +1,72 @@
+import html
+import os
+from collections import OrderedDict
+
+import database as db
+import translations as tr
+
+# Players per page of the text table
+PAGE_SIZE = int(os.getenv("TABLE_TEXT_PAGE_SIZE", "15"))
+NAME_WIDTH = 12
+# Rendered pages kept per (chat_id, thread_id, stats_version)
+CACHE_SIZE = int(os.getenv("TABLE_TEXT_CACHE_SIZE", "64"))
+
+# (standings key, header translation, width)
+COLUMNS = (
+    ("games", "table_col_games", 3),
+    ("points", "table_col_points", 4),
+    ("goals_diff", "table_col_diff", 4),
+    ("goals", "table_col_goals", 4),
+    ("assists", "table_col_assists", 4),
+)
+
+# (chat_id, thread_id, version) -> [page text, ...]
+_pages = OrderedDict()
+
+
+def _cut(name, width):
+    name = " ".join(str(name or "").split())
+    return name if len(name) <= width else name[:width - 1] + "…"
+
+
+def _line(rank, name, values):
+    cells = "".join(f"{v:>{w}}" for v, (_, _, w) in zip(values, COLUMNS))
+    return f"{rank:>2} {name:<{NAME_WIDTH}}{cells}"
+
+
+def build_pages(rows, title, lang_id=1):
+    """Standings rows -> list of HTML pages with a monospace table"""
+    header = _line("#", tr.t("table_col_player", lang_id)[:NAME_WIDTH],
+                   [tr.t(key, lang_id)[:w - 1] for _, key, w in COLUMNS])
+    pages = []
+    for start in range(0, len(rows), PAGE_SIZE):
+        lines = [header, "─" * len(header)]
+        for rank, row in enumerate(rows[start:start + PAGE_SIZE], start + 1):
+            values = []
+            for key, _, _ in COLUMNS:
+                value = int(row.get(key) or 0)
+                values.append(f"+{value}" if key == "goals_diff" and value > 0 else value)
+            lines.append(_line(rank, _cut(row.get("name"), NAME_WIDTH), values))
+        pages.append(f"🏆 <b>{html.escape(title)}</b>\n<pre>{html.escape(chr(10).join(lines))}</pre>")
+    return pages
+
+
+def get_page(chat_id: int, thread_id: int, page: int = 0):
+    """(text, page, total_pages); total_pages is 0 when nobody has played yet"""
+    version, _ = db.get_stats_version(chat_id, thread_id)
+    key = (chat_id, thread_id, version)
+    pages = _pages.get(key)
+    if pages is None:
+        settings = db.get_match_settings(chat_id, thread_id)
+        lang_id = settings.get('language_id', 1)
+        title = settings.get('championship_name') or tr.t("championship_name_default", lang_id)
+        pages = build_pages(db.get_championship_standings(chat_id, thread_id), title, lang_id)
+        _pages[key] = pages
+        while len(_pages) > CACHE_SIZE:
+            _pages.popitem(last=False)
+    else:
+        _pages.move_to_end(key)
+    if not pages:
+        return None, 0, 0
+    page = max(0, min(page, len(pages) - 1))
+    return pages[page], page, len(pages)
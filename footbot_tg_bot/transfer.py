@@ -0,0 +1,326 @@
+"""
+Moves chat data between databases as line-delimited JSON.
+
+    python transfer.py export [--chat CHAT_ID [--thread THREAD_ID]] [-o dump.ndjson.gz]
+    python transfer.py import dump.ndjson.gz [--to-chat CHAT_ID [--to-thread THREAD_ID]]
+
+Format: for each table a header object {"table": ..., "columns": [...]} followed by
+one JSON array per row. A ".gz" file name means gzip.
+"""
+import argparse
+import gzip
+import json
+import sys
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import database as db
+
+# Parents first: import maps the ids of a table before its children reference them
+TABLES = ("players", "player_stats", "matches", "match_history", "match_events")
+BATCH_SIZE = 1000
+
+# Rows of one table in the scope, ordered by primary key. {scope} is "" or a chat/thread filter on m.
+_EXPORT_QUERIES = {
+    "players": """
+        SELECT p.* FROM players p
+        WHERE p.id IN (SELECT ps.player_id FROM player_stats ps WHERE 1 = 1{scope_ps})
+           OR p.id IN (SELECT mh.player_id FROM match_history mh JOIN matches m ON mh.match_id = m.id WHERE 1 = 1{scope})
+        ORDER BY p.id
+    """,
+    "player_stats": "SELECT ps.* FROM player_stats ps WHERE 1 = 1{scope_ps} ORDER BY ps.player_id, ps.chat_id, ps.thread_id",
+    "matches": "SELECT m.* FROM matches m WHERE 1 = 1{scope} ORDER BY m.id",
+    "match_history": """
+        SELECT mh.* FROM match_history mh JOIN matches m ON mh.match_id = m.id
+        WHERE 1 = 1{scope} ORDER BY mh.id
+    """,
+    "match_events": """
+        SELECT me.* FROM match_events me
+        JOIN match_history mh ON me.match_history_id = mh.id
+        JOIN matches m ON mh.match_id = m.id
+        WHERE 1 = 1{scope} ORDER BY me.id
+    """,
+}
+
+# Tables whose own id is reassigned on import, and the id columns pointing at them
+_OWN_ID = ("players", "matches", "match_history", "match_events")
+_REFERENCES = {
+    "player_stats": {"player_id": "players"},
+    "match_history": {"match_id": "matches", "player_id": "players"},
+    "match_events": {"match_history_id": "match_history", "assist_player_id": "players"},
+}
+# Recomputed on the target: seasons are per database, result is a generated column
+_SKIPPED_COLUMNS = {"matches": {"season_id", "season_match_no"}}
+
+
+def _open(path, mode):
+    if path == "-":
+        return sys.stdout if "w" in mode else sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8")
+    raise TypeError(f"Cannot export {type(value).__name__}")
+
+
+def export_data(out, chat_id=None, thread_id=None, log=print):
+    """Streams the tables of one chat (or of all chats) to out; returns {table: rows}"""
+    scope, scope_ps, params = "", "", ()
+    if chat_id is not None:
+        scope, scope_ps, params = " AND m.chat_id = %s", " AND ps.chat_id = %s", (chat_id,)
+        if thread_id is not None:
+            scope += " AND m.thread_id = %s"
+            scope_ps += " AND ps.thread_id = %s"
+            params += (thread_id,)
+    conn = db.get_connection()
+    # One snapshot for all tables, so children never point at rows missing from the dump
+    conn.start_transaction(consistent_snapshot=True, readonly=True)
+    counts = {}
+    for table in TABLES:
+        query = _EXPORT_QUERIES[table].format(scope=scope, scope_ps=scope_ps)
+        query_params = params * 2 if table == "players" else params
+        # Unbuffered cursor: rows come from the server in batches instead of being loaded at once
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(query, query_params)
+        out.write(json.dumps({"table": table, "columns": list(cursor.column_names)}) + "\n")
+        count = 0
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            out.write("".join(json.dumps(row, ensure_ascii=False, default=_json_value, separators=(",", ":")) + "\n" for row in rows))
+            count += len(rows)
+        cursor.close()
+        counts[table] = count
+        log(f"{table}: {count} rows exported")
+    conn.rollback()
+    conn.close()
+    return counts
+
+
+class _Importer:
+    """Inserts dump rows with fresh ids and remembers old id -> new id per table"""
+
+    def __init__(self, conn, to_chat=None, to_thread=None):
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.to_chat = to_chat
+        self.to_thread = to_thread
+        self.ids = {table: {} for table in _OWN_ID}
+        self.next_id = {}
+        self.existing_matches = set()  # new ids of matches that were already in the target
+        self.chats = set()
+        self.counts = {}
+        self.table = None
+        self.batch = []
+        # Manually added players (no user_id), old id -> row: placed once their chat is known
+        self.manual = {}
+
+    def _columns(self, table):
+        """Insertable columns of the target table"""
+        self.cursor.execute(f"SHOW COLUMNS FROM {table}")
+        return {row[0] for row in self.cursor.fetchall() if "GENERATED" not in (row[5] or "").upper()}
+
+    def _allocate(self, table):
+        self.cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+        self.next_id[table] = self.cursor.fetchone()[0] + 1
+
+    def _new_id(self, table):
+        new_id = self.next_id[table]
+        self.next_id[table] += 1
+        return new_id
+
+    def start_table(self, table, columns):
+        if table not in TABLES:
+            raise ValueError(f"Unknown table in dump: {table}")
+        if table not in ("players", "player_stats"):
+            self.insert_manual_players()
+        target = self._columns(table) - _SKIPPED_COLUMNS.get(table, set())
+        self.table = table
+        self.positions = [(i, c) for i, c in enumerate(columns) if c in target]
+        self.insert_columns = [c for _, c in self.positions]
+        if table in _OWN_ID:
+            self._allocate(table)
+        if table == "players":
+            self.cursor.execute("SELECT user_id, id FROM players WHERE user_id IS NOT NULL")
+            self.player_by_user = dict(self.cursor.fetchall())
+            self.player_columns = self.insert_columns
+        self.batch = []
+        self.counts.setdefault(table, 0)
+
+    def add_row(self, values):
+        row = {c: values[i] for i, c in self.positions}
+        table = self.table
+        if "chat_id" in row and self.to_chat is not None:
+            row["chat_id"] = self.to_chat
+            if self.to_thread is not None:
+                row["thread_id"] = self.to_thread
+        if table == "player_stats" and row["player_id"] in self.manual:
+            self._place_manual_player(row["player_id"], row["chat_id"], row["thread_id"])
+        for column, parent in _REFERENCES.get(table, {}).items():
+            if row.get(column) is None:
+                continue
+            new_id = self.ids[parent].get(row[column])
+            if new_id is None and column == "assist_player_id":
+                row[column] = None  # assistant not in the dump
+                continue
+            if new_id is None:
+                return  # parent row was skipped
+            row[column] = new_id
+        if table == "match_history" and row["match_id"] in self.existing_matches:
+            return
+        if table == "match_events" and "match_history_id" in row and row["match_history_id"] is None:
+            return
+
+        if table == "players":
+            if row.get("user_id") is None:
+                self.manual[row["id"]] = row
+                return
+            # Same Telegram user: keep the existing row
+            existing = self.player_by_user.get(row["user_id"])
+            if existing:
+                self.ids["players"][row["id"]] = existing
+                return
+        if table == "matches":
+            existing = self._existing_match(row)
+            if existing:
+                self.ids["matches"][row["id"]] = existing
+                self.existing_matches.add(existing)
+                return
+            self.chats.add((row["chat_id"], row["thread_id"]))
+        if table in _OWN_ID:
+            new_id = self._new_id(table)
+            self.ids[table][row["id"]] = new_id
+            row["id"] = new_id
+        self.batch.append(tuple(row[c] for c in self.insert_columns))
+        if len(self.batch) >= BATCH_SIZE:
+            self.flush()
+
+    def _place_manual_player(self, old_id, chat_id, thread_id):
+        """Same name among the manual players of the destination chat -> that row, else a new one"""
+        row = self.manual.pop(old_id)
+        self.cursor.execute("""
+            SELECT MIN(p.id) FROM players p JOIN player_stats ps ON ps.player_id = p.id
+            WHERE p.user_id IS NULL AND p.name = %s AND ps.chat_id = %s AND ps.thread_id = %s
+        """, (row["name"], chat_id, thread_id))
+        existing = self.cursor.fetchone()[0]
+        if existing:
+            self.ids["players"][old_id] = existing
+            return
+        self._insert_player(old_id, row)
+
+    def _insert_player(self, old_id, row):
+        new_id = self._new_id("players")
+        self.ids["players"][old_id] = new_id
+        row = dict(row, id=new_id)
+        columns = ", ".join(self.player_columns)
+        placeholders = ", ".join(["%s"] * len(self.player_columns))
+        self.cursor.execute(f"INSERT INTO players ({columns}) VALUES ({placeholders})", tuple(row[c] for c in self.player_columns))
+        self.counts["players"] += 1
+
+    def insert_manual_players(self):
+        """Manual players without stats in the dump (only in match history) are always new rows"""
+        for old_id, row in list(self.manual.items()):
+            self._insert_player(old_id, row)
+        self.manual.clear()
+
+    def _existing_match(self, row):
+        """Id of the same game already in the target (chat, thread and start time), so imports can be repeated"""
+        self.cursor.execute(
+            "SELECT id FROM matches WHERE chat_id = %s AND thread_id = %s AND match_date = %s LIMIT 1",
+            (row["chat_id"], row["thread_id"], row["match_date"])
+        )
+        found = self.cursor.fetchone()
+        return found[0] if found else None
+
+    def flush(self):
+        if not self.batch:
+            return
+        columns = ", ".join(self.insert_columns)
+        placeholders = ", ".join(["%s"] * len(self.insert_columns))
+        # player_stats rows already in the target win over the dump
+        suffix = " ON DUPLICATE KEY UPDATE player_id = player_id" if self.table == "player_stats" else ""
+        self.cursor.executemany(f"INSERT INTO {self.table} ({columns}) VALUES ({placeholders}){suffix}", self.batch)
+        self.counts[self.table] += len(self.batch)
+        self.batch = []
+
+
+def import_data(source, to_chat=None, to_thread=None, log=print):
+    """Loads a dump in one transaction; returns ({table: inserted rows}, {(chat_id, thread_id)})"""
+    conn = db.get_connection()
+    conn.autocommit = False
+    cursor = conn.cursor()
+    # Ids are assigned here, so match/player writes of the running bot wait until the commit
+    cursor.execute(f"LOCK TABLES {', '.join(f'{t} WRITE' for t in TABLES)}")
+    importer = _Importer(conn, to_chat, to_thread)
+    try:
+        seen = []
+        for line in source:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if isinstance(item, dict):
+                importer.flush()
+                table = item["table"]
+                if seen and TABLES.index(table) < TABLES.index(seen[-1]):
+                    raise ValueError(f"{table} comes after {seen[-1]} in the dump")
+                seen.append(table)
+                importer.start_table(table, item["columns"])
+            else:
+                importer.add_row(item)
+        importer.flush()
+        importer.insert_manual_players()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.execute("UNLOCK TABLES")
+        conn.close()
+    for table, count in importer.counts.items():
+        log(f"{table}: {count} rows imported")
+    return importer.counts, importer.chats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export/import chat data as line-delimited JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_cmd = commands.add_parser("export", help="Dump players, stats and matches")
+    export_cmd.add_argument("--chat", type=int, help="Only this chat (default: all chats)")
+    export_cmd.add_argument("--thread", type=int, help="Only this thread of the chat")
+    export_cmd.add_argument("-o", "--output", default="-", help="File (.gz to compress), - for stdout")
+    import_cmd = commands.add_parser("import", help="Load a dump, merging into existing data")
+    import_cmd.add_argument("input", help="File (.gz for compressed), - for stdin")
+    import_cmd.add_argument("--to-chat", type=int, help="Put all imported matches/stats into this chat")
+    import_cmd.add_argument("--to-thread", type=int, help="...and this thread")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        out = _open(args.output, "w")
+        # Progress to stderr when the dump itself goes to stdout
+        log = (lambda text: print(text, file=sys.stderr)) if args.output == "-" else print
+        export_data(out, args.chat, args.thread, log)
+        if out is not sys.stdout:
+            out.close()
+    else:
+        source = _open(args.input, "r")
+        counts, chats = import_data(source, args.to_chat, args.to_thread)
+        if source is not sys.stdin:
+            source.close()
+        if counts.get("matches"):
+            db.backfill_seasons()
+            for chat_id, thread_id in sorted(chats):
+                db.rebuild_standings(chat_id, thread_id)
+            print(f"Standings rebuilt for {len(chats)} chats")
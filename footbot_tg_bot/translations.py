@@ -1,16 +1,35 @@
 # Translation system for the bot
 # All UI strings are loaded from JSON files in locales/ directory
 
+import asyncio
 import json
+import logging
 import os
+from string import Formatter
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Global translations dictionary
+logger = logging.getLogger(__name__)
+
+LOCALES_DIR = os.path.join(os.path.dirname(__file__), "locales")
+
+LANG_CODES = {1: "ru", 2: "en"}
+DEFAULT_LANG_ID = 1
+# Where to look when a key is missing in a locale (the key itself is the last resort)
+FALLBACKS = {"en": ["en", "ru"], "ru": ["ru", "en"]}
+
+# Global translations dictionary (raw JSON)
 # Structure: {language_code: {key: value}}
 TRANSLATIONS = {}
 
+# Compiled catalogs with fallbacks already applied
+# Structure: {language_id: {key: (text, has_placeholders)}}
+CATALOGS = {}
+
+_mtimes = {}
+_reload_callbacks = []
+
 def init_translations_table():
     """Deprecated: Translations now loaded from files."""
     pass
@@ -19,68 +38,147 @@ def populate_initial_translations():
     """Deprecated: Translations now loaded from files."""
     pass
 
+def get_placeholders(text):
+    """Named fields of a format template, e.g. 'Hi {name}' -> {'name'}"""
+    try:
+        return {field for _, field, _, _ in Formatter().parse(text) if field is not None}
+    except ValueError:
+        return set()
+
+def compile_catalogs(translations):
+    """Builds per-language_id lookup tables with fallback chains and pre-parsed templates"""
+    catalogs = {}
+    for lang_id, lang_code in LANG_CODES.items():
+        catalog = {}
+        # Apply the chain from last to first so the preferred locale wins
+        for code in reversed(FALLBACKS.get(lang_code, [lang_code])):
+            for key, text in translations.get(code, {}).items():
+                text = str(text)
+                catalog[key] = (text, bool(get_placeholders(text)))
+        catalogs[lang_id] = catalog
+    return catalogs
+
+def validate_placeholders(translations):
+    """Reports keys whose placeholders differ between locales. Returns the number of mismatches."""
+    mismatches = 0
+    codes = [code for code in LANG_CODES.values() if code in translations]
+    all_keys = set().union(*(translations[code].keys() for code in codes)) if codes else set()
+    for key in sorted(all_keys):
+        fields = {code: get_placeholders(str(translations[code][key])) for code in codes if key in translations[code]}
+        if len({frozenset(f) for f in fields.values()}) > 1:
+            mismatches += 1
+            print(f"⚠️ Placeholder mismatch for '{key}': {fields}")
+        missing = [code for code in codes if key not in translations[code]]
+        if missing:
+            logger.debug(f"Key '{key}' missing in {missing}, using fallback")
+    return mismatches
+
+def on_reload(callback):
+    """Registers a callback to run after translations are (re)loaded"""
+    _reload_callbacks.append(callback)
+
 def load_translations():
     """Load all translations from locales/ directory into memory"""
-    global TRANSLATIONS
-    TRANSLATIONS = {}
-    
-    # Path is relative to this file
-    base_dir = os.path.dirname(__file__)
-    locales_dir = os.path.join(base_dir, "locales")
-    
-    if not os.path.exists(locales_dir):
-        print(f"⚠️ Locales directory not found: {locales_dir}")
+    global TRANSLATIONS, CATALOGS
+    translations = {}
+
+    if not os.path.exists(LOCALES_DIR):
+        print(f"⚠️ Locales directory not found: {LOCALES_DIR}")
         return
 
     # Load known languages
-    for lang_code in ["ru", "en"]:
-        file_path = os.path.join(locales_dir, f"{lang_code}.json")
+    for lang_code in LANG_CODES.values():
+        file_path = os.path.join(LOCALES_DIR, f"{lang_code}.json")
         if os.path.exists(file_path):
             try:
+                _mtimes[file_path] = os.path.getmtime(file_path)
                 with open(file_path, "r", encoding="utf-8") as f:
                     data = json.load(f)
-                    TRANSLATIONS[lang_code] = data
+                    translations[lang_code] = data
                 print(f"✅ Loaded {lang_code} from {file_path} ({len(data)} keys)")
             except Exception as e:
                 print(f"❌ Error loading {lang_code}.json: {e}")
         else:
             print(f"⚠️ File not found: {file_path}")
-            
+
     # Verify loaded
-    if not TRANSLATIONS:
+    if not translations:
          print("⚠️ No translations loaded!")
 
+    validate_placeholders(translations)
+    # Swap both at once so t() never sees a half-built catalog
+    TRANSLATIONS, CATALOGS = translations, compile_catalogs(translations)
+
+    for callback in _reload_callbacks:
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Translation reload callback failed: {e}")
+
+def locales_changed():
+    for lang_code in LANG_CODES.values():
+        file_path = os.path.join(LOCALES_DIR, f"{lang_code}.json")
+        try:
+            mtime = os.path.getmtime(file_path)
+        except OSError:
+            continue
+        if _mtimes.get(file_path) != mtime:
+            return True
+    return False
+
+async def watch_locales(interval=5):
+    """Hot-reloads locales/*.json when a file's mtime changes"""
+    while True:
+        await asyncio.sleep(interval)
+        if locales_changed():
+            print("🔄 Locale files changed, reloading translations")
+            load_translations()
+
 def t(key, language_id=1, **kwargs):
     """
     Get translation for a key
-    
+
     Args:
         key: Translation key
         language_id: Language ID (1=Russian, 2=English, etc.)
         **kwargs: Format parameters for string formatting
-    
+
     Returns:
         Translated string
     """
-    # Map language_id to language_code
-    lang_code_map = {1: "ru", 2: "en"}
-    lang_code = lang_code_map.get(language_id, "ru")
-    
-    # Get translation
-    # Fallback to key if not found
-    translation = TRANSLATIONS.get(lang_code, {}).get(key, key)
-    
+    catalog = CATALOGS.get(language_id) or CATALOGS.get(DEFAULT_LANG_ID, {})
+    entry = catalog.get(key)
+    if entry is None:
+        # Fallback to key if not found
+        return key
+    text, has_placeholders = entry
+
     # Apply formatting if kwargs provided
-    if kwargs:
+    if kwargs and has_placeholders:
         try:
-            translation = translation.format(**kwargs)
+            return text.format_map(kwargs)
         except (KeyError, ValueError, IndexError):
-            # If format fails (e.g. missing arg), return unformatted or formatted partially
+            # If format fails (e.g. missing arg), return unformatted
             pass
-    
-    return translation
+
+    return text
 
 def get_lang_code(language_id):
     """Convert language_id to language code"""
-    lang_code_map = {1: "ru", 2: "en"}
-    return lang_code_map.get(language_id, "ru")
+    return LANG_CODES.get(language_id, "ru")
+
+
+if __name__ == "__main__":
+    # Microbenchmark: python translations.py
+    import timeit
+
+    load_translations()
+    n = 200_000
+    cases = {
+        "plain": lambda: t("btn_back", 2),
+        "format": lambda: t("editing_player", 2, name="Ivan"),
+        "missing": lambda: t("no_such_key", 2),
+    }
+    for name, fn in cases.items():
+        sec = timeit.timeit(fn, number=n)
+        print(f"{name:8s} {sec / n * 1e9:8.1f} ns/call")
@@ -12,6 +12,11 @@ import utils
 import translations as tr
 from states import PlayerSelfRegister, MatchSettings, PairsBuilder
 from init_bot import bot
+from callback_router import callbacks
+from waitlist import waitlist
+from table_cache import table_cache
+import table_text
+from player_profile import profile_cache, format_profile
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -40,6 +45,12 @@ async def on_user_join(message: Message, state: FSMContext):
                     raise
             return
 
+@router.chat_member()
+@router.my_chat_member()
+async def on_chat_member_update(event: types.ChatMemberUpdated):
+    # Admin rights may have changed - drop cached admin list
+    utils.invalidate_admin_cache(event.chat.id)
+
 @router.message(CommandStart())
 async def cmd_start(message: Message, state: FSMContext):
     cid, tid = get_ids(message)
@@ -70,8 +81,7 @@ async def cmd_start(message: Message, state: FSMContext):
                 target_lang = utils.get_chat_lang(target_cid, target_tid)
                 
                 try:
-                    chat_member = await bot.get_chat_member(target_cid, message.from_user.id)
-                    if chat_member.status not in ['administrator', 'creator']:
+                    if not await utils.check_user_admin(target_cid, message.from_user.id):
                         return await message.answer(tr.t("no_admin_rights", target_lang))
                 except:
                     return await message.answer(tr.t("error_generic", target_lang))
@@ -150,6 +160,7 @@ async def cmd_cancel(message: Message, state: FSMContext):
         return  # Ignore in private chat
     cid, tid = get_ids(message)
     lang_id = utils.get_chat_lang(cid, tid)
+    await utils.cleanup_msgs(message.chat.id, state)
     await state.clear()
     await message.answer(tr.t("action_canceled", lang_id))
     try:
@@ -212,23 +223,42 @@ async def cmd_pay_info(message: Message):
         pass
     
     # Auto-delete after 2 minutes
-    import asyncio
-    asyncio.create_task(delete_message_after_delay(sent_msg, 120))
+    utils.schedule_delete(sent_msg.chat.id, sent_msg.message_id, delay_seconds=120)
 
 @router.message(Command("table"))
-async def cmd_table(message: Message):
+async def cmd_table(message: Message, command: CommandObject):
     cid, tid = get_ids(message)
     lang_id = utils.get_chat_lang(cid, tid)
     
+    # /table text: monospace table, no image pipeline
+    if (command.args or "").strip().lower() in ("text", "текст"):
+        text, page, pages = table_text.get_page(cid, tid)
+        await message.answer(
+            text or tr.t("table_text_empty", lang_id),
+            parse_mode="HTML",
+            reply_markup=kb.get_table_text_kb(page, pages, lang_id)
+        )
+        return
+    
+    # No match recorded since the last /table: resend the same photo by file_id
+    file_id, version = table_cache.lookup(cid, tid)
+    if file_id:
+        try:
+            await message.answer_photo(file_id, reply_markup=kb.get_table_kb(cid, tid, lang_id))
+            return
+        except Exception as e:
+            logger.warning(f"Cached table photo rejected, rendering again: {e}")
+    
     wait_msg = await message.answer(tr.t("processing_image", lang_id) if tr.t("processing_image", lang_id) != "processing_image" else "⏳ ...")
     
     try:
-        photo = await utils.get_championship_image(cid, tid)
+        photo = await table_cache.render(cid, tid, version)
         if photo:
-            await message.answer_photo(
+            sent = await message.answer_photo(
                 photo,
-                reply_markup=kb.get_site_link_kb(cid, tid, lang_id)
+                reply_markup=kb.get_table_kb(cid, tid, lang_id)
             )
+            table_cache.remember(cid, tid, version, sent)
             await wait_msg.delete()
         else:
             await wait_msg.edit_text(tr.t("error_generic", lang_id))
@@ -236,6 +266,33 @@ async def cmd_table(message: Message):
         logger.error(f"Table cmd error: {e}")
         await wait_msg.edit_text(tr.t("error_generic", lang_id))
 
+@callbacks.prefix("table_page_")
+async def process_table_page(callback: CallbackQuery):
+    cid, tid = get_ids(callback)
+    lang_id = utils.get_chat_lang(cid, tid)
+    text, page, pages = table_text.get_page(cid, tid, int(callback.data.split("_")[-1]))
+    text = text or tr.t("table_text_empty", lang_id)
+    markup = kb.get_table_text_kb(page, pages, lang_id)
+    if callback.message.photo:
+        # Toggle under the image: the text table goes into its own message
+        await callback.message.answer(text, parse_mode="HTML", reply_markup=markup)
+    else:
+        try:
+            await callback.message.edit_text(text, parse_mode="HTML", reply_markup=markup)
+        except Exception:
+            pass  # same page clicked: message is not modified
+    await callback.answer()
+
+@router.message(Command("me"))
+async def cmd_me(message: Message):
+    cid, tid = get_ids(message)
+    lang_id = utils.get_chat_lang(cid, tid)
+    profile = profile_cache.get(cid, tid, message.from_user.id)
+    if not profile:
+        await message.reply(tr.t("profile_not_player", lang_id))
+        return
+    await message.reply(format_profile(profile, lang_id), parse_mode="HTML")
+
 @router.message(Command("site"))
 async def cmd_site(message: Message):
     cid, tid = get_ids(message)
@@ -245,16 +302,7 @@ async def cmd_site(message: Message):
         reply_markup=kb.get_site_link_kb(cid, tid, lang_id)
     )
 
-async def delete_message_after_delay(message, seconds):
-    """Helper to delete message after delay"""
-    import asyncio
-    await asyncio.sleep(seconds)
-    try:
-        await message.delete()
-    except Exception:
-        pass  # Message might already be deleted
-
-@router.callback_query(F.data.startswith("reg_"))
+@callbacks.prefix("reg_")
 async def process_registration(callback: CallbackQuery, state: FSMContext):
     cid, tid = get_ids(callback)
     # Save poll message ID
@@ -349,7 +397,7 @@ async def process_registration(callback: CallbackQuery, state: FSMContext):
     await callback.answer(msg)
     await utils.update_poll_message(callback.message)
 
-@router.callback_query(F.data == "not_coming")
+@callbacks.exact("not_coming")
 async def process_not_coming(callback: CallbackQuery):
     cid, tid = get_ids(callback)
     lang_id = utils.get_chat_lang(cid, tid)
@@ -379,11 +427,11 @@ async def process_not_coming(callback: CallbackQuery):
     await callback.answer(tr.t("reg_canceled_not_coming", lang_id))
     if was_active:
          # Free spot opened
-         await utils.check_queue_promotion(cid, tid)
+         await waitlist.promote(cid, tid)
          
     await utils.update_poll_message(callback.message)
 
-@router.callback_query(F.data == "unreg")
+@callbacks.exact("unreg")
 async def process_unregistration(callback: CallbackQuery):
     cid, tid = get_ids(callback)
     lang_id = utils.get_chat_lang(cid, tid)
@@ -402,11 +450,11 @@ async def process_unregistration(callback: CallbackQuery):
         db.unregister_player(p[0], cid, tid)
         await callback.answer(tr.t("reg_canceled", lang_id))
         if was_active:
-             await utils.check_queue_promotion(cid, tid)
+             await waitlist.promote(cid, tid)
              
         await utils.update_poll_message(callback.message)
 
-@router.callback_query(F.data.startswith("queue_confirm_"))
+@callbacks.prefix("queue_confirm_")
 async def process_queue_confirm(callback: CallbackQuery):
     cid, tid = get_ids(callback)
     pid = int(callback.data.split("_")[2])
@@ -421,12 +469,14 @@ async def process_queue_confirm(callback: CallbackQuery):
     if not is_adm and (not p[1] or p[1] != callback.from_user.id):
         return await callback.answer(tr.t("error_not_your_button", lang_id), show_alert=True)
         
+    # The confirmation window may have expired and the spot gone to the next player
+    if not waitlist.is_pending(cid, tid, pid):
+        return await callback.answer(tr.t("queue_confirm_too_late", lang_id), show_alert=True)
     db.update_registration_status(pid, cid, tid, 'active')
-    await callback.message.edit_text(tr.t("queue_confirmed", lang_id), reply_markup=None)
-    await callback.answer()
+    await waitlist.close_prompt(callback, pid, tr.t("queue_confirmed", lang_id))
     await utils.update_poll_message(chat_id=cid, thread_id=tid)
 
-@router.callback_query(F.data.startswith("queue_cancel_"))
+@callbacks.prefix("queue_cancel_")
 async def process_queue_cancel(callback: CallbackQuery):
     cid, tid = get_ids(callback)
     pid = int(callback.data.split("_")[2])
@@ -441,11 +491,10 @@ async def process_queue_cancel(callback: CallbackQuery):
         return await callback.answer(tr.t("error_not_your_button", lang_id), show_alert=True)
 
     db.unregister_player(pid, cid, tid)
-    await callback.message.edit_text(tr.t("queue_left", lang_id), reply_markup=None)
-    await callback.answer()
+    await waitlist.close_prompt(callback, pid, tr.t("queue_left", lang_id))
     
     # Trigger promotion check again in case there are others in queue
-    await utils.check_queue_promotion(cid, tid)
+    await waitlist.promote(cid, tid)
     
     await utils.update_poll_message(chat_id=cid, thread_id=tid)
 
@@ -520,8 +569,7 @@ async def player_self_name(message: Message, state: FSMContext):
         except: pass
         
         # Auto-delete success message after 10s
-        import asyncio
-        asyncio.create_task(utils.auto_delete_message(message.chat.id, sent_success.message_id, delay_seconds=10))
+        utils.schedule_delete(message.chat.id, sent_success.message_id, delay_seconds=10)
         
         if data.get('poll_msg_id'):
              await utils.update_poll_message(chat_id=target_cid, thread_id=target_tid, message_id=data['poll_msg_id'])
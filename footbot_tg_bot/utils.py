@@ -1,17 +1,18 @@
 import random
 import logging
-import asyncio
 import math
-import re
-from datetime import datetime, timedelta, timezone
+import os
+import time
 from aiogram import types
-from aiogram.types import Message, CallbackQuery, LinkPreviewOptions
 from aiogram.fsm.context import FSMContext
-from aiogram.utils.keyboard import InlineKeyboardBuilder
 from init_bot import bot
 import database as db
 import keyboards as kb
 import translations as tr
+import draft_session as drafts
+import schedule
+from vote_tally import vote_tally
+from scheduler import delete_scheduler, delete_messages_batched
 from typing import Any, Awaitable, Callable, Dict
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery, LinkPreviewOptions, TelegramObject
@@ -230,32 +231,68 @@ def player_to_dict(p):
         "position": p[7]
     }
 
+# Max tracked messages per (chat, FSM owner); the oldest are forgotten beyond that
+MAX_TRACKED_MESSAGES = 200
+
+def _flow_key(state: FSMContext):
+    """(chat_id, thread_id, user_id) of the FSM key a flow runs under"""
+    return state.key.chat_id, state.key.thread_id or 0, state.key.user_id
+
 async def track_msg(state: FSMContext, msg_id: int):
-    data = await state.get_data()
-    msgs = data.get("msgs_to_delete", [])
-    msgs.append(msg_id)
-    await state.update_data(msgs_to_delete=msgs)
+    """Remembers a message of the current flow for cleanup_msgs (kept outside FSM data)"""
+    db.add_tracked_message(*_flow_key(state), msg_id, MAX_TRACKED_MESSAGES)
 
 async def cleanup_msgs(chat_id: int, state: FSMContext, exclude_ids: list = None):
     """Удаляет отслеживаемые сообщения, кроме тех, что в exclude_ids"""
-    if exclude_ids is None:
-        exclude_ids = []
+    exclude_ids = set(exclude_ids or [])
+    msgs = db.pop_tracked_messages(*_flow_key(state), exclude_ids)
+    # Ids tracked in FSM data before the tracked_messages table existed
     data = await state.get_data()
-    msgs = data.get("msgs_to_delete", [])
-    for m_id in msgs:
-        if m_id not in exclude_ids:
-            try:
-                await bot.delete_message(chat_id, m_id)
-            except:
-                pass
-
-async def auto_delete_message(chat_id: int, message_id: int, delay_seconds: int = 10):
-    """Автоматически удаляет сообщение через указанное время"""
-    await asyncio.sleep(delay_seconds)
+    if "msgs_to_delete" in data:
+        legacy = data.pop("msgs_to_delete")
+        msgs += [m_id for m_id in legacy if m_id not in exclude_ids]
+        kept = [m_id for m_id in legacy if m_id in exclude_ids]
+        if kept:
+            data["msgs_to_delete"] = kept
+        await state.set_data(data)
+    to_delete = sorted(set(msgs))
+    if to_delete:
+        await delete_messages_batched(chat_id, to_delete)
+
+def schedule_delete(chat_id: int, message_id: int, delay_seconds: int = 10):
+    """Планирует удаление сообщения через указанное время (переживает рестарт)"""
+    delete_scheduler.schedule(chat_id, message_id, delay_seconds)
+
+# chat_id -> (expires_at, frozenset of admin user ids)
+ADMIN_CACHE_TTL = int(os.getenv("ADMIN_CACHE_TTL", "300"))
+_admin_cache = {}
+
+async def get_chat_admin_ids(chat_id: int):
+    """Admin ids of a group from cache, filled in bulk by getChatAdministrators. None if unavailable."""
+    if chat_id > 0:
+        return None  # Private chat, no admin list
+    cached = _admin_cache.get(chat_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
     try:
-        await bot.delete_message(chat_id, message_id)
-    except:
-        pass
+        admins = await bot.get_chat_administrators(chat_id)
+    except Exception as e:
+        logger.debug(f"get_chat_administrators failed for {chat_id}: {e}")
+        return None
+    admin_ids = frozenset(m.user.id for m in admins)
+    _admin_cache[chat_id] = (time.monotonic() + ADMIN_CACHE_TTL, admin_ids)
+    return admin_ids
+
+def invalidate_admin_cache(chat_id: int):
+    _admin_cache.pop(chat_id, None)
+
+async def check_user_admin(chat_id: int, user_id: int):
+    admin_ids = await get_chat_admin_ids(chat_id)
+    if admin_ids is not None:
+        return user_id in admin_ids
+    # Cache miss: single lookup
+    member = await bot.get_chat_member(chat_id, user_id)
+    return member.status in ["creator", "administrator"]
 
 async def is_admin(event: types.Message | types.CallbackQuery, state: FSMContext = None):
     chat_id = event.chat.id if isinstance(event, Message) else event.message.chat.id
@@ -270,8 +307,7 @@ async def is_admin(event: types.Message | types.CallbackQuery, state: FSMContext
     try:
         # Для лички с самим собой get_chat_member может вести себя странно, 
         # но если мы подменили chat_id на ID группы, то всё сработает штатно.
-        member = await bot.get_chat_member(chat_id, user_id)
-        return member.status in ["creator", "administrator"]
+        return await check_user_admin(chat_id, user_id)
     except Exception as e:
         logger.debug(f"is_admin check failed: {e}")
         # Если это личка и нет подмены chat_id — по умолчанию не админ
@@ -286,51 +322,6 @@ def get_ids(event: types.Message | types.CallbackQuery):
         return event.message.chat.id, (event.message.message_thread_id or 0) if event.message else 0
     return 0, 0
 
-def get_match_date(match_times_str, timezone_str, find_past=False):
-    """
-    Calculates the match date based on specific weekday/time string (e.g., 'mon 21:00').
-    find_past: If True, finds the most recent past (or current) occurrence.
-    Returns: datetime object (naive, representing Local Match Time) or None
-    """
-    if not match_times_str or match_times_str == "—": return None
-    import re
-    match_time = re.match(r"^([a-z]{3})\s+(\d{1,2}):(\d{2})$", str(match_times_str))
-    if not match_time: return None
-
-    day_code = match_time.group(1)
-    hh = int(match_time.group(2))
-    mm = int(match_time.group(3))
-
-    offset = 3
-    if timezone_str:
-        tm_match = re.search(r"GMT([+-]?\d+)", str(timezone_str))
-        if tm_match: offset = int(tm_match.group(1))
-
-    utc_now = datetime.now(timezone.utc)
-    client_now = utc_now + timedelta(hours=offset)
-    client_now = client_now.replace(tzinfo=None)
-
-    days_map = {'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6}
-    target_wd = days_map.get(day_code, 0)
-    current_wd = client_now.weekday()
-
-    delta = target_wd - current_wd
-
-    if find_past:
-        if delta > 0: delta -= 7
-        elif delta == 0:
-             if client_now.hour < hh or (client_now.hour == hh and client_now.minute < mm):
-                 delta -= 7
-    else:
-        if delta < 0: delta += 7
-        elif delta == 0:
-            if client_now.hour > hh or (client_now.hour == hh and client_now.minute >= mm):
-                delta = 7
-
-    target_date = client_now + timedelta(days=delta)
-    target_date = target_date.replace(hour=hh, minute=mm, second=0, microsecond=0)
-    return target_date
-
 async def update_poll_message(message: Message = None, chat_id: int = None, thread_id: int = None, message_id: int = None):
     cid = chat_id or (message.chat.id if message else None)
     tid = thread_id if thread_id is not None else (message.message_thread_id or 0 if message else 0)
@@ -392,17 +383,12 @@ async def update_poll_message(message: Message = None, chat_id: int = None, thre
     time_val = settings.get('match_times', '—')
     tz_val = settings.get('timezone', 'GMT+3')
 
-    next_dt = get_match_date(time_val, tz_val, find_past=False)
+    next_dt = schedule.next_match(cid, tid, settings)
 
     if next_dt:
-        match_time = re.match(r"^([a-z]{3})\s+(\d{1,2}):(\d{2})$", str(time_val))
-        day_code = match_time.group(1)
-        hh = int(match_time.group(2))
-        mm = int(match_time.group(3))
-
         date_str = next_dt.strftime("%d.%m.%y")
-        day_short = tr.t("wd_short_" + day_code, lang_id)
-        display_str = f"{day_short} {hh:02d}:{mm:02d} ({h(tz_val)}), {date_str}г."
+        day_short = tr.t("wd_short_" + schedule.DAY_CODES[next_dt.weekday()], lang_id)
+        display_str = f"{day_short} {next_dt.hour:02d}:{next_dt.minute:02d} ({h(tz_val)}), {date_str}г."
         text += f"{tr.t('setting_match_times', lang_id)}: {display_str}\n"
     else:
         text += f"{tr.t('setting_match_times', lang_id)}: {h(time_val)} ({h(tz_val)})\n"
@@ -554,7 +540,8 @@ async def update_poll_message(message: Message = None, chat_id: int = None, thre
 
 def perform_full_clear(chat_id, thread_id):
     db.clear_registrations(chat_id, thread_id)
-    db.clear_draft_state(chat_id, thread_id)
+    drafts.clear(chat_id, thread_id)
+    vote_tally.clear(chat_id, thread_id)
 
 def get_unpaid_players_mention(chat_id, thread_id, lang_id=1):
     """Returns a string with mentions for unpaid players and a status keyboard"""
@@ -580,76 +567,6 @@ def get_unpaid_players_mention(chat_id, thread_id, lang_id=1):
     
     return text, None
 
-async def check_queue_promotion(chat_id, thread_id):
-    """
-    Checks if there is a free slot for a player from the queue.
-    If yes, sends a confirmation message to the first player in the queue.
-    """
-    settings = db.get_match_settings(chat_id, thread_id)
-    req_count = settings.get('player_count', 12)
-    regs = db.get_registrations(chat_id, thread_id)
-    
-    # Active players are those with status='active'
-    for r in regs:
-        logger.info(f"Reg: id={r[0]}, name={r[2]}, status='{r[9]}'")
-    active_players = [r for r in regs if r[9] == 'active']
-    
-    # Calculate occupied spots including reserved core
-    all_core = db.get_core_players(chat_id, thread_id)
-    core_ids = [c[0] for c in all_core]
-    regs_map = {r[0]: r[9] for r in regs}
-    
-    core_team_mode = settings.get('core_team_mode', 0)
-    reserved_core = 0
-    if core_team_mode:
-        for c_id in core_ids:
-            status = regs_map.get(c_id)
-            if status != 'active' and status != 'not_coming':
-                reserved_core += 1
-            
-    total_occupied = len(active_players) + reserved_core
-    
-    logger.info(f"QueueCheck: req={req_count}, occupied={total_occupied} (active={len(active_players)}, reserved={reserved_core})")
-    
-    # Only promote if we have space
-    if total_occupied < req_count:
-        # First check if anyone is ALREADY pending confirm (stuck?)
-        pending_players = [r for r in regs if r[9] == 'pending_confirm']
-        
-        target_candidate = None
-        
-        if pending_players:
-            # We have someone pending. Let's assume we need to re-send message or just wait.
-            # Ideally we pick the first one to re-notify if needed.
-            # But simpler logic: if pending exists, treat as candidate.
-            c = pending_players[0]
-            target_candidate = (c[0], c[1], c[2]) # id, user_id, name
-            logger.info(f"QueueCheck: Found pending candidate {target_candidate[2]}")
-        else:
-            # No pending, check queue
-            queue = db.get_queue(chat_id, thread_id)
-            logger.info(f"QueueCheck: queue_size={len(queue)}")
-            if queue:
-                target_candidate = queue[0]
-                # Update status immediately
-                db.update_registration_status(target_candidate[0], chat_id, thread_id, 'pending_confirm')
-
-        if target_candidate:
-            pid = target_candidate[0]
-            user_id = target_candidate[1]
-            name = target_candidate[2]
-            
-            lang_id = settings.get('language_id', 1)
-            tag = f"[{name}](tg://user?id={user_id})" if user_id else name
-            msg_text = tr.t("queue_promotion_msg", lang_id).format(tag=tag)
-            
-            builder = InlineKeyboardBuilder()
-            builder.button(text=tr.t("btn_confirm_queue", lang_id), callback_data=f"queue_confirm_{pid}")
-            builder.button(text=tr.t("btn_leave_queue", lang_id), callback_data=f"queue_cancel_{pid}")
-            builder.adjust(2)
-            
-            await bot.send_message(chat_id, msg_text, message_thread_id=thread_id if thread_id else None, reply_markup=builder.as_markup(), parse_mode="Markdown")
-
 class PMContextMiddleware(BaseMiddleware):
     async def __call__(
         self,
@@ -686,10 +603,47 @@ class PMContextMiddleware(BaseMiddleware):
 
 async def get_championship_image(chat_id: int, thread_id: int = 0):
     """
-    Fetches championship image from local API
+    Championship table image: drawn in-process by table_image, or by the site
+    when TABLE_RENDERER=site (or Pillow is not installed)
     """
+    import table_image
+    if os.getenv("TABLE_RENDERER", "native") == "site" or not table_image.is_available():
+        return await get_site_championship_image(chat_id, thread_id)
     try:
+        from aiogram.types import BufferedInputFile
+
+        png = await table_image.render_championship(chat_id, thread_id)
+        return BufferedInputFile(png, filename="championship.png") if png else None
+    except Exception as e:
+        logger.error(f"Table render error: {e}")
+        return None
+
+
+# One HTTP session for the site renderer instead of a new one per /table
+SITE_RENDER_TIMEOUT = float(os.getenv("SITE_RENDER_TIMEOUT", "30"))
+_http_session = None
+
+
+def get_http_session():
+    global _http_session
+    if _http_session is None or _http_session.closed:
         import aiohttp
+        _http_session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=SITE_RENDER_TIMEOUT, connect=5)
+        )
+    return _http_session
+
+
+async def close_http_session():
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+
+
+async def get_site_championship_image(chat_id: int, thread_id: int = 0):
+    """
+    Fetches championship image from local API
+    """
+    try:
         import base64
         from aiogram.types import BufferedInputFile
         
@@ -699,20 +653,19 @@ async def get_championship_image(chat_id: int, thread_id: int = 0):
             "thread_id": thread_id
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=payload) as response:
-                if response.status != 200:
-                    logger.error(f"API Error status: {response.status}")
-                    return None
-                    
-                data = await response.json()
+        async with get_http_session().post(url, json=payload) as response:
+            if response.status != 200:
+                logger.error(f"API Error status: {response.status}")
+                return None
                 
-                if "image" in data:
-                    image_data = base64.b64decode(data["image"])
-                    return BufferedInputFile(image_data, filename="championship.jpg")
-                else:
-                    logger.error("No image data in response")
-                    return None
+            data = await response.json()
+            
+            if "image" in data:
+                image_data = base64.b64decode(data["image"])
+                return BufferedInputFile(image_data, filename="championship.jpg")
+            else:
+                logger.error("No image data in response")
+                return None
                     
     except Exception as e:
         logger.error(f"API Error: {e}")
@@ -0,0 +1,158 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from init_bot import bot
+import database as db
+import keyboards as kb
+
+logger = logging.getLogger(__name__)
+
+# Votes are written to draw_votes in batches this often
+FLUSH_SECONDS = 1.0
+# Button counters of all variant messages are refreshed together after this pause
+EDIT_COALESCE_SECONDS = 1.0
+
+
+class ChatTally:
+    """Votes of one chat/thread: voter -> (variant, time) plus per-variant counters"""
+
+    __slots__ = ("voters", "counts", "messages", "lang_id", "dirty", "edit_task")
+
+    def __init__(self):
+        self.voters = {}
+        self.counts = {}
+        self.messages = {}  # variant_id -> message_id with the vote button
+        self.lang_id = 1
+        self.dirty = set()
+        self.edit_task = None
+
+
+class VoteTally:
+    """In-memory draw vote counting; the DB is only written in the background"""
+
+    def __init__(self):
+        self._tallies = {}
+        self._pending = {}  # (chat_id, thread_id, voter_id) -> (variant_id, vote_time)
+        self._flush_task = None
+
+    def _get(self, chat_id: int, thread_id: int) -> ChatTally:
+        key = (chat_id, thread_id)
+        tally = self._tallies.get(key)
+        if tally is None:
+            # First access after a restart: rebuild from the persisted votes
+            tally = ChatTally()
+            for variant_id, voter_id, vote_time in db.get_draw_votes(chat_id, thread_id):
+                tally.voters[voter_id] = (variant_id, vote_time)
+                tally.counts[variant_id] = tally.counts.get(variant_id, 0) + 1
+            self._tallies[key] = tally
+        return tally
+
+    def vote(self, chat_id: int, thread_id: int, variant_id: int, voter_id: int) -> int:
+        """Records (or moves) a vote, returns the new count of variant_id"""
+        tally = self._get(chat_id, thread_id)
+        now = datetime.now()
+        previous = tally.voters.get(voter_id)
+        if previous and previous[0] != variant_id:
+            tally.counts[previous[0]] -= 1
+            tally.dirty.add(previous[0])
+        if not previous or previous[0] != variant_id:
+            tally.counts[variant_id] = tally.counts.get(variant_id, 0) + 1
+            tally.dirty.add(variant_id)
+        tally.voters[voter_id] = (variant_id, now)
+
+        self._pending[(chat_id, thread_id, voter_id)] = (variant_id, now)
+        if not self._flush_task or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+        self._schedule_edit(chat_id, thread_id, tally)
+        return tally.counts[variant_id]
+
+    def count(self, chat_id: int, thread_id: int, variant_id: int) -> int:
+        return self._get(chat_id, thread_id).counts.get(variant_id, 0)
+
+    def stats(self, chat_id: int, thread_id: int):
+        """[(variant_id, count, first_vote)] ordered by count, like the old GROUP BY query"""
+        tally = self._get(chat_id, thread_id)
+        first = {}
+        for variant_id, vote_time in tally.voters.values():
+            if variant_id not in first or vote_time < first[variant_id]:
+                first[variant_id] = vote_time
+        counts = tally.counts
+        return sorted(((v, counts[v], t) for v, t in first.items()), key=lambda row: -row[1])
+
+    def winner(self, chat_id: int, thread_id: int):
+        """Most votes; on a tie, the variant whose latest vote came first"""
+        tally = self._get(chat_id, thread_id)
+        last = {}
+        for variant_id, vote_time in tally.voters.values():
+            if variant_id not in last or vote_time > last[variant_id]:
+                last[variant_id] = vote_time
+        if not last:
+            return None
+        counts = tally.counts
+        return min(last, key=lambda v: (-counts[v], last[v]))
+
+    def bind_message(self, chat_id: int, thread_id: int, variant_id: int, message_id: int, lang_id: int = None):
+        """Remembers which message shows variant_id so its counter can be refreshed"""
+        tally = self._get(chat_id, thread_id)
+        tally.messages[variant_id] = message_id
+        if lang_id is not None:
+            tally.lang_id = lang_id
+
+    def close(self, chat_id: int, thread_id: int):
+        """Voting is decided: stop touching the variant messages (votes stay for /finish_draw)"""
+        tally = self._tallies.get((chat_id, thread_id))
+        if not tally:
+            return
+        if tally.edit_task:
+            tally.edit_task.cancel()
+        tally.messages.clear()
+        tally.dirty.clear()
+
+    def clear(self, chat_id: int, thread_id: int):
+        """New draw: forget all votes of the chat"""
+        self.close(chat_id, thread_id)
+        self._tallies[(chat_id, thread_id)] = ChatTally()
+        for key in [k for k in self._pending if k[0] == chat_id and k[1] == thread_id]:
+            del self._pending[key]
+        db.clear_draw_votes(chat_id, thread_id)
+
+    def _schedule_edit(self, chat_id, thread_id, tally):
+        if tally.edit_task and not tally.edit_task.done():
+            return
+        tally.edit_task = asyncio.create_task(self._refresh_buttons(chat_id, thread_id, tally))
+
+    async def _refresh_buttons(self, chat_id, thread_id, tally):
+        # Every vote that arrives during the pause lands in the same round of edits
+        await asyncio.sleep(EDIT_COALESCE_SECONDS)
+        dirty, tally.dirty = tally.dirty, set()
+        for variant_id in dirty:
+            message_id = tally.messages.get(variant_id)
+            if not message_id:
+                continue
+            markup = kb.get_vote_kb(variant_id, tally.counts.get(variant_id, 0), lang_id=tally.lang_id)
+            try:
+                await bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id, reply_markup=markup)
+            except Exception as e:
+                logger.debug(f"Vote counter edit failed in {chat_id}: {e}")
+
+    async def _flush_later(self):
+        await asyncio.sleep(FLUSH_SECONDS)
+        self.flush()
+
+    def flush(self):
+        """Writes pending votes in one batch"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        rows = [(cid, tid, variant_id, voter_id, vote_time) for (cid, tid, voter_id), (variant_id, vote_time) in pending.items()]
+        try:
+            db.save_draw_votes(rows)
+        except Exception as e:
+            logger.error(f"Failed to persist {len(rows)} draw votes: {e}")
+            # Keep them for the next round unless newer votes replaced them
+            for (cid, tid, variant_id, voter_id, vote_time) in rows:
+                self._pending.setdefault((cid, tid, voter_id), (variant_id, vote_time))
+
+
+vote_tally = VoteTally()
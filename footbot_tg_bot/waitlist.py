@@ -0,0 +1,254 @@
+import asyncio
+import heapq
+import logging
+import os
+from datetime import datetime, timedelta
+
+from aiogram.types import InlineKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from init_bot import bot
+import database as db
+import translations as tr
+import utils
+
+logger = logging.getLogger(__name__)
+
+# Seconds a promoted player has to confirm before the spot goes to the next one (0 = wait forever)
+QUEUE_CONFIRM_TIMEOUT = int(os.getenv("QUEUE_CONFIRM_TIMEOUT", "1800"))
+
+
+class PollWaitlist:
+    """Registrations of one poll as the engine sees them"""
+
+    __slots__ = ("capacity", "core_mode", "core_ids", "lang_id", "status", "counts", "queue", "seq", "next_seq", "pending")
+
+    def __init__(self, capacity, core_mode, core_ids, lang_id):
+        self.capacity = capacity
+        self.core_mode = core_mode
+        self.core_ids = core_ids
+        self.lang_id = lang_id
+        self.status = {}  # player_id -> status
+        self.counts = {}  # status -> number of players
+        self.queue = []  # heap of (seq, player_id), stale entries are skipped on pop
+        self.seq = {}  # player_id -> seq of its live queue entry
+        self.next_seq = 0
+        self.pending = {}  # player_id -> confirmation deadline (None = no timeout)
+
+    def occupied(self):
+        # Core players hold their spot until they register or say they are not coming
+        reserved = 0
+        if self.core_mode:
+            reserved = sum(1 for pid in self.core_ids if self.status.get(pid) not in ('active', 'not_coming'))
+        return self.counts.get('active', 0) + reserved
+
+    def free_slots(self):
+        return self.capacity - self.occupied() - self.counts.get('pending_confirm', 0)
+
+    def set_status(self, player_id, status):
+        old = self.status.pop(player_id, None)
+        if old:
+            self.counts[old] -= 1
+        if status:
+            self.status[player_id] = status
+            self.counts[status] = self.counts.get(status, 0) + 1
+        if status == 'queue':
+            # Any write moves the registration to the end, same as ORDER BY updated_at
+            self.seq[player_id] = self.next_seq
+            heapq.heappush(self.queue, (self.next_seq, player_id))
+            self.next_seq += 1
+        else:
+            self.seq.pop(player_id, None)
+        if status != 'pending_confirm':
+            self.pending.pop(player_id, None)
+
+    def pop_next(self):
+        """First player in the queue, O(log n)"""
+        while self.queue:
+            seq, player_id = heapq.heappop(self.queue)
+            if self.seq.get(player_id) == seq:
+                del self.seq[player_id]
+                return player_id
+        return None
+
+
+class WaitlistEngine:
+    """
+    Promotes queued players into free spots. State per poll is loaded once and then kept
+    up to date from registration writes (db.on_registration_change); unconfirmed
+    promotions expire on a timer and pass the spot on.
+    """
+
+    def __init__(self, confirm_timeout: int = QUEUE_CONFIRM_TIMEOUT):
+        self.confirm_timeout = confirm_timeout
+        self.shard = None  # (shard_id, shard_count) when running as a shard worker
+        self._polls = {}
+        self._timers = []  # heap of (deadline, chat_id, thread_id, player_id)
+        self._wakeup = asyncio.Event()
+        self._task = None
+        db.on_registration_change(self._on_change)
+
+    def start(self):
+        """Picks up promotions left unconfirmed before a restart and starts the timer loop"""
+        if self._task:
+            return
+        for chat_id, thread_id in db.get_polls_with_pending_confirm(shard=self.shard):
+            self._load(chat_id, thread_id)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Waitlist engine started, {len(self._timers)} pending confirmations")
+
+    async def stop(self):
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _load(self, chat_id, thread_id):
+        key = (chat_id, thread_id)
+        poll = self._polls.get(key)
+        if poll:
+            return poll
+        settings = db.get_match_settings(chat_id, thread_id)
+        core_ids = {c[0] for c in db.get_core_players(chat_id, thread_id)}
+        poll = PollWaitlist(
+            settings.get('player_count', 12),
+            settings.get('core_team_mode', 0),
+            core_ids,
+            settings.get('language_id', 1)
+        )
+        now = datetime.now()
+        for player_id, status, age in db.get_waitlist_rows(chat_id, thread_id):
+            poll.set_status(player_id, status)
+            if status == 'pending_confirm':
+                self._start_timer(chat_id, thread_id, poll, player_id, now - timedelta(seconds=age or 0))
+        self._polls[key] = poll
+        return poll
+
+    def _start_timer(self, chat_id, thread_id, poll, player_id, since):
+        if not self.confirm_timeout:
+            poll.pending[player_id] = None
+            return
+        deadline = since + timedelta(seconds=self.confirm_timeout)
+        poll.pending[player_id] = deadline
+        is_earliest = not self._timers or deadline < self._timers[0][0]
+        heapq.heappush(self._timers, (deadline, chat_id, thread_id, player_id))
+        if is_earliest:
+            self._wakeup.set()
+
+    def _on_change(self, chat_id, thread_id, player_id, status):
+        poll = self._polls.get((chat_id, thread_id))
+        if poll is None:
+            return
+        if player_id is None:
+            # Bulk change: rebuild on next use
+            del self._polls[(chat_id, thread_id)]
+            return
+        was_pending = player_id in poll.pending
+        poll.set_status(player_id, status)
+        if status == 'pending_confirm' and not was_pending:
+            self._start_timer(chat_id, thread_id, poll, player_id, datetime.now())
+
+    def is_pending(self, chat_id, thread_id, player_id):
+        return self._load(chat_id, thread_id).status.get(player_id) == 'pending_confirm'
+
+    async def promote(self, chat_id, thread_id, expired_names=None):
+        """Fills every free spot from the queue and announces all promoted players in one message"""
+        poll = self._load(chat_id, thread_id)
+        promoted = []
+        while poll.free_slots() > 0:
+            player_id = poll.pop_next()
+            if player_id is None:
+                break
+            # Goes through _on_change, which starts the confirmation timer
+            db.update_registration_status(player_id, chat_id, thread_id, 'pending_confirm')
+            promoted.append(player_id)
+        if promoted or expired_names:
+            logger.info(f"Waitlist {chat_id}/{thread_id}: promoted {promoted}, expired {expired_names or []}")
+            await self._notify(chat_id, thread_id, poll.lang_id, promoted, expired_names or [])
+        return promoted
+
+    async def _notify(self, chat_id, thread_id, lang_id, promoted, expired_names):
+        lines = [tr.t("queue_confirm_expired", lang_id).format(name=name) for name in expired_names]
+        builder = InlineKeyboardBuilder()
+        tags = []
+        for player_id in promoted:
+            p = db.get_player_by_id(player_id, chat_id, thread_id)
+            if not p:
+                continue
+            user_id, name = p[1], p[2]
+            tags.append(f"[{name}](tg://user?id={user_id})" if user_id else name)
+            suffix = f" {name}" if len(promoted) > 1 else ""
+            builder.button(text=tr.t("btn_confirm_queue", lang_id) + suffix, callback_data=f"queue_confirm_{player_id}")
+            builder.button(text=tr.t("btn_leave_queue", lang_id) + suffix, callback_data=f"queue_cancel_{player_id}")
+        builder.adjust(2)
+        if len(tags) == 1:
+            lines.append(tr.t("queue_promotion_msg", lang_id).format(tag=tags[0]))
+        elif tags:
+            lines.append(tr.t("queue_promotion_batch_msg", lang_id).format(tags=", ".join(tags), count=len(tags)))
+        if not lines:
+            return
+        await bot.send_message(
+            chat_id, "\n\n".join(lines),
+            message_thread_id=thread_id if thread_id else None,
+            reply_markup=builder.as_markup() if tags else None,
+            parse_mode="Markdown"
+        )
+
+    async def close_prompt(self, callback, player_id, text):
+        """Answers a confirm/decline click without taking the buttons away from other promoted players"""
+        markup = callback.message.reply_markup
+        suffix = f"_{player_id}"
+        rows = [row for row in (markup.inline_keyboard if markup else []) if not any((b.callback_data or "").endswith(suffix) for b in row)]
+        if rows:
+            await callback.message.edit_reply_markup(reply_markup=InlineKeyboardMarkup(inline_keyboard=rows))
+            await callback.answer(text, show_alert=True)
+        else:
+            await callback.message.edit_text(text, reply_markup=None)
+            await callback.answer()
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            timeout = None
+            if self._timers:
+                timeout = max(0.0, (self._timers[0][0] - datetime.now()).total_seconds())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self._expire_due()
+            except Exception as e:
+                logger.error(f"Waitlist timer tick failed: {e}")
+
+    async def _expire_due(self):
+        now = datetime.now()
+        expired = {}
+        while self._timers and self._timers[0][0] <= now:
+            deadline, chat_id, thread_id, player_id = heapq.heappop(self._timers)
+            poll = self._load(chat_id, thread_id)
+            current = poll.pending.get(player_id)
+            # Confirmed, declined or re-promoted since the timer was set
+            if current is None or current > now:
+                continue
+            # A poll rebuilt by _load above pushes its timers again, already due: count each player once
+            player_ids = expired.setdefault((chat_id, thread_id), [])
+            if player_id not in player_ids:
+                player_ids.append(player_id)
+
+        for (chat_id, thread_id), player_ids in expired.items():
+            names = []
+            for player_id in player_ids:
+                p = db.get_player_by_id(player_id, chat_id, thread_id)
+                names.append(p[2] if p else str(player_id))
+                db.unregister_player(player_id, chat_id, thread_id)
+            # One message per poll: who lost the spot and who gets it now
+            await self.promote(chat_id, thread_id, expired_names=names)
+            await utils.update_poll_message(chat_id=chat_id, thread_id=thread_id)
+
+
+waitlist = WaitlistEngine()
@@ -0,0 +1,126 @@
+import asyncio
+import hmac
+import logging
+import os
+import signal
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def env_flag(name, default=False):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def add_stop_signals(stop_event: asyncio.Event):
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: KeyboardInterrupt is handled in main
+
+
+class WebhookServer:
+    """
+    Receives updates over HTTP and feeds each one to the dispatcher as a task.
+    Handler concurrency is bounded by ChatOrderingMiddleware (UPDATE_WORKERS),
+    the number of accepted but unfinished updates by UPDATE_QUEUE_SIZE.
+    """
+
+    def __init__(self, bot: Bot, dp: Dispatcher, host: str = None, port: int = None, register_webhook: bool = True):
+        self.bot = bot
+        self.dp = dp
+        self.url = os.getenv("WEBHOOK_URL")
+        self.path = os.getenv("WEBHOOK_PATH", "/webhook")
+        self.host = host or os.getenv("WEBHOOK_HOST", "127.0.0.1")
+        self.port = port or int(os.getenv("WEBHOOK_PORT", "8080"))
+        # Shard workers receive updates from the front and must not touch the webhook
+        self.register_webhook = register_webhook
+        self.secret = os.getenv("WEBHOOK_SECRET", "")
+        self.workers_count = int(os.getenv("UPDATE_WORKERS", "16"))
+        self.drain_timeout = int(os.getenv("SHUTDOWN_DRAIN_SECONDS", "30"))
+        self.slots = asyncio.Semaphore(int(os.getenv("UPDATE_QUEUE_SIZE", "1000")))
+        self.in_flight = set()
+        self.accepting = False
+        self.stop_event = asyncio.Event()
+
+    async def handle(self, request: web.Request):
+        if self.secret and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            return web.Response(status=401)
+        if not self.accepting:
+            # Telegram will retry the update after we come back
+            return web.Response(status=503)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            logger.warning(f"Bad webhook payload: {e}")
+            return web.Response(status=400)
+        # Backpressure: hold the request while too many updates are in flight
+        await self.slots.acquire()
+        task = asyncio.create_task(self.process(update))
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+        return web.Response()
+
+    async def process(self, update: Update):
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            logger.error(f"Update {update.update_id} failed: {e}", exc_info=True)
+        finally:
+            self.slots.release()
+
+    async def run(self, drop_pending_updates: bool = False):
+        if self.register_webhook and not self.url:
+            raise RuntimeError("WEBHOOK_URL is required in webhook mode")
+
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, self.host, self.port)
+        await site.start()
+
+        self.accepting = True
+
+        await self.dp.emit_startup(bot=self.bot)
+        if self.register_webhook:
+            await self.bot.set_webhook(
+                url=self.url.rstrip("/") + self.path,
+                secret_token=self.secret or None,
+                drop_pending_updates=drop_pending_updates,
+                allowed_updates=self.dp.resolve_used_update_types(),
+                max_connections=min(100, max(1, self.workers_count))
+            )
+        logger.info(f"Webhook server listening on {self.host}:{self.port}{self.path} with {self.workers_count} workers")
+
+        add_stop_signals(self.stop_event)
+        try:
+            await self.stop_event.wait()
+        finally:
+            await self.shutdown(runner)
+
+    async def shutdown(self, runner: web.AppRunner):
+        """Stops intake and lets in-flight updates finish"""
+        self.accepting = False
+        pending = list(self.in_flight)
+        logger.info(f"Draining {len(pending)} in-flight updates...")
+        if pending:
+            done, not_done = await asyncio.wait(pending, timeout=self.drain_timeout)
+            if not_done:
+                logger.warning(f"Drain timeout, cancelling {len(not_done)} updates")
+                for task in not_done:
+                    task.cancel()
+                await asyncio.gather(*not_done, return_exceptions=True)
+        await runner.cleanup()
+        await self.dp.emit_shutdown(bot=self.bot)
+        await self.bot.session.close()